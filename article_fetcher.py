@@ -0,0 +1,176 @@
+import copy
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlparse
+
+
+def backoff_delay(attempt, base=0.5, cap=8.0):
+    """Returns an exponential backoff delay with full jitter for a retry attempt (0-based)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def publish_timestamp(article):
+    """Returns a parsed Article's publish date as epoch seconds, or None if newspaper found none."""
+    published = getattr(article, "publish_date", None)
+    if published is None:
+        return None
+    try:
+        return published.timestamp()
+    except (AttributeError, OverflowError, ValueError):
+        return None
+
+
+class HostRateLimiter:
+    """
+    Spaces out requests to the same host.
+
+    Every call to wait() reserves the next free slot for the host, so concurrent
+    workers hitting one site queue up instead of bursting.
+    """
+
+    def __init__(self, requests_per_second=2.0):
+        self.interval = 1.0 / requests_per_second if requests_per_second else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ArticleFetcher:
+    """
+    Downloads and parses newspaper articles with bounded concurrency.
+    """
+
+    def __init__(self, max_workers=8, per_host_rate=2.0, max_retries=3, timeout=10, backoff_base=0.5, backoff_max=8.0):
+        """
+        Initializes the ArticleFetcher.
+
+        Args:
+            max_workers: The number of articles downloaded at the same time.
+            per_host_rate: The maximum number of requests per second to one host, or None for no limit.
+            max_retries: The number of attempts per article.
+            timeout: The request timeout in seconds for each download.
+            backoff_base: The base delay in seconds of the exponential backoff between attempts.
+            backoff_max: The maximum backoff delay in seconds.
+        """
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.rate_limiter = HostRateLimiter(per_host_rate)
+
+    def _set_timeout(self, article):
+        """
+        Sets the request timeout on a copy of the article's config, since Articles
+        built with the same Config share it and the timeout would leak to all of them.
+        """
+        if article.config.request_timeout != self.timeout:
+            config = copy.copy(article.config)
+            config.request_timeout = self.timeout
+            article.config = config
+
+    def fetch_one(self, article):
+        """
+        Downloads and parses one article, retrying with backoff.
+
+        Returns:
+            The article text, or an empty string if every attempt failed.
+        """
+        self._set_timeout(article)
+
+        def download_and_parse():
+            article.download()
+            article.parse()
+            return article.text
+
+        return self._with_retries(download_and_parse, article.url, "download and parse", "Article text")
+
+    def download_one(self, article):
+        """
+        Downloads one article without parsing it, retrying with backoff.
+
+        Returns:
+            The article HTML, or an empty string if every attempt failed.
+        """
+        self._set_timeout(article)
+
+        def download():
+            article.download()
+            return article.html
+
+        return self._with_retries(download, article.url, "download", "Downloaded HTML")
+
+    def _with_retries(self, fn, url, action, result_name):
+        """
+        Calls fn until it returns a non-empty result, at most max_retries times,
+        waiting for the host's rate limit before each attempt and backing off
+        between them.
+
+        Args:
+            fn: A callable taking no arguments that returns the result.
+            url: The URL fn requests, for the rate limit and the log.
+            action: What fn does, e.g. "download", for the log.
+            result_name: What fn returns, e.g. "Downloaded HTML", for the log.
+
+        Returns:
+            The result, or an empty string if every attempt failed.
+        """
+        host = urlparse(url).netloc
+        for attempt in range(self.max_retries):
+            self.rate_limiter.wait(host)
+            try:
+                result = fn()
+                if result:
+                    return result
+                else:
+                    print(f"Attempt {attempt + 1}: {result_name} is empty for {url}. Retrying...")
+            except Exception as e:
+                print(f"Attempt {attempt + 1}: Error during {action} of {url}: {str(e)}")
+
+            if attempt < self.max_retries - 1:
+                time.sleep(backoff_delay(attempt, self.backoff_base, self.backoff_max))
+
+        print(f"Failed to {action} {url} after {self.max_retries} attempts.")
+        return ""
+
+    def _fetch_pair(self, article):
+        return article, self.fetch_one(article)
+
+    def fetch(self, articles):
+        """
+        Downloads and parses articles concurrently.
+
+        Articles are submitted lazily, with at most twice max_workers in flight, so
+        the input can be a generator and results can be consumed while the rest
+        are still downloading.
+
+        Args:
+            articles: An iterable of newspaper Article objects.
+
+        Yields:
+            (article, text) tuples in completion order; text is empty on failure.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = set()
+            for article in articles:
+                pending.add(executor.submit(self._fetch_pair, article))
+                if len(pending) >= self.max_workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
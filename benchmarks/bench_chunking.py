@@ -0,0 +1,115 @@
+"""
+Throughput and retrieval quality of the chunking strategies on a fixed
+article set.
+
+For every strategy the articles are chunked and embedded, the chunks are put
+in a flat VectorDB, and sampled sentences are used as queries: the first half
+of a sentence's words is the query, and a hit is a retrieved chunk that
+contains the whole sentence. Runs offline against HashEmbeddings with a
+simulated per-request latency, or against an Ollama model with --ollama-model.
+
+Usage:
+    python benchmarks/bench_chunking.py --articles 100 --queries 300
+    python benchmarks/bench_chunking.py --texts-dir saved_articles/ --ollama-model nomic-embed-text
+"""
+import argparse
+import glob
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from chunking import CHUNKING_STRATEGIES, make_chunker, sentence_spans
+from embeddings import BatchedEmbedder, HashEmbeddings
+from faiss_lib import VectorDB
+from synthetic import generate_corpus
+
+
+def load_texts(args):
+    if args.texts_dir:
+        texts = []
+        for path in sorted(glob.glob(os.path.join(args.texts_dir, "*.txt"))):
+            with open(path, encoding="utf-8") as f:
+                texts.append(f.read())
+        return texts
+    return [text for text, _ in generate_corpus(args.articles, args.sentences)]
+
+
+def sample_queries(texts, spans, n_queries, seed):
+    rng = random.Random(seed)
+    candidates = [
+        text[start:end].strip()
+        for text, sentences in zip(texts, spans)
+        for start, end in sentences
+        if len(text[start:end].split()) >= 6
+    ]
+    queries = []
+    for sentence in rng.sample(candidates, min(n_queries, len(candidates))):
+        words = sentence.split()
+        queries.append((" ".join(words[:len(words) // 2]), sentence))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=100, help="Synthetic articles, if --texts-dir is not given.")
+    parser.add_argument("--sentences", type=int, default=40)
+    parser.add_argument("--texts-dir", help="A directory of .txt articles to use instead of synthetic ones.")
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.01, help="Simulated seconds per HashEmbeddings request.")
+    parser.add_argument("--ollama-model", help="Embed with this Ollama model instead of HashEmbeddings.")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--strategies", nargs="+", default=CHUNKING_STRATEGIES, choices=CHUNKING_STRATEGIES)
+    args = parser.parse_args()
+
+    if args.ollama_model:
+        from langchain_ollama import OllamaEmbeddings
+
+        backend = OllamaEmbeddings(model=args.ollama_model)
+    else:
+        backend = HashEmbeddings(latency=args.latency)
+
+    texts = load_texts(args)
+    # Sentence spans stand in for the ones NER already produced; they are reused, not timed
+    spans = [sentence_spans(text) for text in texts]
+    queries = sample_queries(texts, spans, args.queries, seed=0)
+    query_embeddings = np.asarray(backend.embed_documents([query for query, _ in queries]), dtype=np.float32)
+    print(f"{len(texts)} articles, {len(queries)} queries")
+    print(f"{'strategy':<10} {'articles/s':>10} {'embedded':>9} {'chunks':>7} {'words/chunk':>12} {'recall@k':>9} {'MRR':>6}")
+
+    for strategy in args.strategies:
+        embedder = BatchedEmbedder(backend, batch_size=args.batch_size)
+        chunker = make_chunker(strategy, embedder)
+        db = VectorDB(embedding_dim=query_embeddings.shape[1])
+
+        start = time.perf_counter()
+        chunks = []
+        for text, sentences in zip(texts, spans):
+            chunk_texts, embeddings = chunker.chunk(text, sentences=sentences)
+            chunks.extend(chunk_texts)
+            db.add_embeddings([{"text": t, "embedding": e} for t, e in zip(chunk_texts, embeddings)])
+        elapsed = time.perf_counter() - start
+
+        ids, _ = db.search_batch(query_embeddings, args.k)
+        hits = 0
+        reciprocal_ranks = 0.0
+        for (_, sentence), row in zip(queries, ids):
+            for rank, chunk_id in enumerate(row):
+                if chunk_id >= 0 and sentence in chunks[chunk_id]:
+                    hits += 1
+                    reciprocal_ranks += 1.0 / (rank + 1)
+                    break
+        words = sum(len(chunk.split()) for chunk in chunks) / max(len(chunks), 1)
+        print(
+            f"{strategy:<10} {len(texts) / elapsed:10.1f} {embedder.stats()['misses']:9d} {len(chunks):7d} "
+            f"{words:12.1f} {hits / len(queries):9.3f} {reciprocal_ranks / len(queries):6.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
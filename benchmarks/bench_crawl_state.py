@@ -0,0 +1,106 @@
+"""
+Repeated crawls of a local news site through the ingest pipeline with a
+CrawlState, showing that later crawls only pay for new content.
+
+Crawl 1 ingests every article. Before crawl 2 the site gains new articles,
+syndicated near-copies of existing ones under new URLs, and edits to some
+existing ones; links to known articles come back with tracking parameters.
+Crawl 2 uses the default recheck interval, so known URLs are not downloaded.
+Crawl 3 rechecks every URL, so the edits are found and only their new
+paragraphs are processed.
+
+Usage:
+    python benchmarks/bench_crawl_state.py --articles 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import spacy
+
+from article_fetcher import ArticleFetcher
+from crawl_state import CrawlState
+from custom_ner import CustomNer
+from embeddings import HashEmbeddings
+from faiss_lib import VectorDB
+from graphrag_workflow import GraphRagWorkflow
+from pipeline import build_ingest_pipeline
+from bench_fetch import build_articles
+from bench_pipeline import SimulatedGraphDB, save_ruler_model
+from local_news_server import LocalNewsServer, render_article_html
+from synthetic import generate_corpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--sentences", type=int, default=30)
+    parser.add_argument("--new", type=float, default=0.1, help="Share of new articles before crawl 2.")
+    parser.add_argument("--syndicated", type=float, default=0.05, help="Share of near-copies under new URLs.")
+    parser.add_argument("--edited", type=float, default=0.1, help="Share of existing articles that get a new paragraph.")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--graph-latency", type=float, default=0.02)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    n_new = int(args.articles * args.new)
+    n_syndicated = int(args.articles * args.syndicated)
+    n_edited = int(args.articles * args.edited)
+    texts = [text for text, _ in generate_corpus(args.articles + n_new, args.sentences)]
+
+    with tempfile.TemporaryDirectory() as tmp, LocalNewsServer(texts[:args.articles], latency=args.latency) as server:
+        model = save_ruler_model(os.path.join(tmp, "ruler"))
+        graphrag = GraphRagWorkflow(
+            "hash", embeddings=HashEmbeddings(latency=args.embed_latency), ner=CustomNer(spacy.load(model)),
+            cache_path=None, chunker="window",
+        )
+        fetcher = ArticleFetcher(max_workers=8, per_host_rate=None)
+        state_path = os.path.join(tmp, "crawl_state.sqlite")
+        index_path = os.path.join(tmp, "faiss_index")
+        vector_db = VectorDB()
+        vector_db.save_index(index_path)
+
+        def crawl(label, urls, recheck_after):
+            server.requests.clear()
+            graph_db = SimulatedGraphDB(args.graph_latency)
+            crawl_state = CrawlState(state_path, recheck_after=recheck_after)
+            pipeline = build_ingest_pipeline(
+                graph_db, graphrag, vector_db, fetcher, index_path=index_path, ner_model=model,
+                crawl_state=crawl_state,
+            )
+            chunks_before = vector_db.ntotal
+            start = time.perf_counter()
+            stats = pipeline.run(build_articles(urls), summary=False)
+            elapsed = time.perf_counter() - start
+            crawl_state.close()
+            print(
+                f"{label:<34} {len(urls):6d} {sum(server.requests.values()):10d} {stats['ner']['processed']:6d} "
+                f"{graph_db.rows:13d} {vector_db.ntotal - chunks_before:7d} {elapsed:7.1f}s"
+            )
+
+        print(f"{'crawl':<34} {'links':>6} {'downloads':>10} {'NER':>6} {'relationships':>13} {'chunks':>7} {'time':>8}")
+        crawl("1: initial", server.urls, recheck_after=24 * 3600)
+
+        # New articles, syndicated near-copies and edits to existing articles
+        for i in range(n_new):
+            server.pages[f"/articles/{args.articles + i}.html"] = render_article_html(
+                f"Article {args.articles + i}", texts[args.articles + i]
+            ).encode("utf-8")
+        for i in range(n_syndicated):
+            copy = texts[i].replace("according to", "said", 1)
+            server.pages[f"/syndicated/{i}.html"] = render_article_html(f"Copy {i}", copy).encode("utf-8")
+        for i in range(n_syndicated, n_syndicated + n_edited):
+            edited = texts[i] + " Joe Biden visited Tokyo in an update published hours later."
+            server.pages[f"/articles/{i}.html"] = render_article_html(f"Article {i}", edited).encode("utf-8")
+        urls = [url + "?utm_source=homepage" if "/articles/" in url else url for url in server.urls]
+
+        crawl("2: known URLs skipped", urls, recheck_after=24 * 3600)
+        crawl("3: every URL rechecked", urls, recheck_after=0)
+
+
+if __name__ == "__main__":
+    main()
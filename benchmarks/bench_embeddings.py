@@ -0,0 +1,80 @@
+"""
+Chunk embedding throughput with one backend call per chunk (the old
+chunk_and_embed_news loop) versus BatchedEmbedder, with and without the
+on-disk cache. Runs offline against HashEmbeddings with a simulated
+per-request latency, and reports cache hit ratios.
+
+Usage:
+    python benchmarks/bench_embeddings.py --articles 50 --latency 0.02 --batch-size 32 --concurrency 4
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from embeddings import BatchedEmbedder, EmbeddingCache, HashEmbeddings
+from synthetic import generate_corpus
+
+
+def chunk_corpus(corpus, sentences_per_chunk):
+    chunks = []
+    for text, _ in corpus:
+        sentences = re.split(r"(?<=[.!?])\s+", text)
+        for i in range(0, len(sentences), sentences_per_chunk):
+            chunks.append(" ".join(sentences[i:i + sentences_per_chunk]))
+    return chunks
+
+
+def timed(label, embed, chunks, embedder=None):
+    before = embedder.stats() if embedder is not None else None
+    start = time.perf_counter()
+    embed(chunks)
+    elapsed = time.perf_counter() - start
+    line = f"{label:<28} {len(chunks) / elapsed:10.1f} chunks/s"
+    if embedder is not None:
+        after = embedder.stats()
+        hits = after["hits"] - before["hits"]
+        calls = after["backend_calls"] - before["backend_calls"]
+        line += f"   hit ratio {hits / len(chunks):.2f}, backend calls {calls}"
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=50)
+    parser.add_argument("--sentences", type=int, default=40)
+    parser.add_argument("--sentences-per-chunk", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated seconds per backend request.")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--cache-size", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    chunks = chunk_corpus(generate_corpus(args.articles, args.sentences), args.sentences_per_chunk)
+    backend = HashEmbeddings(latency=args.latency)
+    print(f"{len(chunks)} chunks from {args.articles} articles")
+
+    timed("per-chunk loop", lambda texts: [backend.embed_query(text) for text in texts], chunks)
+
+    embedder = BatchedEmbedder(backend, batch_size=args.batch_size, max_concurrency=args.concurrency)
+    timed("batched, no cache", embedder.embed_documents, chunks, embedder)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = EmbeddingCache(os.path.join(tmp, "cache.sqlite"), namespace="hash", max_entries=args.cache_size)
+        embedder = BatchedEmbedder(backend, cache=cache, batch_size=args.batch_size, max_concurrency=args.concurrency)
+        timed("batched, cold cache", embedder.embed_documents, chunks, embedder)
+        timed("batched, warm cache", embedder.embed_documents, chunks, embedder)
+
+        # A re-crawl where a tenth of the chunks changed
+        edited = [chunk + " Updated." if i % 10 == 0 else chunk for i, chunk in enumerate(chunks)]
+        timed("batched, 10% edited", embedder.embed_documents, edited, embedder)
+        print(f"cache entries: {len(cache)}")
+        cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+The offline end-to-end benchmark: ingest and query with no network, model
+server, API key or database, writing the results as JSON so runs on different
+commits can be compared.
+
+Stand-ins:
+- the news site is a LocalNewsServer serving a synthetic corpus over HTTP;
+- NER is a spaCy entity ruler for the corpus's names (or --ner-model);
+- embeddings come from HashEmbeddings, deterministic and 768-d like
+  nomic-embed-text;
+- Neo4j is InMemoryGraphDB below, which answers the same calls from
+  dictionaries.
+
+Ingest runs --articles articles through the streaming IngestPipeline and
+reports articles/s overall and per stage, and peak RSS. The query phase then
+grows the vector store to each of --chunk-counts with synthetic passages,
+tagged like ingested chunks, and times --queries queries against it at each
+size, with the query cache disabled: NER, the graph lookup, vector retrieval
+(embedding and search) and the fused graphrag_search, at p50/p95/p99. The
+graph holds what ingest wrote at every size.
+
+1M chunks of 768-d Flat vectors take about 3 GB; use a compressed index for
+them, e.g. --index-spec IVF1024,PQ96.
+
+Usage:
+    python benchmarks/bench_end_to_end.py --articles 200 --chunk-counts 1000 10000 100000 --output results.json
+    python benchmarks/bench_end_to_end.py --chunk-counts 1000 10000 1000000 --index-spec IVF1024,PQ96
+    python benchmarks/bench_end_to_end.py --output new.json --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import spacy
+
+from article_fetcher import ArticleFetcher
+from bench_fetch import build_articles
+from bench_pipeline import save_ruler_model
+from bench_query_cache import NAMES, TEMPLATES
+from custom_ner import CustomNer
+from embeddings import HashEmbeddings
+from faiss_lib import VectorDB
+from graphrag_workflow import GraphRagWorkflow
+from local_news_server import LocalNewsServer
+from metrics import metrics
+from pipeline import build_ingest_pipeline
+from query_cache import QueryCache
+from synthetic import generate_article, generate_corpus
+
+DAY = 86400.0
+QUERY_PHASES = ("ner", "graph", "vector", "fused")
+
+
+class InMemoryGraphDB:
+    """
+    Stands in for Neo4jAuraDB: stores relationships as store_relationships_auradb
+    does, merging repeated pairs into mention counts, and answers
+    fetch_related_nodes, fetch_entity_names and search_entities (whole words, no
+    edit distance) from memory. Write listeners are
+    called as Neo4jAuraDB calls them. latency is slept once per call, as a
+    round trip would take.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.labels = {}  # entity name -> label
+        self.created = {}  # entity name -> creation time
+        self.edges = {}  # (source, relationship, target) -> {"mentions", "last_seen"}
+        self.outgoing = {}  # source -> [(relationship, target)], in creation order
+        self.write_listeners = []
+        self._lock = threading.Lock()
+
+    def add_write_listener(self, callback):
+        self.write_listeners.append(callback)
+
+    def store_relationships_auradb(self, relationships, batch_size=None, published=None):
+        if self.latency:
+            time.sleep(self.latency)
+        now = time.time()
+        published = published if published is not None else now
+        entity_names = {}
+        with self._lock:
+            for relationship in relationships:
+                source, target = relationship["entity1"], relationship["entity2"]
+                for entity in (source, target):
+                    self.labels.setdefault(entity["text"], entity["label"])
+                    self.created.setdefault(entity["text"], now)
+                    entity_names[entity["text"]] = entity["label"]
+                key = (source["text"], relationship["relation"], target["text"])
+                edge = self.edges.get(key)
+                if edge is None:
+                    edge = self.edges[key] = {"mentions": 0, "last_seen": published}
+                    self.outgoing.setdefault(key[0], []).append(key[1:])
+                edge["mentions"] += 1
+                edge["last_seen"] = max(edge["last_seen"], published)
+        if entity_names:
+            for callback in self.write_listeners:
+                callback(entity_names)
+        return True
+
+    def fetch_related_nodes(self, key_entities):
+        if self.latency:
+            time.sleep(self.latency)
+        rows = []
+        with self._lock:
+            for source in dict.fromkeys(key_entities):
+                for relationship, target in self.outgoing.get(source, ()):
+                    rows.append(
+                        {"source": source, "relationship": relationship, "target": target, "target_labels": [self.labels[target]]}
+                    )
+                    if len(rows) == 50:
+                        return rows
+        return rows
+
+    def search_entities(self, text, limit=5):
+        if self.latency:
+            time.sleep(self.latency)
+        words = text.lower().split()
+        with self._lock:
+            names = [name for name in self.labels if all(word in name.lower().split() for word in words)]
+        return names[:limit]
+
+    def fetch_entity_names(self, since=None):
+        with self._lock:
+            names = [(name, self.labels[name]) for name, created in self.created.items() if since is None or created >= since]
+        yield from names
+
+    def close(self):
+        pass
+
+
+def peak_rss_mb():
+    """The peak resident memory of this process and of its largest finished child process, in MB."""
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+def summarize(latencies):
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {"p50_ms": float(p50), "p95_ms": float(p95), "p99_ms": float(p99), "mean_ms": float(np.mean(latencies) * 1000)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def run_ingest(args, model, graph_db, graphrag, vector_db, index_path):
+    texts = [text for text, _ in generate_corpus(args.articles, args.sentences)]
+    metrics.reset()
+    with LocalNewsServer(texts, latency=args.latency) as server:
+        fetcher = ArticleFetcher(max_workers=8, per_host_rate=None)
+        pipeline = build_ingest_pipeline(graph_db, graphrag, vector_db, fetcher, index_path=index_path, ner_model=model)
+        start = time.perf_counter()
+        stats = pipeline.run(build_articles(server.urls))
+        elapsed = time.perf_counter() - start
+    done = stats["vector_append"]["processed"]
+    return {
+        "articles": done,
+        "chunks": vector_db.ntotal,
+        "relationships": len(graph_db.edges),
+        "entities": len(graph_db.labels),
+        "seconds": elapsed,
+        "articles_per_second": done / elapsed if elapsed else 0.0,
+        "stages": stats,
+        "peak_rss_mb": peak_rss_mb(),
+        "metrics": metrics.snapshot(),
+    }
+
+
+def synthetic_passages(start, count, sentences, now):
+    """Chunk dictionaries for synthetic passages start .. start + count, tagged like ingested chunks."""
+    passages = [generate_article(sentences, seed=1_000_000 + i) for i in range(start, start + count)]
+    embeddings = HashEmbeddings().embed_documents([text for text, _ in passages])
+    return [
+        {
+            "text": text,
+            "embedding": embedding,
+            "url": f"synthetic://{start + i}",
+            "published": now - ((start + i) % 30) * DAY,
+            "entities": list(dict.fromkeys(entity["text"] for entity in entities)),
+        }
+        for i, ((text, entities), embedding) in enumerate(zip(passages, embeddings))
+    ]
+
+
+def grow(vector_db, target, sentences, now, batch_size=10000):
+    while vector_db.ntotal < target:
+        count = min(batch_size, target - vector_db.ntotal)
+        vector_db.add_embeddings(synthetic_passages(vector_db.ntotal, count, sentences, now))
+    vector_db._ensure_trained()
+
+
+def run_queries(graphrag, queries, top_k):
+    latencies = {phase: [] for phase in QUERY_PHASES}
+    for query in queries:
+        start = time.perf_counter()
+        entities = graphrag.ner.parse_query(query)
+        latencies["ner"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        graphrag.related_nodes(entities)
+        latencies["graph"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        graphrag.retrieve_chunks(query, top_k=top_k, key_entities=entities)
+        latencies["vector"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        graphrag.graphrag_search(query, top_k=top_k)
+        latencies["fused"].append(time.perf_counter() - start)
+    return {phase: summarize(values) for phase, values in latencies.items()}
+
+
+def compare(results, baseline):
+    """Prints the change of each throughput and latency against a baseline result file."""
+    def change(new, old):
+        return f"{new / old - 1:+8.1%}" if old else "       -"
+
+    title = f"compared with {(baseline['meta'].get('commit') or 'baseline')[:12]}"
+    print(f"\n{title:<34} {'baseline':>10} {'now':>10} {'change':>8}")
+    old, new = baseline["ingest"], results["ingest"]
+    print(f"{'ingest articles/s':<34} {old['articles_per_second']:10.2f} {new['articles_per_second']:10.2f} {change(new['articles_per_second'], old['articles_per_second'])}")
+    for stage, stats in new["stages"].items():
+        if stage in old["stages"]:
+            before, after = old["stages"][stage]["items_per_second"], stats["items_per_second"]
+            print(f"{'  ' + stage + ' items/s':<34} {before:10.2f} {after:10.2f} {change(after, before)}")
+    old_sizes = {entry["chunks"]: entry for entry in baseline["query"]}
+    for entry in results["query"]:
+        previous = old_sizes.get(entry["chunks"])
+        if previous is None:
+            continue
+        for phase in QUERY_PHASES:
+            for stat in ("p50_ms", "p99_ms"):
+                before, after = previous[phase][stat], entry[phase][stat]
+                label = f"{entry['chunks']} chunks {phase} {stat}"
+                print(f"{label:<34} {before:10.2f} {after:10.2f} {change(after, before)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--sentences", type=int, default=40, help="Sentences per ingested article.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of simulated network latency per article fetch.")
+    parser.add_argument("--graph-latency", type=float, default=0.0, help="Seconds per simulated graph round trip.")
+    parser.add_argument("--ner-model", default="ruler", help="A spaCy model name or path, or 'ruler' for a synthetic entity ruler.")
+    parser.add_argument("--chunker", default="window")
+    parser.add_argument("--chunk-counts", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--passage-sentences", type=int, default=3, help="Sentences per synthetic passage added to grow the store.")
+    parser.add_argument("--index-spec", default="Flat")
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--entity-filter", action="store_true", help="Search only the chunks that mention a query's entities.")
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="A result file of an earlier run to compare against.")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    queries = [rng.choice(TEMPLATES).format(rng.choice(NAMES)) for _ in range(args.queries)]
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "started": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        },
+        "query": [],
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = save_ruler_model(os.path.join(tmp, "ruler")) if args.ner_model == "ruler" else args.ner_model
+        graph_db = InMemoryGraphDB(args.graph_latency)
+        vector_db = VectorDB(index_spec=args.index_spec, nprobe=args.nprobe)
+        graphrag = GraphRagWorkflow(
+            "hash", embeddings=HashEmbeddings(), ner=CustomNer(spacy.load(model)), cache_path=None, chunker=args.chunker,
+            graph_db=graph_db, vector_db=vector_db, query_cache=QueryCache(max_entries=0), entity_filter=args.entity_filter,
+        )
+        index_path = os.path.join(tmp, "index")
+        vector_db.save_index(index_path)
+
+        ingest = results["ingest"] = run_ingest(args, model, graph_db, graphrag, vector_db, index_path)
+        print(
+            f"ingest: {ingest['articles']} articles, {ingest['chunks']} chunks, {ingest['relationships']} relationships "
+            f"in {ingest['seconds']:.1f}s ({ingest['articles_per_second']:.1f} articles/s), "
+            f"peak RSS {ingest['peak_rss_mb']['self']:.0f} MB (largest worker {ingest['peak_rss_mb']['children']:.0f} MB)"
+        )
+        vector_db.close()
+
+        now = time.time()
+        print(f"\n{'chunks':>9} {'phase':<7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+        for target in sorted(args.chunk_counts):
+            if target < vector_db.ntotal:
+                print(f"{target:>9} skipped: ingest alone added {vector_db.ntotal} chunks")
+                continue
+            start = time.perf_counter()
+            grow(vector_db, target, args.passage_sentences, now)
+            entry = {"chunks": vector_db.ntotal, "grow_seconds": time.perf_counter() - start}
+            entry.update(run_queries(graphrag, queries, args.top_k))
+            entry["peak_rss_mb"] = peak_rss_mb()
+            results["query"].append(entry)
+            for phase in QUERY_PHASES:
+                stats = entry[phase]
+                print(f"{entry['chunks']:>9} {phase:<7} {stats['p50_ms']:8.2f} {stats['p95_ms']:8.2f} {stats['p99_ms']:8.2f}")
+        graphrag.search_executor.shutdown()
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nwrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
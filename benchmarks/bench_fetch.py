@@ -0,0 +1,60 @@
+"""
+Compares sequential parse_article downloads with the concurrent ArticleFetcher
+against a local news server with simulated latency and transient failures.
+
+Usage:
+    python benchmarks/bench_fetch.py --articles 100 --latency 0.2 --workers 16
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import spacy
+from newspaper import Article, Config
+
+from article_fetcher import ArticleFetcher
+from custom_ner import CustomNer
+from local_news_server import LocalNewsServer
+from synthetic import generate_corpus
+
+
+def build_articles(urls):
+    config = Config()
+    config.memoize_articles = False
+    config.fetch_images = False
+    config.language = "en"
+    return [Article(url, config=config) for url in urls]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds of simulated latency per request.")
+    parser.add_argument("--fail-first", type=int, default=0, help="503 responses per article before it is served.")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--per-host-rate", type=float, default=50.0)
+    parser.add_argument("--skip-sequential", action="store_true")
+    args = parser.parse_args()
+
+    texts = [text for text, _ in generate_corpus(args.articles, n_sentences=20)]
+    with LocalNewsServer(texts, latency=args.latency, fail_first=args.fail_first) as server:
+        if not args.skip_sequential:
+            ner = CustomNer(nlp=spacy.blank("en"))
+            start = time.perf_counter()
+            fetched = sum(1 for article in build_articles(server.urls) if ner.parse_article(article))
+            elapsed = time.perf_counter() - start
+            print(f"sequential: {fetched}/{args.articles} articles in {elapsed:.2f}s ({fetched / elapsed:.1f} articles/s)")
+
+        server.requests.clear()
+        fetcher = ArticleFetcher(max_workers=args.workers, per_host_rate=args.per_host_rate, backoff_base=0.05)
+        start = time.perf_counter()
+        fetched = sum(1 for _, text in fetcher.fetch(build_articles(server.urls)) if text)
+        elapsed = time.perf_counter() - start
+        print(f"concurrent: {fetched}/{args.articles} articles in {elapsed:.2f}s ({fetched / elapsed:.1f} articles/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Entity- and time-filtered vector search: a filter applied inside FAISS with an
+ID selector (or, for small IVF and HNSW selections, exactly over the selected
+vectors), against over-fetching k * --overfetch results and post-filtering,
+and against the unfiltered search the workflow used to do.
+
+Synthetic clustered vectors are tagged with Zipf-distributed entities, so a
+few hub entities are mentioned by many chunks and most by a handful, and with
+publish times spread over a year. Each query names one entity (and, for the
+time-filtered rows, the last 30 days). Recall@k is measured against the exact
+nearest neighbours within the filtered chunks, and "on-filter" is the share of
+all returned chunks that match the filter.
+
+Usage:
+    python benchmarks/bench_filtered_search.py --vectors 200000 --entities 5000 --queries 200
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from bench_vector_index import recall_at_k, synthetic_vectors
+from faiss_lib import VectorDB
+
+DAY = 86400.0
+
+
+def build(spec, vectors, entities, published, **params):
+    db = VectorDB(embedding_dim=vectors.shape[1], index_spec=spec, **params)
+    start = time.perf_counter()
+    for i in range(0, len(vectors), 10000):
+        db.add_embeddings(
+            [
+                {"embedding": v, "text": "", "entities": e, "published": p}
+                for v, e, p in zip(vectors[i:i + 10000], entities[i:i + 10000], published[i:i + 10000])
+            ]
+        )
+    db._ensure_trained()
+    return db, time.perf_counter() - start
+
+
+def exact_filtered(vectors, queries, selections, k):
+    """The true top k of each query among its selected ids."""
+    truth = []
+    for query, selected in zip(queries, selections):
+        distances = ((vectors[selected] - query) ** 2).sum(axis=1)
+        truth.append(selected[np.argsort(distances)[:k]])
+    return truth
+
+
+def timed(search, queries, filters):
+    rows, latencies = [], []
+    for query, query_filter in zip(queries, filters):
+        start = time.perf_counter()
+        rows.append(search(query, query_filter))
+        latencies.append(time.perf_counter() - start)
+    return rows, np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--entities", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--overfetch", type=int, default=10, help="Post-filtering fetches k times this many results.")
+    parser.add_argument("--specs", nargs="+", default=["Flat", "IVF1024,Flat"])
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument(
+        "--exact-filter-size", type=int, default=10000,
+        help="VectorDB.exact_filter_size; 0 makes IVF and HNSW filters use the ID selector only.",
+    )
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    data = synthetic_vectors(args.vectors + args.queries, args.dim)
+    vectors, queries = data[:args.vectors], data[args.vectors:]
+    weights = 1 / np.arange(1, args.entities + 1) ** 1.1
+    weights /= weights.sum()
+    tags = rng.choice(args.entities, size=(args.vectors, 3), p=weights)
+    entities = [[f"Entity {number}" for number in set(row)] for row in tags]
+    now = time.time()
+    published = now - rng.uniform(0, 365, size=args.vectors) * DAY
+
+    # Queries name entities of every popularity, sampled uniformly by rank
+    named = [f"Entity {number}" for number in rng.integers(0, min(args.entities, 2000), size=args.queries)]
+    filters = {
+        "entity": [{"entities": [name]} for name in named],
+        "entity + 30 days": [{"entities": [name], "since": now - 30 * DAY} for name in named],
+    }
+
+    print(f"{'index':<14} {'filter':<17} {'method':<22} {'p50 ms':>8} {'p95 ms':>8} {f'recall@{args.k}':>10} {'on-filter':>10}")
+    for spec in args.specs:
+        db, build_time = build(spec, vectors, entities, published, nprobe=args.nprobe, exact_filter_size=args.exact_filter_size)
+        print(f"{spec}: built in {build_time:.1f}s, {len(db.metadata.names)} entities indexed")
+        for filter_name, query_filters in filters.items():
+            selections = [db.select_ids(**query_filter) for query_filter in query_filters]
+            keep = [i for i, selected in enumerate(selections) if len(selected)]
+            query_rows = queries[keep]
+            query_filters = [query_filters[i] for i in keep]
+            selections = [selections[i] for i in keep]
+            truth = exact_filtered(vectors, query_rows, selections, args.k)
+            sizes = np.array([len(selected) for selected in selections])
+            print(f"  {filter_name}: {len(keep)} queries, filtered chunks per query p50 {int(np.median(sizes))}, max {sizes.max()}")
+
+            def unfiltered(query, _):
+                return db.search_batch(query, args.k)[0][0]
+
+            def post_filtered(query, query_filter):
+                ids = db.search_batch(query, args.k * args.overfetch)[0][0]
+                allowed = set(db.select_ids(**query_filter).tolist())
+                return np.array([i for i in ids if i in allowed][:args.k], dtype=np.int64)
+
+            def filtered(query, query_filter):
+                return db.search_batch(query, args.k, **query_filter)[0][0]
+
+            methods = [
+                ("unfiltered", unfiltered),
+                (f"post-filter x{args.overfetch}", post_filtered),
+                ("filtered search", filtered),
+            ]
+            for method_name, search in methods:
+                rows, latencies = timed(search, query_rows, query_filters)
+                returned = sum(int((row != -1).sum()) for row in rows)
+                on_filter = sum(int(np.isin(row[row != -1], selected).sum()) for row, selected in zip(rows, selections)) / max(returned, 1)
+                print(
+                    f"{spec:<14} {filter_name:<17} {method_name:<22} {np.percentile(latencies, 50):8.3f} "
+                    f"{np.percentile(latencies, 95):8.3f} {recall_at_k(rows, truth):10.3f} {on_filter:10.3f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
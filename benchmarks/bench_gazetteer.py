@@ -0,0 +1,134 @@
+"""
+Query NER latency and agreement: the spaCy model alone versus the gazetteer
+fast path with the model as fallback.
+
+The gazetteer knows a --known fraction of the synthetic entity names, as if
+the rest had never been ingested; queries about those, and queries without
+entities, fall back to the model. Queries mix full names, lowercase names,
+surnames and entity-free questions. Agreement compares the entity sets of
+both paths per query (case- and accent-folded, without a leading "the"), and
+lists the disagreements.
+
+Usage:
+    python benchmarks/bench_gazetteer.py --model en_core_web_trf --queries 500
+    python benchmarks/bench_gazetteer.py --model ruler
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+import spacy
+
+from bench_pipeline import save_ruler_model
+from custom_ner import CustomNer
+from gazetteer import Gazetteer, fold
+from synthetic import ORGS, PEOPLE, PLACES
+
+TEMPLATES = [
+    "Fetch news related to {}", "What is the latest on {}?", "{} news today", "Why is {} in the news",
+    "What did {} say about the economy?", "Any updates on {} this week",
+]
+NO_ENTITY = ["What happened in the markets today?", "Show me the top stories", "latest news on inflation"]
+
+
+def normalize(entities):
+    names = set()
+    for name in entities or ():
+        tokens = fold(name).split()
+        names.add(" ".join(tokens[1:] if len(tokens) > 1 and tokens[0] == "the" else tokens))
+    return names
+
+
+def generate_queries(n, rng):
+    queries = []
+    for _ in range(n):
+        kind = rng.random()
+        if kind < 0.1:
+            queries.append(rng.choice(NO_ENTITY))
+            continue
+        label, names = rng.choice([("PERSON", PEOPLE), ("ORG", ORGS), ("GPE", PLACES)])
+        name = rng.choice(names)
+        if kind < 0.2:
+            name = name.lower()
+        elif kind < 0.3 and label == "PERSON":
+            name = name.split()[-1]
+        queries.append(rng.choice(TEMPLATES).format(name))
+    return queries
+
+
+def time_parse(ner, queries):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(ner.parse_query(query))
+        latencies.append(time.perf_counter() - start)
+    return results, np.array(latencies) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="en_core_web_trf", help="A spaCy model name or path, or 'ruler'.")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--known", type=float, default=0.8, help="Fraction of entity names in the gazetteer.")
+    parser.add_argument("--extra-names", type=int, default=100_000, help="Filler names, for a realistic gazetteer size.")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    queries = generate_queries(args.queries, rng)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = save_ruler_model(os.path.join(tmp, "ruler")) if args.model == "ruler" else args.model
+        nlp = spacy.load(model)
+
+    gazetteer = Gazetteer()
+    start = time.perf_counter()
+    for i in range(args.extra_names):
+        gazetteer.add(f"Filler Org {i}", "ORG")
+    for label, names in (("PERSON", PEOPLE), ("ORG", ORGS), ("GPE", PLACES)):
+        for name in names:
+            if rng.random() < args.known:
+                gazetteer.add(name, label)
+    print(f"gazetteer: {len(gazetteer)} names added in {time.perf_counter() - start:.2f}s")
+
+    model_ner = CustomNer(nlp)
+    fast_ner = CustomNer(nlp, gazetteer=gazetteer)
+    time_parse(model_ner, queries[:5])  # warm up
+    model_results, model_us = time_parse(model_ner, queries)
+    fast_results, fast_us = time_parse(fast_ner, queries)
+    hits = [bool(gazetteer.match(query)) for query in queries]
+
+    print(f"{'path':<22} {'p50 us':>10} {'p95 us':>10} {'mean us':>10}")
+    print(f"{'model':<22} {np.percentile(model_us, 50):10.1f} {np.percentile(model_us, 95):10.1f} {model_us.mean():10.1f}")
+    print(f"{'gazetteer + fallback':<22} {np.percentile(fast_us, 50):10.1f} {np.percentile(fast_us, 95):10.1f} {fast_us.mean():10.1f}")
+    hit_us = fast_us[np.array(hits)]
+    if len(hit_us):
+        print(f"{'  gazetteer hits only':<22} {np.percentile(hit_us, 50):10.1f} {np.percentile(hit_us, 95):10.1f} {hit_us.mean():10.1f}")
+    print(f"gazetteer answered {sum(hits)}/{len(queries)} queries, {len(queries) - sum(hits)} fell back to the model")
+
+    agree = 0
+    true_positives = found = expected = 0
+    disagreements = {}
+    for query, model_entities, fast_entities in zip(queries, model_results, fast_results):
+        model_set, fast_set = normalize(model_entities), normalize(fast_entities)
+        agree += model_set == fast_set
+        true_positives += len(model_set & fast_set)
+        found += len(fast_set)
+        expected += len(model_set)
+        if model_set != fast_set:
+            disagreements[query] = (sorted(model_set), sorted(fast_set))
+    print(
+        f"agreement {agree / len(queries):.3f}   precision {true_positives / found if found else 1:.3f}   "
+        f"recall {true_positives / expected if expected else 1:.3f}   (against the model)"
+    )
+    for query, (model_set, fast_set) in list(disagreements.items())[:10]:
+        print(f"  {query!r}: model {model_set}, gazetteer path {fast_set}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Compares per-edge MERGE round trips with the batched UNWIND writer against a
+local Neo4j, e.g.:
+
+    docker run --rm -p 7687:7687 -e NEO4J_AUTH=neo4j/password neo4j:5
+
+Usage:
+    python benchmarks/bench_graph_writes.py --articles 20 --reset
+
+--reset deletes every node in the target database before each run, so only
+point it at a throwaway instance.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import spacy
+
+from custom_ner import CustomNer
+from neo4j_auradb import Neo4jAuraDB
+from synthetic import generate_corpus
+
+
+def store_per_edge(db, relationships):
+    """The original writer: three execute_query round trips per relationship."""
+    for relationship in relationships:
+        subject_text = relationship["entity1"]["text"]
+        subject_label = relationship["entity1"]["label"]
+        relationship_type = relationship["relation"]
+        object_text = relationship["entity2"]["text"]
+        object_label = relationship["entity2"]["label"]
+        db.driver.execute_query(f"MERGE (s:{subject_label} {{name: $subject_text}})", {"subject_text": subject_text})
+        db.driver.execute_query(f"MERGE (o:{object_label} {{name: $object_text}})", {"object_text": object_text})
+        db.driver.execute_query(
+            f"MATCH (s:{subject_label} {{name: $subject_text}}) "
+            f"MATCH (o:{object_label} {{name: $object_text}}) "
+            f"MERGE (s)-[:{relationship_type}]->(o)",
+            {"subject_text": subject_text, "object_text": object_text},
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uri", default=os.getenv("NEO4J_URI", "bolt://localhost:7687"))
+    parser.add_argument("--user", default=os.getenv("NEO4J_USERNAME", "neo4j"))
+    parser.add_argument("--password", default=os.getenv("NEO4J_PASSWORD", "password"))
+    parser.add_argument("--articles", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--reset", action="store_true", help="Delete all nodes before each run.")
+    args = parser.parse_args()
+
+    ner = CustomNer(nlp=spacy.blank("en"))
+    db = Neo4jAuraDB(args.uri, args.user, args.password, ner=ner, batch_size=args.batch_size)
+    if db.driver is None:
+        raise SystemExit("Could not connect to Neo4j.")
+
+    articles = [ner.extract_relationships(text, entities, window=1) for text, entities in generate_corpus(args.articles)]
+    n_relationships = sum(len(relationships) for relationships in articles)
+    print(f"{args.articles} articles, {n_relationships} relationships")
+
+    for name, store in [
+        ("per-edge MERGE", lambda relationships: store_per_edge(db, relationships)),
+        ("batched UNWIND", db.store_relationships_auradb),
+    ]:
+        if args.reset:
+            db.execute_query("MATCH (n) DETACH DELETE n")
+        start = time.perf_counter()
+        for relationships in articles:
+            store(relationships)
+        elapsed = time.perf_counter() - start
+        print(f"{name}: {elapsed:.2f}s ({args.articles / elapsed:.1f} articles/s, {n_relationships / elapsed:.0f} edges/s)")
+
+    for name, plan in db.report_query_plans().items():
+        status = "index seek" if plan["uses_index"] else "NO INDEX"
+        print(f"plan {name}: {status} ({', '.join(plan['operators'])})")
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
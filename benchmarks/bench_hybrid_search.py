@@ -0,0 +1,83 @@
+"""
+Latency of graphrag_search, which runs the graph and vector branches
+concurrently, against calling the same steps one after the other, with the
+query cache disabled. Also runs with a graph timeout below the graph
+latency to show a slow branch being cut off.
+
+Usage:
+    python benchmarks/bench_hybrid_search.py --queries 50 --ner-latency 0.3 --graph-latency 0.1 --embed-latency 0.2
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from bench_query_cache import NAMES, TEMPLATES, SimulatedGraph, SimulatedNer
+from embeddings import HashEmbeddings
+from faiss_lib import VectorDB
+from graphrag_workflow import GraphRagWorkflow
+from query_cache import QueryCache
+from synthetic import generate_corpus
+
+
+def percentiles(latencies):
+    p50, p95 = np.percentile(np.array(latencies) * 1000, [50, 95])
+    return f"p50 {p50:8.1f} ms   p95 {p95:8.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--ner-latency", type=float, default=0.3)
+    parser.add_argument("--graph-latency", type=float, default=0.1)
+    parser.add_argument("--embed-latency", type=float, default=0.2)
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    queries = [rng.choice(TEMPLATES).format(rng.choice(NAMES)) for _ in range(args.queries)]
+    vector_db = VectorDB()
+    texts = [text for text, _ in generate_corpus(args.articles, n_sentences=10)]
+    vector_db.add_embeddings([{"text": t, "embedding": e} for t, e in zip(texts, HashEmbeddings().embed_documents(texts))])
+
+    graphrag = GraphRagWorkflow(
+        "hash", embeddings=HashEmbeddings(latency=args.embed_latency), ner=SimulatedNer(args.ner_latency),
+        cache_path=None, chunker="window", graph_db=SimulatedGraph(args.graph_latency), vector_db=vector_db,
+        query_cache=QueryCache(max_entries=0),
+    )
+
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        entities = graphrag.parse_query(query)
+        graphrag.related_nodes(entities)
+        graphrag.retrieve_chunks(query, top_k=args.top_k, key_entities=entities)
+        latencies.append(time.perf_counter() - start)
+    print(f"{'sequential':<24} {percentiles(latencies)}")
+
+    latencies = []
+    for query in queries:
+        context = graphrag.graphrag_search(query, top_k=args.top_k)
+        latencies.append(context.timings["total"])
+    print(f"{'graphrag_search':<24} {percentiles(latencies)}")
+    print(f"  last: {context}")
+    print(f"  fused: {[(r['source'], round(r['score'], 4)) for r in context.fused[:6]]}")
+
+    graph_timeout = (args.ner_latency + args.graph_latency) / 2
+    latencies = []
+    timed_out = 0
+    for query in queries:
+        context = graphrag.graphrag_search(query, top_k=args.top_k, graph_timeout=graph_timeout)
+        latencies.append(context.timings["total"])
+        timed_out += "graph" in context.timed_out
+    print(f"{f'graph timeout {graph_timeout:.2f}s':<24} {percentiles(latencies)}   graph timed out {timed_out}/{len(queries)}")
+
+
+if __name__ == "__main__":
+    main()
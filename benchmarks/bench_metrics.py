@@ -0,0 +1,112 @@
+"""
+The cost of the per-stage metrics and of the sampling profiler.
+
+Runs the CPU-bound part of ingest in one process (NER, relation extraction,
+chunking and embedding with HashEmbeddings, and FAISS appends) over a
+synthetic corpus, --rounds times each with metrics disabled, with metrics
+enabled, and with metrics and the profiler running, and reports throughput
+and the overhead against disabled. Also reports the cost of one timer with
+metrics disabled and enabled, and prints the recorded per-stage timings.
+
+With --profile-dir, the profiled run's per-stage collapsed stacks are written
+there, ready for flamegraph.pl or speedscope.
+
+Usage:
+    python benchmarks/bench_metrics.py --articles 100 --rounds 3 --profile-dir /tmp/newsnexus-profile
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import spacy
+
+from bench_pipeline import save_ruler_model
+from custom_ner import CustomNer
+from embeddings import HashEmbeddings
+from faiss_lib import VectorDB
+from graphrag_workflow import GraphRagWorkflow
+from metrics import metrics
+from synthetic import generate_corpus
+
+
+def ingest(texts, ner, graphrag):
+    vector_db = VectorDB()
+    start = time.perf_counter()
+    for text in texts:
+        with metrics.timer("stage_seconds", stage="ner"):
+            entities = ner.extract_entities(text)
+        with metrics.timer("stage_seconds", stage="relations"):
+            ner.extract_relationships(text, entities)
+        with metrics.timer("stage_seconds", stage="chunk_embed"):
+            chunks = graphrag.chunk_and_embed_news(text)
+        with metrics.timer("stage_seconds", stage="vector_append"):
+            vector_db.add_embeddings(chunks)
+    return time.perf_counter() - start
+
+
+def timer_cost(calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        with metrics.timer("bench_seconds"):
+            pass
+    return (time.perf_counter() - start) / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=100)
+    parser.add_argument("--sentences", type=int, default=40)
+    parser.add_argument("--rounds", type=int, default=3, help="Runs per mode; the fastest counts.")
+    parser.add_argument("--interval", type=float, default=0.01, help="Seconds between profiler samples.")
+    parser.add_argument("--profile-dir", help="Write the profiled run's per-stage collapsed stacks here.")
+    args = parser.parse_args()
+
+    texts = [text for text, _ in generate_corpus(args.articles, args.sentences)]
+    with tempfile.TemporaryDirectory() as tmp:
+        ner = CustomNer(spacy.load(save_ruler_model(os.path.join(tmp, "ruler"))))
+    graphrag = GraphRagWorkflow("hash", embeddings=HashEmbeddings(), ner=ner, cache_path=None, chunker="window")
+    ingest(texts[:10], ner, graphrag)  # warm up
+
+    calls = 200000
+    metrics.enabled = False
+    disabled_cost = timer_cost(calls)
+    metrics.enabled = True
+    enabled_cost = timer_cost(calls)
+    print(f"one timer: {disabled_cost * 1e9:.0f} ns disabled, {enabled_cost * 1e9:.0f} ns enabled")
+
+    print(f"\n{'mode':<20} {'articles/s':>10} {'overhead':>9}")
+    baseline = None
+    for mode in ("disabled", "enabled", "enabled + profiler"):
+        metrics.enabled = mode != "disabled"
+        best = None
+        for _ in range(args.rounds):
+            metrics.reset()
+            if mode == "enabled + profiler":
+                metrics.start_profiler(args.interval)
+            elapsed = ingest(texts, ner, graphrag)
+            profiler = metrics.stop_profiler()
+            best = elapsed if best is None else min(best, elapsed)
+        baseline = baseline or best
+        print(f"{mode:<20} {len(texts) / best:10.1f} {best / baseline - 1:9.1%}")
+
+    print(f"\nprofiler samples per stage: {profiler.stats()}")
+    if args.profile_dir:
+        print(f"wrote {', '.join(profiler.write(args.profile_dir))}")
+
+    print(f"\n{'timer':<40} {'count':>7} {'p50 ms':>8} {'p99 ms':>8} {'total s':>8}")
+    for histogram in sorted(metrics.snapshot()["histograms"], key=lambda h: -h["sum"]):
+        if not histogram["name"].endswith("_seconds"):
+            continue
+        name = histogram["name"] + "".join(f" {key}={value}" for key, value in histogram["labels"].items())
+        print(
+            f"{name:<40} {histogram['count']:7d} {histogram['p50'] * 1000:8.3f} "
+            f"{histogram['p99'] * 1000:8.3f} {histogram['sum']:8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Measures NER throughput in documents/sec for the single-article path and the
+batched nlp.pipe path.
+
+Usage:
+    python benchmarks/bench_ner_batch.py --articles 64 --batch-size 16 --n-process 1 2 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import spacy
+
+from custom_ner import CustomNer
+from synthetic import generate_corpus
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="en_core_web_trf")
+    parser.add_argument("--articles", type=int, default=64)
+    parser.add_argument("--sentences", type=int, default=30, help="Sentences per article.")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--n-process", type=int, nargs="+", default=[1])
+    args = parser.parse_args()
+
+    ner = CustomNer(nlp=spacy.load(args.model))
+    texts = [text for text, _ in generate_corpus(args.articles, args.sentences)]
+
+    # Warm up, so model initialisation is not counted against the first path
+    ner.extract_entities(texts[0])
+
+    _, full_time = timed(lambda: [ner.nlp(text) for text in texts])
+    print(f"single, full pipeline: {args.articles / full_time:8.2f} docs/s")
+
+    single, single_time = timed(lambda: [ner.extract_entities(text) for text in texts])
+    print(f"single, NER pipeline:  {args.articles / single_time:8.2f} docs/s")
+
+    for n_process in args.n_process:
+        batched, batch_time = timed(
+            lambda: ner.extract_entities_batch(texts, batch_size=args.batch_size, n_process=n_process)
+        )
+        if [result["entities"] for result in batched] != single:
+            print(f"warning: batched entities differ from the single-article path (n_process={n_process})")
+        print(f"batched, n_process={n_process}: {args.articles / batch_time:8.2f} docs/s")
+
+
+if __name__ == "__main__":
+    main()
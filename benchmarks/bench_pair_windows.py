@@ -0,0 +1,54 @@
+"""
+Compares all-pairs relationship extraction with sentence/token windowed pairing
+as articles grow longer.
+
+Usage:
+    python benchmarks/bench_pair_windows.py --sizes 25 50 100 200 400 --window 1
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import spacy
+
+from custom_ner import CustomNer
+from synthetic import generate_article
+
+
+def measure(func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[25, 50, 100, 200, 400], help="Sentences per article.")
+    parser.add_argument("--window", type=int, default=1)
+    parser.add_argument("--window-unit", choices=["sentence", "token"], default="sentence")
+    args = parser.parse_args()
+
+    ner = CustomNer(nlp=spacy.blank("en"))
+    modes = [
+        ("all pairs", {}),
+        (f"{args.window_unit} window {args.window}", {"window": args.window, "window_unit": args.window_unit}),
+    ]
+
+    print(f"{'entities':>8}  {'mode':<20} {'seconds':>9} {'peak KiB':>9} {'relationships':>13}")
+    for n_sentences in args.sizes:
+        text, entities = generate_article(n_sentences, seed=n_sentences)
+        for name, kwargs in modes:
+            relationships, elapsed, peak = measure(lambda: ner.extract_relationships(text, entities, **kwargs))
+            print(f"{len(entities):>8}  {name:<20} {elapsed:>9.4f} {peak / 1024:>9.1f} {len(relationships):>13}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+End-to-end ingest of a local news site: the two-pass flow (fetch, NER,
+relations and graph writes per article, then chunk and embed everything)
+versus the streaming IngestPipeline. Graph writes are simulated with a fixed
+latency per article and embeddings come from HashEmbeddings, so no database
+or model server is needed. Prints the pipeline's per-stage summary and the
+peak resident memory of each run.
+
+Usage:
+    python benchmarks/bench_pipeline.py --articles 200 --ner-model ruler
+    python benchmarks/bench_pipeline.py --articles 200 --ner-model en_core_web_sm --skip-two-pass
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import spacy
+
+from article_fetcher import ArticleFetcher
+from custom_ner import CustomNer
+from embeddings import HashEmbeddings
+from faiss_lib import VectorDB
+from graphrag_workflow import GraphRagWorkflow
+from pipeline import build_ingest_pipeline
+from bench_fetch import build_articles
+from local_news_server import LocalNewsServer
+from synthetic import ORGS, PEOPLE, PLACES, generate_corpus
+
+
+class SimulatedGraphDB:
+    """Stands in for Neo4jAuraDB, sleeping for a fixed time per write."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.rows = 0
+
+    def store_relationships_auradb(self, relationships, published=None):
+        time.sleep(self.latency)
+        self.rows += len(relationships)
+        return True
+
+
+def save_ruler_model(path):
+    """Saves a blank English pipeline that tags the synthetic names with an entity ruler."""
+    nlp = spacy.blank("en")
+    nlp.add_pipe("sentencizer")
+    ruler = nlp.add_pipe("entity_ruler")
+    ruler.add_patterns(
+        [{"label": label, "pattern": name} for names, label in ((PEOPLE, "PERSON"), (ORGS, "ORG"), (PLACES, "GPE")) for name in names]
+    )
+    nlp.to_disk(path)
+    return path
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--sentences", type=int, default=40)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds of simulated network latency per request.")
+    parser.add_argument("--graph-latency", type=float, default=0.02, help="Seconds per simulated graph write.")
+    parser.add_argument("--embed-latency", type=float, default=0.02, help="Seconds per simulated embedding request.")
+    parser.add_argument("--ner-model", default="ruler", help="A spaCy model name or path, or 'ruler' for a synthetic entity ruler.")
+    parser.add_argument("--chunker", default="window")
+    parser.add_argument("--queue-size", type=int, default=16)
+    parser.add_argument("--ner-workers", type=int, default=2)
+    parser.add_argument("--relation-workers", type=int, default=4)
+    parser.add_argument("--ner-batch-size", type=int, default=8, help="Most articles per NER nlp.pipe call.")
+    parser.add_argument("--window", type=int, default=1, help="Sentence window for relation extraction; 0 for all pairs.")
+    parser.add_argument("--skip-two-pass", action="store_true")
+    args = parser.parse_args()
+
+    texts = [text for text, _ in generate_corpus(args.articles, args.sentences)]
+    with tempfile.TemporaryDirectory() as tmp, LocalNewsServer(texts, latency=args.latency) as server:
+        model = save_ruler_model(os.path.join(tmp, "ruler")) if args.ner_model == "ruler" else args.ner_model
+        ner = CustomNer(spacy.load(model))
+        graphrag = GraphRagWorkflow(
+            "hash", embeddings=HashEmbeddings(latency=args.embed_latency), ner=ner, cache_path=None, chunker=args.chunker
+        )
+        fetcher = ArticleFetcher(max_workers=8, per_host_rate=None)
+
+        if not args.skip_two_pass:
+            graph_db = SimulatedGraphDB(args.graph_latency)
+            vector_db = VectorDB()
+            path = os.path.join(tmp, "two_pass")
+            vector_db.save_index(path)
+            start = time.perf_counter()
+            parsed_articles = []
+            for _, text in fetcher.fetch(build_articles(server.urls)):
+                if not text:
+                    continue
+                entities = ner.extract_entities(text)
+                graph_db.store_relationships_auradb(ner.extract_relationships(text, entities, window=args.window or None))
+                parsed_articles.append(text)
+            for text in parsed_articles:
+                vector_db.add_embeddings(graphrag.chunk_and_embed_news(text))
+                vector_db.commit(path)
+            elapsed = time.perf_counter() - start
+            print(
+                f"two-pass: {len(parsed_articles)} articles, {vector_db.ntotal} chunks in {elapsed:.1f}s "
+                f"({len(parsed_articles) / elapsed:.1f} articles/s), peak RSS {peak_rss_mb():.0f} MB"
+            )
+
+        graph_db = SimulatedGraphDB(args.graph_latency)
+        vector_db = VectorDB()
+        path = os.path.join(tmp, "pipeline")
+        vector_db.save_index(path)
+        pipeline = build_ingest_pipeline(
+            graph_db, graphrag, vector_db, fetcher, index_path=path, ner_model=model,
+            workers={"ner": args.ner_workers, "relations": args.relation_workers}, queue_size=args.queue_size,
+            window=args.window or None, ner_batch_size=args.ner_batch_size,
+        )
+        start = time.perf_counter()
+        stats = pipeline.run(build_articles(server.urls))
+        elapsed = time.perf_counter() - start
+        done = stats["vector_append"]["processed"]
+        print(
+            f"pipeline: {done} articles, {vector_db.ntotal} chunks in {elapsed:.1f}s "
+            f"({done / elapsed:.1f} articles/s), peak RSS {peak_rss_mb():.0f} MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
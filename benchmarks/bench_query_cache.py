@@ -0,0 +1,127 @@
+"""
+Query latency of GraphRagWorkflow with and without the query cache, on a
+Zipf-distributed stream of repeated news queries with ingest writes mixed in.
+
+Each query parses entities, fetches their graph neighborhood and retrieves
+chunks. NER, the graph and the embedding model are simulated with fixed
+latencies; retrieval runs against a real VectorDB. Every --ingest-every
+queries an article about random entities is "ingested", which invalidates
+the cache entries for those entities.
+
+Usage:
+    python benchmarks/bench_query_cache.py --queries 2000 --ner-latency 0.3 --graph-latency 0.05
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from embeddings import HashEmbeddings
+from faiss_lib import VectorDB
+from graphrag_workflow import GraphRagWorkflow
+from query_cache import QueryCache
+from synthetic import ORGS, PEOPLE, PLACES, generate_corpus
+
+NAMES = PEOPLE + ORGS + PLACES
+TEMPLATES = ["Fetch news related to {}", "What is the latest on {}?", "{} news today", "Why is {} in the news"]
+
+
+class SimulatedNer:
+    """Stands in for CustomNer.parse_query: finds the synthetic names after a fixed delay."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def parse_query(self, query):
+        time.sleep(self.latency)
+        return [name for name in NAMES if name in query] or None
+
+    def parse_queries(self, queries):
+        # One delay per batch, like a single nlp.pipe forward pass
+        time.sleep(self.latency)
+        return [[name for name in NAMES if name in query] or None for query in queries]
+
+
+class SimulatedGraph:
+    """Stands in for Neo4jAuraDB's related-node lookup and its write notifications."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.write_listeners = []
+
+    def add_write_listener(self, callback):
+        self.write_listeners.append(callback)
+
+    def fetch_related_nodes(self, key_entities):
+        time.sleep(self.latency)
+        return [{"source": e, "relationship": "IS_RELATED_TO", "target": "x", "target_labels": ["ORG"]} for e in key_entities]
+
+    def store(self, entity_names):
+        for callback in self.write_listeners:
+            callback(set(entity_names))
+
+    def close(self):
+        pass
+
+
+def run(label, graphrag, graph, queries, ingest_every, rng):
+    latencies = []
+    for i, query in enumerate(queries):
+        if ingest_every and i and i % ingest_every == 0:
+            touched = rng.sample(NAMES, 3)
+            graph.store(touched)
+            graphrag.query_cache.invalidate_chunks(touched)
+        start = time.perf_counter()
+        entities = graphrag.parse_query(query)
+        graphrag.related_nodes(entities)
+        graphrag.retrieve_chunks(query, top_k=5, key_entities=entities)
+        latencies.append(time.perf_counter() - start)
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    print(f"{label:<10} p50 {p50:8.2f} ms   p95 {p95:8.2f} ms   p99 {p99:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--zipf", type=float, default=1.2, help="Zipf exponent of query popularity.")
+    parser.add_argument("--ner-latency", type=float, default=0.3)
+    parser.add_argument("--graph-latency", type=float, default=0.05)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--ingest-every", type=int, default=50)
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--uncached-queries", type=int, default=100, help="Queries timed without the cache.")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    distinct = [template.format(name) for name in NAMES for template in TEMPLATES]
+    rng.shuffle(distinct)
+    weights = [1 / (rank + 1) ** args.zipf for rank in range(len(distinct))]
+    queries = rng.choices(distinct, weights=weights, k=args.queries)
+
+    embeddings = HashEmbeddings(latency=args.embed_latency)
+    vector_db = VectorDB()
+    texts = [text for text, _ in generate_corpus(args.articles, n_sentences=10)]
+    vector_db.add_embeddings([{"text": t, "embedding": e} for t, e in zip(texts, HashEmbeddings().embed_documents(texts))])
+
+    for label, cache, n in (("uncached", QueryCache(max_entries=0), args.uncached_queries), ("cached", QueryCache(), args.queries)):
+        graph = SimulatedGraph(args.graph_latency)
+        graphrag = GraphRagWorkflow(
+            "hash", embeddings=embeddings, ner=SimulatedNer(args.ner_latency), cache_path=None, chunker="window",
+            graph_db=graph, vector_db=vector_db, query_cache=cache,
+        )
+        run(label, graphrag, graph, queries[:n], args.ingest_every, random.Random(1))
+
+    for tier, stats in graphrag.cache_stats().items():
+        print(
+            f"{tier:<14} hit ratio {stats['hit_ratio']:.3f}  size {stats['size']:5d}  "
+            f"invalidations {stats['invalidations']:5d}  evictions {stats['evictions']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
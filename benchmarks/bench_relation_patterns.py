@@ -0,0 +1,79 @@
+"""
+Compares the per-pair regex patterns with the precompiled relation pattern engine.
+
+Usage:
+    python benchmarks/bench_relation_patterns.py --articles 20 --sentences 75
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import spacy
+
+from custom_ner import CustomNer
+from synthetic import generate_corpus
+
+
+def extract_relationships_per_pair(ner, text, entities):
+    """The original extraction loop: build every pattern for each pair and search them one by one."""
+    relationships = []
+    text_lower = text.lower()
+    entity_positions = {}
+    for ent in entities:
+        start = text_lower.find(ent["text"].lower())
+        if start != -1:
+            entity_positions[ent["text"]] = (start, start + len(ent["text"]))
+
+    for i, ent1 in enumerate(entities):
+        for ent2 in entities[i + 1:]:
+            if ent1["text"] not in entity_positions or ent2["text"] not in entity_positions:
+                continue
+            ent1_start, ent1_end = entity_positions[ent1["text"]]
+            ent2_start, ent2_end = entity_positions[ent2["text"]]
+            if ent2_start > ent1_end:
+                between_text = text_lower[ent1_end:ent2_start]
+                patterns = ner.get_regex_matching_patterns(ent1, ent2)
+                for rel_type, pattern in patterns.items():
+                    if pattern and pattern.search(between_text):
+                        relationships.append(
+                            {
+                                "entity1": {"text": ent1["text"], "label": ent1["label"]},
+                                "relation": "IS_RELATED_TO" if rel_type.startswith("IS_RELATED_TO_") else rel_type,
+                                "entity2": {"text": ent2["text"], "label": ent2["label"]},
+                            }
+                        )
+    return relationships
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=20)
+    parser.add_argument("--sentences", type=int, default=75, help="Sentences per article (two entities each).")
+    args = parser.parse_args()
+
+    ner = CustomNer(nlp=spacy.blank("en"))
+    corpus = generate_corpus(args.articles, args.sentences)
+
+    start = time.perf_counter()
+    expected = [extract_relationships_per_pair(ner, text, entities) for text, entities in corpus]
+    per_pair_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [ner.extract_relationships(text, entities) for text, entities in corpus]
+    engine_time = time.perf_counter() - start
+
+    if actual != expected:
+        raise SystemExit("Relation engine output differs from the per-pair patterns.")
+
+    n_relationships = sum(len(r) for r in actual)
+    print(f"{args.articles} articles, {2 * args.sentences} entities each, {n_relationships} relationships")
+    print(f"per-pair patterns: {per_pair_time:.3f}s ({args.articles / per_pair_time:.1f} articles/s)")
+    print(f"relation engine:   {engine_time:.3f}s ({args.articles / engine_time:.1f} articles/s)")
+    print(f"speedup: {per_pair_time / engine_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Throughput and latency of service.py with and without micro-batching.
+
+Runs the QueryService in-process on a local port against a GraphRagWorkflow
+whose NER, graph and embedding model are simulated with fixed per-call
+latencies (a batched call costs the same as a single one, as a GPU forward
+pass roughly does), and a real VectorDB. --clients concurrent clients send
+queries in a closed loop.
+
+Usage:
+    python benchmarks/bench_service.py --clients 32 --requests 640 --ner-latency 0.05 --embed-latency 0.02
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+
+from bench_query_cache import NAMES, TEMPLATES, SimulatedGraph, SimulatedNer
+from embeddings import HashEmbeddings
+from faiss_lib import VectorDB
+from graphrag_workflow import GraphRagWorkflow
+from query_cache import QueryCache
+from service import QueryService
+from synthetic import generate_corpus
+
+
+async def wait_ready(session, url):
+    start = time.perf_counter()
+    while True:
+        async with session.get(url + "/readyz") as response:
+            if response.status == 200:
+                return time.perf_counter() - start
+        await asyncio.sleep(0.01)
+
+
+async def run(label, loader, queries, clients, port, **service_options):
+    service = QueryService(loader, **service_options)
+    runner = web.AppRunner(service.app())
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    url = f"http://127.0.0.1:{port}"
+
+    latencies, statuses = [], {}
+    pending = list(queries)
+
+    async def client(session):
+        while pending:
+            query = pending.pop()
+            start = time.perf_counter()
+            async with session.post(url + "/search", json={"query": query, "top_k": 5}) as response:
+                await response.read()
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+            latencies.append(time.perf_counter() - start)
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=clients)) as session:
+        load_seconds = await wait_ready(session, url)
+        start = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+        async with session.get(url + "/stats") as response:
+            stats = await response.json()
+    await runner.cleanup()
+
+    p50, p95 = np.percentile(np.array(latencies) * 1000, [50, 95])
+    print(
+        f"{label:<12} {len(queries) / elapsed:7.1f} req/s   p50 {p50:7.1f} ms   p95 {p95:7.1f} ms   "
+        f"mean batch {stats['batching']['mean_batch_size']:5.1f}   statuses {statuses}   ready after {load_seconds:.2f} s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=640)
+    parser.add_argument("--ner-latency", type=float, default=0.05)
+    parser.add_argument("--graph-latency", type=float, default=0.01)
+    parser.add_argument("--embed-latency", type=float, default=0.02)
+    parser.add_argument("--startup-latency", type=float, default=0.5, help="Seconds the simulated model load takes.")
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    # Distinct queries, so the query cache does not hide the batching
+    queries = [f"{rng.choice(TEMPLATES).format(rng.choice(NAMES))} #{i}" for i in range(args.requests)]
+    texts = [text for text, _ in generate_corpus(args.articles, n_sentences=10)]
+    embeddings = HashEmbeddings().embed_documents(texts)
+
+    def loader():
+        time.sleep(args.startup_latency)
+        vector_db = VectorDB()
+        vector_db.add_embeddings([{"text": t, "embedding": e} for t, e in zip(texts, embeddings)])
+        return GraphRagWorkflow(
+            "hash", embeddings=HashEmbeddings(latency=args.embed_latency), ner=SimulatedNer(args.ner_latency),
+            cache_path=None, chunker="window", graph_db=SimulatedGraph(args.graph_latency), vector_db=vector_db,
+            query_cache=QueryCache(max_entries=0),
+        )
+
+    for label, options in (
+        ("unbatched", {"max_batch": 1, "batch_window": 0.0}),
+        ("batched", {"max_batch": 32, "batch_window": 0.005}),
+    ):
+        asyncio.run(run(label, loader, queries, args.clients, args.port, **options))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+One VectorDB over the whole corpus versus a ShardedVectorDB with daily shards,
+on --days days of synthetic clustered vectors, --per-day per day.
+
+Reports:
+- ingest time and the vectors each store keeps resident under the retention
+  policy (the single store keeps everything, having no way to expire content);
+- query latency for all retained content and for the last 48 hours, with the
+  single store's time filter applied inside FAISS by an ID selector, and the
+  shards searched in parallel (--workers) and sequentially (1 worker), which
+  only differ with several cores;
+- recall@k of the merged shard results against the single store over the
+  same retained vectors, which should be 1.0 for flat indexes;
+- the time retention takes to expire a day when the next one starts.
+
+Usage:
+    python benchmarks/bench_shards.py --days 60 --per-day 5000 --retention-days 30
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from bench_vector_index import synthetic_vectors
+from faiss_lib import ShardedVectorDB, VectorDB
+
+DAY = 86400.0
+
+
+def chunk_batches(vectors, published, batch_size=1000):
+    # Texts are the vectors' positions, which identify hits across the stores
+    for i in range(0, len(vectors), batch_size):
+        yield [
+            {"embedding": v, "text": str(i + j), "published": p}
+            for j, (v, p) in enumerate(zip(vectors[i:i + batch_size], published[i:i + batch_size]))
+        ]
+
+
+def time_queries(retrieve, queries, k, **filters):
+    rows, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        rows.append(retrieve(query, top_k=k, **filters))
+        latencies.append(time.perf_counter() - start)
+    return rows, np.array(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, default=60)
+    parser.add_argument("--per-day", type=int, default=5000)
+    parser.add_argument("--retention-days", type=float, default=30)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index-spec", default="Flat")
+    parser.add_argument("--workers", type=int, default=8)
+    args = parser.parse_args()
+
+    n = args.days * args.per_day
+    data = synthetic_vectors(n + args.queries, args.dim)
+    vectors, queries = data[:n], data[n:]
+    now = time.time()
+    # Oldest first, as a crawl that has been running for --days days would have added them
+    published = now - (args.days - np.arange(n) / args.per_day) * DAY
+
+    single = VectorDB(embedding_dim=args.dim, index_spec=args.index_spec)
+    start = time.perf_counter()
+    for chunks in chunk_batches(vectors, published):
+        single.add_embeddings(chunks)
+    single_ingest = time.perf_counter() - start
+
+    sharded = ShardedVectorDB(
+        "day", retention=args.retention_days * DAY, search_workers=args.workers,
+        embedding_dim=args.dim, index_spec=args.index_spec,
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "shards")
+        sharded.save_index(path)
+        start = time.perf_counter()
+        for chunks in chunk_batches(vectors, published):
+            sharded.add_embeddings(chunks)
+        sharded.commit(path)
+        sharded_ingest = time.perf_counter() - start
+        print(f"single: {single.ntotal} vectors resident, ingest {single_ingest:.1f}s")
+        print(
+            f"sharded: {sharded.ntotal} vectors resident in {len(sharded.shards)} shards, {sharded.dropped} past "
+            f"retention dropped, ingest and commit {sharded_ingest:.1f}s"
+        )
+
+        retained_since = min(sharded.shards)
+
+        def single_retained(query, top_k, since=None):
+            # The single store can only emulate retention with a filter on every query
+            return single.retrieve_relevant_chunks(query, top_k, since=since or retained_since)
+
+        sequential = ShardedVectorDB("day", search_workers=1)
+        sequential.shards = sharded.shards
+        print(f"\n{'query':<16} {'store':<22} {'shards':>6} {'p50 ms':>8} {'p95 ms':>8} {f'recall@{args.k}':>10}")
+        for name, filters in (("all retained", {}), ("last 48 hours", {"since": now - 2 * DAY})):
+            truth_rows, latencies = time_queries(single_retained, queries, args.k, **filters)
+            truth = [{chunk["text"] for chunk in row} for row in truth_rows]
+            print(f"{name:<16} {'single + time filter':<22} {1:>6} {np.percentile(latencies, 50):8.2f} {np.percentile(latencies, 95):8.2f} {1.0:10.3f}")
+            searched = len(sharded.shards_between(since=filters.get("since")))
+            for label, store in ((f"sharded, {args.workers} workers", sharded), ("sharded, sequential", sequential)):
+                rows, latencies = time_queries(store.retrieve_relevant_chunks, queries, args.k, **filters)
+                recall = np.mean([len({chunk["text"] for chunk in row} & true) / len(true) for row, true in zip(rows, truth)])
+                print(f"{name:<16} {label:<22} {searched:>6} {np.percentile(latencies, 50):8.2f} {np.percentile(latencies, 95):8.2f} {recall:10.3f}")
+
+        # A day later the oldest retained day expires: a directory removal, not a rebuild
+        start = time.perf_counter()
+        expired = sharded.expire(now=now + DAY)
+        print(f"\nexpire: dropped {expired} in {(time.perf_counter() - start) * 1000:.1f} ms, {sharded.ntotal} vectors resident")
+        sharded.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+Cold-start cost of the CLI and service entry points.
+
+Each measurement runs in a fresh interpreter:
+
+- imports: `python -X importtime -c <import>` for each entry path, reporting the
+  total import time, the process wall time and the slowest top-level imports.
+- first calls: import time plus the latency of the first vector search and the
+  first query NER, which is where lazily imported libraries and the spaCy
+  pipeline are now loaded.
+- service: time from launching service.py until /readyz returns 200, and from
+  SIGTERM until the process exits.
+
+Paths whose dependencies are not installed are reported as failed. Use --json
+to keep the numbers for comparison across changes.
+
+Usage:
+    python benchmarks/bench_startup.py --spacy-model en_core_web_trf --repeat 3 --json startup.json
+    python benchmarks/bench_startup.py --spacy-model blank:en
+"""
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+IMPORT_PATHS = {
+    "vector store": "from faiss_lib import VectorDB",
+    "workflow": "from graphrag_workflow import GraphRagWorkflow",
+    "graph": "from neo4j_auradb import Neo4jAuraDB",
+    "hub": "from imports import *",
+    "service": "import service",
+    "cli": (
+        "from imports import *\n"
+        "from imports import ChatGoogleGenerativeAI, Config, GraphRagWorkflow, Neo4jAuraDB, Neo4jGraph, OllamaEmbeddings, VectorDB"
+    ),
+}
+
+FIRST_CALLS = {
+    "vector search": (
+        "from embeddings import HashEmbeddings\nfrom faiss_lib import VectorDB",
+        "db = VectorDB()\n"
+        "db.add_embeddings([{'text': 'Tim Cook met Joe Biden', 'embedding': HashEmbeddings().embed_query('Tim Cook met Joe Biden')}])\n"
+        "db.retrieve_relevant_chunks(np.asarray(HashEmbeddings().embed_query('Tim Cook'), dtype=np.float32))",
+    ),
+    "query NER": (
+        "from model_registry import get_ner",
+        "get_ner(MODEL).parse_query('What is the latest news about Tim Cook and Apple in California?')",
+    ),
+}
+
+FIRST_CALL_SCRIPT = """
+import json, time
+t0 = time.perf_counter()
+import numpy as np
+{setup}
+t1 = time.perf_counter()
+MODEL = {model!r}
+{call}
+t2 = time.perf_counter()
+print(json.dumps({{"import": t1 - t0, "first_call": t2 - t1}}))
+"""
+
+
+def parse_importtime(stderr):
+    """Returns the total import time and the top-level imports, slowest first, from -X importtime output."""
+    top_level = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):  # indentation marks nested imports
+            top_level.append((name.strip(), int(cumulative) / 1e6))
+    top_level.sort(key=lambda item: item[1], reverse=True)
+    return sum(seconds for _, seconds in top_level), top_level
+
+
+def measure_imports(statement):
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement], cwd=ROOT, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1]}
+    total, top_level = parse_importtime(result.stderr)
+    return {"import": total, "wall": wall, "top": top_level[:5]}
+
+
+def measure_first_call(setup, call, model):
+    script = FIRST_CALL_SCRIPT.format(setup=setup, call=call, model=model)
+    result = subprocess.run([sys.executable, "-c", script], cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        return {"error": result.stderr.strip().splitlines()[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_service(model, port, index_path):
+    command = [
+        sys.executable, os.path.join(ROOT, "service.py"), "--port", str(port), "--index", index_path,
+        "--spacy-model", model, "--stub-embeddings", "--neo4j-uri", "",
+    ]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    url = f"http://127.0.0.1:{port}"
+    listening = None
+    try:
+        while True:
+            if process.poll() is not None:
+                return {"error": process.stderr.read().strip().splitlines()[-1]}
+            try:
+                with urllib.request.urlopen(url + "/readyz", timeout=1) as response:
+                    if response.status == 200:
+                        break
+            except urllib.error.HTTPError as e:
+                if listening is None:
+                    listening = time.perf_counter() - start
+                body = json.loads(e.read())
+                if body["status"].startswith("load failed"):
+                    return {"error": body["status"]}
+            except OSError:
+                pass
+            time.sleep(0.02)
+        ready = time.perf_counter() - start
+    finally:
+        stop = time.perf_counter()
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=60)
+    return {"listening": listening if listening is not None else ready, "ready": ready, "shutdown": time.perf_counter() - stop}
+
+
+def build_index(path):
+    from embeddings import HashEmbeddings
+    from faiss_lib import VectorDB
+    from synthetic import generate_corpus
+
+    texts = [text for text, _ in generate_corpus(100, n_sentences=10)]
+    vector_db = VectorDB()
+    vector_db.add_embeddings([{"text": t, "embedding": e} for t, e in zip(texts, HashEmbeddings().embed_documents(texts))])
+    vector_db.save_index(path)
+
+
+def median(runs, key):
+    values = [run[key] for run in runs if key in run]
+    return statistics.median(values) if values else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--spacy-model", default="en_core_web_trf", help='A spaCy model, or "blank:en".')
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement; medians are reported.")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--skip-service", action="store_true")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args()
+    results = {"python": sys.version.split()[0], "spacy_model": args.spacy_model, "imports": {}, "first_calls": {}}
+
+    print(f"{'import path':<14} {'import ms':>10} {'wall ms':>10}   slowest top-level imports")
+    for name, statement in IMPORT_PATHS.items():
+        runs = [measure_imports(statement) for _ in range(args.repeat)]
+        if "error" in runs[0]:
+            print(f"{name:<14} failed: {runs[0]['error']}")
+            results["imports"][name] = runs[0]
+            continue
+        summary = {"import": median(runs, "import"), "wall": median(runs, "wall"), "top": runs[-1]["top"]}
+        results["imports"][name] = summary
+        top = ", ".join(f"{module} {seconds * 1000:.0f}" for module, seconds in summary["top"][:3])
+        print(f"{name:<14} {summary['import'] * 1000:10.1f} {summary['wall'] * 1000:10.1f}   {top}")
+
+    print(f"\n{'first call':<14} {'import ms':>10} {'call ms':>10}")
+    for name, (setup, call) in FIRST_CALLS.items():
+        runs = [measure_first_call(setup, call, args.spacy_model) for _ in range(args.repeat)]
+        if "error" in runs[0]:
+            print(f"{name:<14} failed: {runs[0]['error']}")
+            results["first_calls"][name] = runs[0]
+            continue
+        summary = {"import": median(runs, "import"), "first_call": median(runs, "first_call")}
+        results["first_calls"][name] = summary
+        print(f"{name:<14} {summary['import'] * 1000:10.1f} {summary['first_call'] * 1000:10.1f}")
+
+    if not args.skip_service:
+        with tempfile.TemporaryDirectory() as tmp:
+            index_path = os.path.join(tmp, "faiss_index")
+            build_index(index_path)
+            runs = [measure_service(args.spacy_model, args.port, index_path) for _ in range(args.repeat)]
+        if "error" in runs[0]:
+            print(f"\nservice failed: {runs[0]['error']}")
+            results["service"] = runs[0]
+        else:
+            results["service"] = {key: median(runs, key) for key in ("listening", "ready", "shutdown")}
+            print(
+                f"\nservice: listening after {results['service']['listening'] * 1000:.0f} ms, ready after "
+                f"{results['service']['ready'] * 1000:.0f} ms, shut down in {results['service']['shutdown'] * 1000:.0f} ms"
+            )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
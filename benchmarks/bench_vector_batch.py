@@ -0,0 +1,58 @@
+"""
+Query throughput of VectorDB with one FAISS call per query versus one
+search_batch call per batch, at several batch sizes.
+
+Usage:
+    python benchmarks/bench_vector_batch.py --vectors 100000 --queries 2048 --batch-sizes 1 32 256
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from faiss_lib import VectorDB
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=2048)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--index-spec", default="Flat")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 32, 256])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    db = VectorDB(embedding_dim=args.dim, index_spec=args.index_spec)
+    for start in range(0, args.vectors, 10000):
+        vectors = rng.normal(size=(min(10000, args.vectors - start), args.dim)).astype(np.float32)
+        db.add_embeddings([{"embedding": v, "text": f"chunk {start + i}"} for i, v in enumerate(vectors)])
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    start = time.perf_counter()
+    for query in queries:
+        db.retrieve_relevant_chunks(query, top_k=args.k)
+    elapsed = time.perf_counter() - start
+    print(f"per-query retrieve_relevant_chunks: {args.queries / elapsed:10.1f} queries/s")
+
+    for batch_size in args.batch_sizes:
+        start = time.perf_counter()
+        for i in range(0, args.queries, batch_size):
+            db.search_batch(queries[i:i + batch_size], args.k)
+        elapsed = time.perf_counter() - start
+        print(f"search_batch, batch size {batch_size:>4}:   {args.queries / elapsed:10.1f} queries/s")
+
+        start = time.perf_counter()
+        for i in range(0, args.queries, batch_size):
+            db.retrieve_relevant_chunks_batch(queries[i:i + batch_size], args.k)
+        elapsed = time.perf_counter() - start
+        print(f"  with texts:                       {args.queries / elapsed:10.1f} queries/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Recall@k versus query latency for VectorDB index specs against the flat
+baseline, on synthetic clustered 768-d vectors.
+
+Usage:
+    python benchmarks/bench_vector_index.py --vectors 200000 --queries 1000 --k 10
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import numpy as np
+
+from faiss_lib import VectorDB
+
+# (index spec, search parameter name, values swept at query time)
+CONFIGS = [
+    ("HNSW32", "ef_search", [16, 32, 64, 128]),
+    ("IVF1024,Flat", "nprobe", [1, 4, 16, 64]),
+    ("IVF1024,PQ64", "nprobe", [1, 4, 16, 64]),
+]
+
+
+def synthetic_vectors(n, dim, n_clusters=256, seed=0):
+    """Gaussian clusters, which resemble topic structure in text embeddings more than uniform noise does."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, size=n)
+    return centers[labels] + 0.3 * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def build(spec, vectors, **params):
+    db = VectorDB(embedding_dim=vectors.shape[1], index_spec=spec, **params)
+    start = time.perf_counter()
+    for i in range(0, len(vectors), 10000):
+        db.add_embeddings([{"embedding": v, "text": ""} for v in vectors[i:i + 10000]])
+    db._ensure_trained()
+    return db, time.perf_counter() - start
+
+
+def run_queries(db, queries, k, **params):
+    ids = np.full((len(queries), k), -1, dtype=np.int64)
+    start = time.perf_counter()
+    for row, query in enumerate(queries):
+        search_params = db._search_parameters(**params)
+        if search_params is None:
+            _, indices = db.index.search(query.reshape(1, -1), k)
+        else:
+            _, indices = db.index.search(query.reshape(1, -1), k, params=search_params)
+        ids[row] = indices[0]
+    return ids, (time.perf_counter() - start) / len(queries)
+
+
+def recall_at_k(ids, truth):
+    return np.mean([len(set(row[row != -1]) & set(true_row)) / len(true_row) for row, true_row in zip(ids, truth)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    data = synthetic_vectors(args.vectors + args.queries, args.dim)
+    vectors, queries = data[:args.vectors], data[args.vectors:]
+
+    flat, build_time = build("Flat", vectors)
+    truth, flat_latency = run_queries(flat, queries, args.k)
+    print(f"{'index':<14} {'param':<14} {'build s':>8} {'recall@' + str(args.k):>10} {'ms/query':>9}")
+    print(f"{'Flat':<14} {'-':<14} {build_time:>8.1f} {1.0:>10.3f} {flat_latency * 1000:>9.3f}")
+
+    for spec, param, values in CONFIGS:
+        db, build_time = build(spec, vectors)
+        for value in values:
+            ids, latency = run_queries(db, queries, args.k, **{param: value})
+            print(f"{spec:<14} {f'{param}={value}':<14} {build_time:>8.1f} {recall_at_k(ids, truth):>10.3f} {latency * 1000:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
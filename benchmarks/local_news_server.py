@@ -0,0 +1,97 @@
+"""
+A local HTTP stand-in for a news site, serving canned article HTML.
+"""
+import html
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+def render_article_html(title, text):
+    """Renders an article as a minimal news page newspaper can parse."""
+    paragraphs = "\n".join(f"<p>{html.escape(sentence.strip())}.</p>" for sentence in text.split(".") if sentence.strip())
+    return (
+        "<html><head>"
+        f"<title>{html.escape(title)}</title>"
+        f'<meta property="og:title" content="{html.escape(title)}">'
+        "</head><body><article>"
+        f"<h1>{html.escape(title)}</h1>\n{paragraphs}"
+        "</article></body></html>"
+    )
+
+
+class LocalNewsServer:
+    """
+    Serves canned articles at /articles/<n>.html on 127.0.0.1.
+
+    Args:
+        texts: The article texts to serve.
+        latency: Seconds every response is delayed by, to simulate network latency.
+        fail_first: The number of requests per article answered with a 503 before it is served.
+    """
+
+    def __init__(self, texts, latency=0.0, fail_first=0):
+        self.pages = {
+            f"/articles/{i}.html": render_article_html(f"Article {i}", text).encode("utf-8")
+            for i, text in enumerate(texts)
+        }
+        self.latency = latency
+        self.fail_first = fail_first
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                # Like a real site, ignore the query string (e.g. tracking parameters)
+                path = self.path.split("?", 1)[0]
+                with server._lock:
+                    count = server.requests[path] = server.requests.get(path, 0) + 1
+                if server.latency:
+                    time.sleep(server.latency)
+                page = server.pages.get(path)
+                if page is None:
+                    self.send_error(404)
+                    return
+                if count <= server.fail_first:
+                    self.send_error(503)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    @property
+    def base_url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def urls(self):
+        return [self.base_url + path for path in self.pages]
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
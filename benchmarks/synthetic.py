@@ -0,0 +1,76 @@
+import random
+
+
+PEOPLE = [
+    "Donald Trump", "Joe Biden", "Kamala Harris", "Emmanuel Macron", "Olaf Scholz",
+    "Xi Jinping", "Narendra Modi", "Elon Musk", "Tim Cook", "Sundar Pichai",
+    "Ursula von der Leyen", "Keir Starmer", "Volodymyr Zelensky", "Jerome Powell",
+]
+ORGS = [
+    "Apple", "Google", "Tesla", "NATO", "the United Nations", "the Federal Reserve",
+    "Microsoft", "OpenAI", "the European Union", "Goldman Sachs", "Reuters", "Pfizer",
+]
+PLACES = [
+    "Washington", "New York", "Paris", "Berlin", "Beijing", "New Delhi", "London",
+    "Kyiv", "Brussels", "California", "Texas", "Tokyo", "Canada", "Mexico",
+]
+CONNECTORS = [
+    "met with", "spoke to", "works for", "is based in", "was born in", "is a member of",
+    "partnered with", "is the leader of", "visited", "criticized", "is headquartered in",
+    "said on Tuesday that", "announced a deal with", "traveled to", "is related to",
+]
+FILLERS = [
+    "according to officials familiar with the matter",
+    "in a statement released late on Monday",
+    "amid growing concern over trade and security",
+    "as markets reacted to the news",
+    "while negotiations continued behind closed doors",
+]
+
+
+def generate_article(n_sentences=40, seed=0):
+    """
+    Generates a synthetic news article.
+
+    Returns:
+        A tuple of (text, entities) where entities is a list of dictionaries in
+        order of appearance, with the same keys extract_entities returns. Tokens
+        are whitespace-separated words.
+    """
+    rng = random.Random(seed)
+    pools = [(PEOPLE, "PERSON"), (ORGS, "ORG"), (PLACES, "GPE")]
+    parts = []
+    entities = []
+    offset = 0
+    token = 0
+    for sent in range(n_sentences):
+        (pool1, label1), (pool2, label2) = rng.choice(pools), rng.choice(pools)
+        pieces = [
+            (rng.choice(pool1), label1),
+            (rng.choice(CONNECTORS), None),
+            (rng.choice(pool2), label2),
+            (rng.choice(FILLERS) + ".", None),
+        ]
+        for piece, label in pieces:
+            n_tokens = len(piece.split())
+            if label is not None:
+                entities.append(
+                    {
+                        "text": piece,
+                        "label": label,
+                        "start_char": offset,
+                        "end_char": offset + len(piece),
+                        "token_start": token,
+                        "token_end": token + n_tokens,
+                        "sent": sent,
+                    }
+                )
+            parts.append(piece)
+            offset += len(piece) + 1
+            token += n_tokens
+    return " ".join(parts), entities
+
+
+def generate_corpus(n_articles, n_sentences=40, seed=0):
+    """Generates a list of synthetic (text, entities) articles."""
+    return [generate_article(n_sentences, seed + i) for i in range(n_articles)]
@@ -0,0 +1,216 @@
+import re
+
+import numpy as np
+
+from model_registry import get_spacy_model
+
+# Strategies accepted by make_chunker and GraphRagWorkflow(chunker=...).
+CHUNKING_STRATEGIES = ["semantic", "window", "hybrid"]
+
+_WORD = re.compile(r"\S+")
+
+
+def sentence_spans(text, nlp=None):
+    """
+    Returns the (start_char, end_char) spans of the sentences in text.
+
+    Uses the given spaCy pipeline, or a shared blank English pipeline with the
+    rule-based sentencizer, which is cheap compared to a parser.
+    """
+    if nlp is None:
+        nlp = get_spacy_model("blank:en")
+    return [(sent.start_char, sent.end_char) for sent in nlp(text).sents]
+
+
+def _normalize(vector):
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticChunking:
+    """
+    The LangChain SemanticChunker: embeds every sentence and splits where the
+    distance between neighbouring sentences is in the top percentile, then
+    embeds the resulting chunks.
+    """
+
+    def __init__(self, embedder, breakpoint_threshold_type="percentile"):
+        from langchain_experimental.text_splitter import SemanticChunker  # only the semantic strategy needs LangChain
+
+        self.embedder = embedder
+        self.text_splitter = SemanticChunker(embedder, breakpoint_threshold_type=breakpoint_threshold_type)
+
+    def chunk(self, text, sentences=None):
+        """
+        Splits and embeds a text.
+
+        Args:
+            text: The text to chunk.
+            sentences: Unused; SemanticChunker finds sentences itself.
+
+        Returns:
+            A tuple of (chunk texts, chunk embeddings).
+        """
+        chunk_texts = self.text_splitter.split_text(text)
+        return chunk_texts, self.embedder.embed_documents(chunk_texts)
+
+
+class SentenceWindowChunker:
+    """
+    Packs consecutive sentences into chunks of up to max_tokens words, starting
+    each chunk with the trailing sentences of the previous one, up to
+    overlap_tokens words. Sentences longer than max_tokens are split on words.
+    No embeddings are needed to decide the splits.
+    """
+
+    def __init__(self, embedder=None, max_tokens=200, overlap_tokens=40, nlp=None):
+        """
+        Initializes the SentenceWindowChunker.
+
+        Args:
+            embedder: Embeds the chunks in chunk(); not needed for split_spans().
+            max_tokens: The maximum number of whitespace-separated words per chunk.
+            overlap_tokens: The maximum number of words repeated from the previous chunk.
+            nlp: The spaCy pipeline used to find sentences when none are passed in.
+        """
+        self.embedder = embedder
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.nlp = nlp
+
+    def _units(self, text, sentences):
+        """Returns (start, end, n_words) per sentence, splitting sentences longer than max_tokens."""
+        units = []
+        for start, end in sentences:
+            words = [m.span() for m in _WORD.finditer(text, start, end)]
+            for i in range(0, len(words), self.max_tokens):
+                piece = words[i:i + self.max_tokens]
+                units.append((piece[0][0], piece[-1][1], len(piece)))
+        return units
+
+    def split_spans(self, text, sentences=None):
+        """
+        Returns the (start_char, end_char) spans of the chunks of text.
+
+        Args:
+            text: The text to chunk.
+            sentences: Sentence spans, e.g. the "sentences" of extract_entities_batch,
+                so the text is not segmented again.
+        """
+        if sentences is None:
+            sentences = sentence_spans(text, self.nlp)
+        units = self._units(text, sentences)
+
+        spans = []
+        first = 0
+        while first < len(units):
+            last = first
+            n_words = units[first][2]
+            while last + 1 < len(units) and n_words + units[last + 1][2] <= self.max_tokens:
+                last += 1
+                n_words += units[last][2]
+            spans.append((units[first][0], units[last][1]))
+            if last + 1 >= len(units):
+                break
+
+            # Step back over trailing sentences that fit in the overlap, always moving forward
+            next_first = last + 1
+            overlap = 0
+            while next_first - 1 > first and overlap + units[next_first - 1][2] <= self.overlap_tokens:
+                next_first -= 1
+                overlap += units[next_first][2]
+            first = next_first
+        return spans
+
+    def split_text(self, text, sentences=None):
+        return [text[start:end] for start, end in self.split_spans(text, sentences)]
+
+    def chunk(self, text, sentences=None):
+        """
+        Splits and embeds a text.
+
+        Returns:
+            A tuple of (chunk texts, chunk embeddings).
+        """
+        chunk_texts = self.split_text(text, sentences)
+        return chunk_texts, self.embedder.embed_documents(chunk_texts)
+
+
+class HybridChunker:
+    """
+    Embeds small, non-overlapping sentence windows once, merges neighbouring
+    windows until the distance between them is in the top percentile (as the
+    semantic chunker does for sentences) or a chunk reaches max_tokens, and
+    uses the normalized mean of the window embeddings as the chunk embedding.
+    Costs one embedding per window instead of one per sentence plus one per chunk.
+    """
+
+    def __init__(self, embedder, window_tokens=60, max_tokens=300, breakpoint_percentile=95, nlp=None):
+        """
+        Initializes the HybridChunker.
+
+        Args:
+            embedder: Embeds the windows.
+            window_tokens: The maximum number of words per window.
+            max_tokens: The maximum number of words per merged chunk.
+            breakpoint_percentile: Windows are split where their distance is above this percentile.
+            nlp: The spaCy pipeline used to find sentences when none are passed in.
+        """
+        self.embedder = embedder
+        self.max_tokens = max_tokens
+        self.breakpoint_percentile = breakpoint_percentile
+        self.windows = SentenceWindowChunker(max_tokens=window_tokens, overlap_tokens=0, nlp=nlp)
+
+    def chunk(self, text, sentences=None):
+        """
+        Splits and embeds a text.
+
+        Returns:
+            A tuple of (chunk texts, chunk embeddings).
+        """
+        spans = self.windows.split_spans(text, sentences)
+        if not spans:
+            return [], []
+        embeddings = np.asarray(self.embedder.embed_documents([text[start:end] for start, end in spans]), dtype=np.float32)
+        n_words = [len(_WORD.findall(text, start, end)) for start, end in spans]
+
+        distances = 1.0 - np.einsum("ij,ij->i", embeddings[:-1], embeddings[1:]) / np.maximum(
+            np.linalg.norm(embeddings[:-1], axis=1) * np.linalg.norm(embeddings[1:], axis=1), 1e-12
+        )
+        threshold = np.percentile(distances, self.breakpoint_percentile) if len(distances) else 0.0
+
+        chunk_texts = []
+        chunk_embeddings = []
+        first = 0
+        size = n_words[0]
+        for i in range(1, len(spans) + 1):
+            if i < len(spans) and distances[i - 1] <= threshold and size + n_words[i] <= self.max_tokens:
+                size += n_words[i]
+                continue
+            chunk_texts.append(text[spans[first][0]:spans[i - 1][1]])
+            chunk_embeddings.append(_normalize(embeddings[first:i].mean(axis=0)).tolist())
+            if i < len(spans):
+                first = i
+                size = n_words[i]
+        return chunk_texts, chunk_embeddings
+
+
+def make_chunker(strategy, embedder, **kwargs):
+    """
+    Builds a chunker by name.
+
+    Args:
+        strategy: One of CHUNKING_STRATEGIES.
+        embedder: The embedder the chunker embeds its chunks with.
+        **kwargs: Passed to the chunker class.
+
+    Returns:
+        An object with chunk(text, sentences=None) returning (chunk texts, embeddings).
+    """
+    if strategy == "semantic":
+        return SemanticChunking(embedder, **kwargs)
+    if strategy == "window":
+        return SentenceWindowChunker(embedder, **kwargs)
+    if strategy == "hybrid":
+        return HybridChunker(embedder, **kwargs)
+    raise ValueError(f"Unknown chunking strategy {strategy!r}; expected one of {CHUNKING_STRATEGIES}")
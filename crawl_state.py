@@ -0,0 +1,238 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import numpy as np
+
+# The stores that record their own progress, so a crash between them only redoes the missing one.
+CRAWL_SINKS = ("graph", "vector")
+
+# Query parameters that only track the click and never change the page.
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "smid", "smtyp", "cmpid", "ocid", "igshid"}
+
+_WORD = re.compile(r"\w+")
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+_SIMHASH_BANDS = 4
+
+# check() result: action is "new", "changed", "unchanged" or "duplicate"; text is what
+# still has to be processed (the whole text, only the new paragraphs, or nothing).
+CrawlDecision = namedtuple("CrawlDecision", ["action", "text", "duplicate_of"])
+
+
+def canonical_url(url):
+    """
+    Returns the key a URL is stored under: lowercased scheme and host without
+    "www." or a default port, no fragment, no tracking parameters, sorted query
+    and no trailing slash.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and (scheme, parts.port) not in (("http", 80), ("https", 443)):
+        host = f"{host}:{parts.port}"
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def _normalize(text):
+    return " ".join(_WORD.findall(text.lower()))
+
+
+def content_hash(text):
+    """Returns a hash of the text that ignores case, punctuation and whitespace."""
+    return hashlib.sha256(_normalize(text).encode("utf-8")).hexdigest()
+
+
+def paragraphs(text):
+    """Splits article text into its non-empty paragraphs."""
+    return [paragraph.strip() for paragraph in _PARAGRAPH_BREAK.split(text) if paragraph.strip()]
+
+
+def simhash(text, shingle_size=3):
+    """
+    Returns the 64-bit SimHash of the text's word shingles. Texts that differ by
+    a few words are a few bits apart.
+    """
+    words = _WORD.findall(text.lower())
+    shingles = [" ".join(words[i:i + shingle_size]) for i in range(max(len(words) - shingle_size + 1, 1))]
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles],
+        dtype=np.uint64,
+    )
+    bits = (hashes[:, None] >> np.arange(64, dtype=np.uint64)) & np.uint64(1)
+    weights = bits.sum(axis=0, dtype=np.int64) * 2 - len(hashes)
+    return int(sum(1 << i for i in range(64) if weights[i] > 0))
+
+
+def _signed(value):
+    """Maps an unsigned 64-bit value onto SQLite's signed INTEGER."""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _bands(value):
+    return [(value >> (16 * i)) & 0xFFFF for i in range(_SIMHASH_BANDS)]
+
+
+class CrawlState:
+    """
+    Remembers, per sink, which version of each article has been processed, in a
+    local SQLite database keyed by canonical URL.
+
+    Known URLs are not downloaded again until recheck_after has passed. A fetched
+    article is skipped if its content hash is unchanged or it is a near-duplicate
+    (by SimHash) of another processed article, e.g. a syndicated copy. A changed
+    article is reduced to its new paragraphs. Safe to share between threads.
+    """
+
+    def __init__(self, path="crawl_state.sqlite", recheck_after=24 * 3600, near_duplicate_bits=3):
+        """
+        Initializes the CrawlState.
+
+        Args:
+            path: The SQLite database file.
+            recheck_after: Seconds before a processed URL is downloaded again to look
+                for edits, or None to never download it again.
+            near_duplicate_bits: The largest SimHash distance treated as a near-duplicate.
+                Must be below the number of bands (4) for the band lookup to find every match.
+        """
+        self.path = path
+        self.recheck_after = recheck_after
+        self.near_duplicate_bits = near_duplicate_bits
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS articles (
+                sink TEXT NOT NULL, url TEXT NOT NULL, content_hash TEXT NOT NULL, simhash INTEGER NOT NULL,
+                band0 INTEGER NOT NULL, band1 INTEGER NOT NULL, band2 INTEGER NOT NULL, band3 INTEGER NOT NULL,
+                duplicate_of TEXT, checked_at REAL NOT NULL, PRIMARY KEY (sink, url)
+            );
+            CREATE INDEX IF NOT EXISTS articles_content_hash ON articles (sink, content_hash);
+            CREATE INDEX IF NOT EXISTS articles_band0 ON articles (sink, band0);
+            CREATE INDEX IF NOT EXISTS articles_band1 ON articles (sink, band1);
+            CREATE INDEX IF NOT EXISTS articles_band2 ON articles (sink, band2);
+            CREATE INDEX IF NOT EXISTS articles_band3 ON articles (sink, band3);
+            CREATE TABLE IF NOT EXISTS paragraphs (
+                sink TEXT NOT NULL, url TEXT NOT NULL, hash TEXT NOT NULL, PRIMARY KEY (sink, url, hash)
+            );
+            CREATE TABLE IF NOT EXISTS failures (
+                sink TEXT NOT NULL, url TEXT NOT NULL, error TEXT NOT NULL, attempts INTEGER NOT NULL,
+                failed_at REAL NOT NULL, PRIMARY KEY (sink, url)
+            );
+            """
+        )
+        self._conn.commit()
+
+    def should_fetch(self, url, sinks=CRAWL_SINKS):
+        """Returns False if every sink processed the URL within recheck_after."""
+        key = canonical_url(url)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT checked_at FROM articles WHERE url = ? AND sink IN ({','.join('?' * len(sinks))})",
+                [key, *sinks],
+            ).fetchall()
+        if len(rows) < len(sinks):
+            return True
+        if self.recheck_after is None:
+            return False
+        return min(checked_at for checked_at, in rows) < time.time() - self.recheck_after
+
+    def check(self, url, text, sink):
+        """
+        Decides what of a fetched article a sink still has to process. Nothing is
+        stored; call record() once the sink has processed decision.text.
+
+        Returns:
+            A CrawlDecision.
+        """
+        key = canonical_url(url)
+        digest = content_hash(text)
+        fingerprint = simhash(text)
+        bands = _bands(fingerprint)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash FROM articles WHERE sink = ? AND url = ?", (sink, key)
+            ).fetchone()
+            if row is not None:
+                if row[0] == digest:
+                    return CrawlDecision("unchanged", "", None)
+                known = {
+                    hash_ for hash_, in self._conn.execute(
+                        "SELECT hash FROM paragraphs WHERE sink = ? AND url = ?", (sink, key)
+                    )
+                }
+                new = [p for p in paragraphs(text) if content_hash(p) not in known]
+                return CrawlDecision("changed", "\n\n".join(new), None)
+
+            same = self._conn.execute(
+                "SELECT url FROM articles WHERE sink = ? AND content_hash = ? LIMIT 1", (sink, digest)
+            ).fetchone()
+            if same is not None:
+                return CrawlDecision("duplicate", "", same[0])
+
+            candidates = self._conn.execute(
+                "SELECT url, simhash FROM articles WHERE sink = ? AND "
+                "(band0 = ? OR band1 = ? OR band2 = ? OR band3 = ?)",
+                (sink, *bands),
+            ).fetchall()
+        for other_url, other in candidates:
+            if bin((other & 0xFFFFFFFFFFFFFFFF) ^ fingerprint).count("1") <= self.near_duplicate_bits:
+                return CrawlDecision("duplicate", "", other_url)
+        return CrawlDecision("new", text, None)
+
+    def record(self, url, text, sink, duplicate_of=None):
+        """Stores the full text's fingerprints as the version of the article the sink has processed."""
+        key = canonical_url(url)
+        fingerprint = simhash(text)
+        paragraph_hashes = {content_hash(p) for p in paragraphs(text)}
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO articles (sink, url, content_hash, simhash, band0, band1, band2, band3, "
+                "duplicate_of, checked_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (sink, key, content_hash(text), _signed(fingerprint), *_bands(fingerprint), duplicate_of, time.time()),
+            )
+            self._conn.execute("DELETE FROM paragraphs WHERE sink = ? AND url = ?", (sink, key))
+            self._conn.executemany(
+                "INSERT INTO paragraphs (sink, url, hash) VALUES (?, ?, ?)",
+                [(sink, key, hash_) for hash_ in paragraph_hashes],
+            )
+            self._conn.execute("DELETE FROM failures WHERE sink = ? AND url = ?", (sink, key))
+            self._conn.commit()
+
+    def record_failure(self, url, sink, error):
+        """
+        Records that a sink failed to process an article. The article is not marked
+        processed, so should_fetch() keeps returning True for it; record() clears the failure.
+        """
+        key = canonical_url(url)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO failures (sink, url, error, attempts, failed_at) VALUES (?, ?, ?, 1, ?) "
+                "ON CONFLICT (sink, url) DO UPDATE SET error = excluded.error, attempts = attempts + 1, "
+                "failed_at = excluded.failed_at",
+                (sink, key, str(error), time.time()),
+            )
+            self._conn.commit()
+
+    def failures(self, sink=None):
+        """Returns (sink, url, error, attempts, failed_at) for every article a sink failed to process."""
+        with self._lock:
+            if sink is None:
+                return self._conn.execute("SELECT sink, url, error, attempts, failed_at FROM failures").fetchall()
+            return self._conn.execute(
+                "SELECT sink, url, error, attempts, failed_at FROM failures WHERE sink = ?", (sink,)
+            ).fetchall()
+
+    def close(self):
+        self._conn.close()
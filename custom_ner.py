@@ -1,25 +1,71 @@
 import re
 import time
+from bisect import bisect_right
 
-import spacy
-import spacy_transformers
+from article_fetcher import backoff_delay
+from metrics import metrics
+from model_registry import get_spacy_model
+from relation_patterns import get_relation_engine
 
-import newspaper
-from newspaper import Article
+# Entity labels kept from the NER output and stored as node labels in the graph.
+ENTITY_LABELS = ["PERSON", "ORG", "GPE"]
+
+# Pipeline components NER does not depend on. The parser is only kept for articles,
+# where its sentence boundaries are used to window relationship extraction.
+ARTICLE_DISABLED_COMPONENTS = ["tagger", "attribute_ruler", "lemmatizer"]
+QUERY_DISABLED_COMPONENTS = ARTICLE_DISABLED_COMPONENTS + ["parser"]
 
-from tqdm import tqdm
 
 class CustomNer:
-    def __init__(self):
-        self.nlp = spacy.load("en_core_web_trf")
+    def __init__(self, nlp=None, gazetteer=None):
+        self.nlp = nlp if nlp is not None else get_spacy_model()
+        # Optional Gazetteer of known graph entities; queries that mention one skip the model
+        self.gazetteer = gazetteer
+        self.relation_engine = get_relation_engine()
+        self.article_disabled = [name for name in ARTICLE_DISABLED_COMPONENTS if name in self.nlp.pipe_names]
+        self.query_disabled = [name for name in QUERY_DISABLED_COMPONENTS if name in self.nlp.pipe_names]
         
     # Parse user query and extract key entity
     def parse_query(self, query):
-        doc = self.nlp(query)
-        entities = [ent.text for ent in doc.ents if ent.label_ in ["GPE", "PERSON", "ORG"]]
-        return entities or None
+        with metrics.timer("parse_query_seconds"):
+            if self.gazetteer is not None:
+                known = self.gazetteer.match(query)
+                if known:
+                    metrics.inc("query_ner_total", source="gazetteer")
+                    return [name for name, _ in known]
+            metrics.inc("query_ner_total", source="model")
+            doc = self.nlp(query, disable=self.query_disabled)
+            entities = [ent.text for ent in doc.ents if ent.label_ in ENTITY_LABELS]
+            return entities or None
+    
+    def parse_queries(self, queries, batch_size=64):
+        """Runs parse_query over many queries, with a single nlp.pipe call for those the gazetteer cannot answer."""
+        with metrics.timer("parse_queries_seconds"):
+            return self._parse_queries(queries, batch_size)
+
+    def _parse_queries(self, queries, batch_size):
+        results = [None] * len(queries)
+        pending = list(range(len(queries)))
+        if self.gazetteer is not None:
+            pending = []
+            for i, query in enumerate(queries):
+                known = self.gazetteer.match(query)
+                if known:
+                    results[i] = [name for name, _ in known]
+                else:
+                    pending.append(i)
+        metrics.inc("query_ner_total", len(queries) - len(pending), source="gazetteer")
+        metrics.inc("query_ner_total", len(pending), source="model")
+        docs = self.nlp.pipe([queries[i] for i in pending], batch_size=batch_size, disable=self.query_disabled)
+        for i, doc in zip(pending, docs):
+            results[i] = [ent.text for ent in doc.ents if ent.label_ in ENTITY_LABELS] or None
+        return results
     
     def parse_article(self, article, max_retries=3):
+        with metrics.timer("parse_article_seconds"):
+            return self._parse_article(article, max_retries)
+
+    def _parse_article(self, article, max_retries):
         for attempt in range(max_retries):
             try:
                 article.download()
@@ -32,21 +78,72 @@ class CustomNer:
                 print(f"Attempt {attempt + 1}: Error downloading or parsing article: {str(e)}")
             
             if attempt < max_retries - 1:
-                time.sleep(2)
+                time.sleep(backoff_delay(attempt))
         
         print("Failed to download and parse the article after multiple attempts.")
         return ""
 
     
     def extract_entities(self, text):
-        doc = self.nlp(text)
+        with metrics.timer("extract_entities_seconds"):
+            doc = self.nlp(text, disable=self.article_disabled)
+            entities = self._entities_from_doc(doc)
+        metrics.observe("entities_per_article", len(entities))
+        return entities
+    
+    def extract_entities_batch(self, texts, batch_size=16, n_process=1):
+        """
+        Runs NER over many texts with nlp.pipe, parsing each text once.
+
+        Args:
+            texts: An iterable of article texts.
+            batch_size: The number of texts per nlp.pipe batch.
+            n_process: The number of worker processes nlp.pipe uses.
+
+        Returns:
+            A list with one dictionary per text, holding the "text", its "entities"
+            as extract_entities returns them, and the "sentences" and "tokens"
+            character spans of the Doc, so later stages never parse the text again.
+        """
+        results = []
+        start = time.perf_counter()
+        with metrics.timer("extract_entities_batch_seconds"):
+            docs = self.nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=self.article_disabled)
+            for doc in docs:
+                results.append(
+                    {
+                        "text": doc.text,
+                        "entities": self._entities_from_doc(doc),
+                        "sentences": [(sent.start_char, sent.end_char) for sent in self._sentences(doc)],
+                        "tokens": [(token.idx, token.idx + len(token)) for token in doc],
+                    }
+                )
+        # extract_entities_seconds is per article, so a batch adds its per-article share
+        per_article = (time.perf_counter() - start) / len(results) if results else 0.0
+        for result in results:
+            metrics.observe("extract_entities_seconds", per_article)
+            metrics.observe("entities_per_article", len(result["entities"]))
+        return results
+    
+    def _sentences(self, doc):
+        if doc.has_annotation("SENT_START"):
+            return list(doc.sents)
+        return [doc[:]]
+    
+    def _entities_from_doc(self, doc):
+        sent_starts = [sent.start for sent in self._sentences(doc)]
         entities = []
         for ent in doc.ents:
-            if ent.label_ in ["PERSON", "ORG", "GPE"]:
+            if ent.label_ in ENTITY_LABELS:
                 entities.append(
                     {
                         "text": ent.text,
                         "label": ent.label_,
+                        "start_char": ent.start_char,
+                        "end_char": ent.end_char,
+                        "token_start": ent.start,
+                        "token_end": ent.end,
+                        "sent": bisect_right(sent_starts, ent.start) - 1,
                     }
                 )
         return entities
@@ -74,130 +171,70 @@ class CustomNer:
         Returns a highly detailed dictionary of regex patterns for extracting relationships,
         tailored to the entity types of ent1 and ent2.
         """
-        patterns = {
-            # General Relationships
-            "MET_WITH": re.compile(r"\b(met|meet|saw|encountered|chatted with|spoke to)\b"),
-            "LOCATED_IN": re.compile(r"\b(located|lives|resides|in|situated in|based in)\b") if ent2["label"] == "GPE" else None,
-            "WORKS_FOR": re.compile(r"\b(works|employed|for|is employed by|is a member of)\b"),
-            "PART_OF": re.compile(r"\b(part of|belong to|within|is a component of|is a subset of)\b") if ent2["label"] == "ORG" or ent2["label"] == "GPE" else None,
-            "CONTAINS": re.compile(r"\b(contains|includes|holds|encompasses|comprises)\b") if ent1["label"] == "GPE" and ent2["label"] == "GPE" or ent1["label"] == "ORG" and ent2["label"] == "PRODUCT" or ent1["label"] == "GPE" and ent2["label"] == "ORG" else None,
-            "SERVES": re.compile(r"\b(serves|provides|offers|delivers|supplies)\b") if ent1["label"] == "ORG" and ent2["label"] == "PRODUCT" or ent1["label"] == "ORG" and ent2["label"] == "GPE" else None,
-            "LOCATED_AT": re.compile(r"\b(located at|at|situated at|found at|is based at)\b") if ent1["label"] == "ORG" and ent2["label"] == "GPE" else None,
-            "IS_RELATED_TO": re.compile(r"\b(is related to|connected to|has ties with|shares a connection with)\b"),
-    
-            # Person-Specific Relationships
-            "IS_AFFILIATED_WITH": re.compile(r"\b(is|are|a|an)\b") if ent1["label"] == "PERSON" and ent2["label"] == "ORG" else None,
-            "IS_MARRIED_TO": re.compile(r"\b(married|spouse|partner|husband|wife)\b") if ent1["label"] == "PERSON" and ent2["label"] == "PERSON" else None,
-            "IS_RELATED_TO_FAMILY": re.compile(r"\b(child|son|daughter|parent|father|mother|sibling|brother|sister)\b") if ent1["label"] == "PERSON" and ent2["label"] == "PERSON" else None,
-            "BORN_IN": re.compile(r"\b(born in|was born in)\b") if ent1["label"] == "PERSON" and ent2["label"] == "GPE" else None,
-            "DIED_IN": re.compile(r"\b(died in|passed away in)\b") if ent1["label"] == "PERSON" and ent2["label"] == "GPE" else None,
-            "EDUCATED_AT": re.compile(r"\b(educated at|studied at|attended|graduated from)\b") if ent1["label"] == "PERSON" and ent2["label"] == "ORG" else None,
-            "AWARDED_TO": re.compile(r"\b(awarded to|received|won|honored with)\b") if ent1["label"] == "ORG" and ent2["label"] == "PERSON" or ent1["label"] == "EVENT" and ent2["label"] == "PERSON" else None,
-            "IS_LEADER_OF": re.compile(r"\b(leader of|CEO of|president of|head of|director of)\b") if ent1["label"] == "PERSON" and ent2["label"] == "ORG" else None,
-            "IS_MEMBER_OF": re.compile(r"\b(member of|part of|joined|is a member of)\b") if ent1["label"] == "PERSON" and ent2["label"] == "ORG" else None,
-            "CREATED": re.compile(r"\b(created|made|developed|invented|authored)\b") if ent1["label"] == "PERSON" and ent2["label"] == "PRODUCT" else None,
-            "DIRECTED_BY": re.compile(r"\b(directed by|by|filmed by|produced by)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "PERSON" else None,
-    
-            # Organization-Specific Relationships
-            "FOUNDED_BY": re.compile(r"\b(founded by|established by|created by|started by)\b") if ent1["label"] == "ORG" and ent2["label"] == "PERSON" else None,
-            "PRODUCED_BY": re.compile(r"\b(produced by|manufactured by|made by|built by)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "ORG" else None,
-            "INVESTED_IN": re.compile(r"\b(invested in|funding|financed|backed)\b") if ent1["label"] == "ORG" and ent2["label"] == "ORG" else None,
-            "PUBLISHED_BY": re.compile(r"\b(published by|released by|distributed by)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "ORG" else None,
-            "HEADQUARTERED_IN": re.compile(r"\b(headquartered in|is based in|has its headquarters in)\b") if ent1["label"] == "ORG" and ent2["label"] == "GPE" else None,
-            "SUBSIDIARY_OF": re.compile(r"\b(subsidiary of|is a subsidiary of|owned by)\b") if ent1["label"] == "ORG" and ent2["label"] == "ORG" else None,
-    
-            # Event-Specific Relationships
-            "HELD_IN": re.compile(r"\b(held in|took place in|occurred in)\b") if ent1["label"] == "EVENT" and ent2["label"] == "GPE" else None,
-            "PARTICIPATED_IN": re.compile(r"\b(participated in|attended|was present at)\b") if ent1["label"] == "PERSON" and ent2["label"] == "EVENT" else None,
-            "ORGANIZED_BY": re.compile(r"\b(organized by|hosted by|sponsored by)\b") if ent1["label"] == "EVENT" and ent2["label"] == "ORG" else None,
-    
-            # Product-Specific Relationships
-            "HAS_DATE": re.compile(r"\b(is|are|has|have|was|were)\b") if ent2["label"] == "DATE" else None,
-            "HAS_NUMBER": re.compile(r"\b(is|are|has|have|was|were)\b") if ent2["label"] == "CARDINAL" else None,
-            "HAS_PRODUCT": re.compile(r"\b(is|are|has|have|includes|contains)\b") if ent2["label"] == "PRODUCT" else None,
-            "RELEASED_IN": re.compile(r"\b(released in|launched in)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "DATE" else None,
-            "SOLD_IN": re.compile(r"\b(sold in|available in)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "GPE" else None,
-    
-            # Date-Specific Relationships
-            "OCCURRED_ON": re.compile(r"\b(occurred on|happened on|took place on)\b") if ent1["label"] == "EVENT" and ent2["label"] == "DATE" else None,
-            "VALID_UNTIL": re.compile(r"\b(valid until|expires on)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "DATE" else None,
-    
-            # Cardinal-Specific Relationships
-            "MEASURED_IN": re.compile(r"\b(measured in|counts|amounts to)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "CARDINAL" else None,
-            "POPULATION_OF": re.compile(r"\b(population of|has a population of)\b") if ent1["label"] == "GPE" and ent2["label"] == "CARDINAL" else None,
-            "NUMBER_OF": re.compile(r"\b(number of|consists of|contains)\b") if ent1["label"] == "ORG" and ent2["label"] == "CARDINAL" or ent1["label"] == "PRODUCT" and ent2["label"] == "CARDINAL" else None,
-    
-            # GPE-Specific Relationships
-            "CAPITAL_OF": re.compile(r"\b(capital of|is the capital of)\b") if ent1["label"] == "GPE" and ent2["label"] == "GPE" else None,
-            "BORDERED_BY": re.compile(r"\b(bordered by|shares a border with|adjacent to)\b") if ent1["label"] == "GPE" and ent2["label"] == "GPE" else None,
-            "IS_IN_REGION": re.compile(r"\b(is in|is part of|located in)\b") if ent1["label"] == "GPE" and ent2["label"] == "GPE" else None,
-    
-            # Event to Event relationships
-            "PRECEDED_BY": re.compile(r"\b(preceded by|occurred before)\b") if ent1["label"] == "EVENT" and ent2["label"] == "EVENT" else None,
-            "FOLLOWED_BY": re.compile(r"\b(followed by|occurred after)\b") if ent1["label"] == "EVENT" and ent2["label"] == "EVENT" else None,
-            "CAUSED_BY": re.compile(r"\b(caused by|resulted from)\b") if ent1["label"] == "EVENT" and ent2["label"] == "EVENT" else None,
-            "LED_TO": re.compile(r"\b(led to|resulted in)\b") if ent1["label"] == "EVENT" and ent2["label"] == "EVENT" else None,
-    
-            # Product to Product relationships
-            "IS_A_TYPE_OF": re.compile(r"\b(is a type of|is a kind of|is a variation of)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "PRODUCT" else None,
-            "REQUIRES": re.compile(r"\b(requires|needs|uses)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "PRODUCT" else None,
-            "COMPATIBLE_WITH": re.compile(r"\b(compatible with|works with)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "PRODUCT" else None,
-            "REPLACES": re.compile(r"\b(replaces|substitutes|is a replacement for)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "PRODUCT" else None,
-    
-            # ORG to ORG Relationships
-            "MERGED_WITH": re.compile(r"\b(merged with|acquired by)\b") if ent1["label"] == "ORG" and ent2["label"] == "ORG" else None,
-            "PARTNERED_WITH": re.compile(r"\b(partnered with|collaborated with)\b") if ent1["label"] == "ORG" and ent2["label"] == "ORG" else None,
-            "COMPETES_WITH": re.compile(r"\b(competes with|rivals)\b") if ent1["label"] == "ORG" and ent2["label"] == "ORG" else None,
-            "SUPPLIES": re.compile(r"\b(supplies|provides)\b") if ent1["label"] == "ORG" and ent2["label"] == "ORG" else None,
-            "DISTRIBUTES": re.compile(r"\b(distributes|sells)\b") if ent1["label"] == "ORG" and ent2["label"] == "ORG" else None,
-    
-            # Person to Event Relationships
-            "ATTENDED": re.compile(r"\b(attended|participated in)\b") if ent1["label"] == "PERSON" and ent2["label"] == "EVENT" else None,
-            "SPOKE_AT": re.compile(r"\b(spoke at|gave a speech at)\b") if ent1["label"] == "PERSON" and ent2["label"] == "EVENT" else None,
-            "PERFORMED_AT": re.compile(r"\b(performed at|played at)\b") if ent1["label"] == "PERSON" and ent2["label"] == "EVENT" else None,
-    
-            # Person to Product Relationships
-            "USES": re.compile(r"\b(uses|utilizes|employs)\b") if ent1["label"] == "PERSON" and ent2["label"] == "PRODUCT" else None,
-            "OWNS": re.compile(r"\b(owns|possesses)\b") if ent1["label"] == "PERSON" and ent2["label"] == "PRODUCT" else None,
-            "REVIEWED": re.compile(r"\b(reviewed|rated)\b") if ent1["label"] == "PERSON" and ent2["label"] == "PRODUCT" else None,
-    
-            # Product to GPE Relationships
-            "SHIPPED_TO": re.compile(r"\b(shipped to|delivered to)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "GPE" else None,
-            "MANUFACTURED_IN": re.compile(r"\b(manufactured in|produced in)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "GPE" else None,
-            "AVAILABLE_IN": re.compile(r"\b(available in|sold in)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "GPE" else None,
-    
-            # Org to GPE Relationships
-            "OPERATES_IN": re.compile(r"\b(operates in|has branches in)\b") if ent1["label"] == "ORG" and ent2["label"] == "GPE" else None,
-            "IS_BASED_IN": re.compile(r"\b(is based in|located in)\b") if ent1["label"] == "ORG" and ent2["label"] == "GPE" else None,
-            "HAS_OFFICES_IN": re.compile(r"\b(has offices in|maintains a presence in)\b") if ent1["label"] == "ORG" and ent2["label"] == "GPE" else None,
-    
-            # Event to GPE Relationships
-            "HELD_IN_GPE": re.compile(r"\b(held in|took place in)\b") if ent1["label"] == "EVENT" and ent2["label"] == "GPE" else None,
-    
-            # Event to Date Relationships
-            "OCCURRED_ON_DATE": re.compile(r"\b(occurred on|happened on|took place on)\b") if ent1["label"] == "EVENT" and ent2["label"] == "DATE" else None,
-    
-            # Product to Date Relationships
-            "RELEASED_ON": re.compile(r"\b(released on|launched on)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "DATE" else None,
-            "EXPIRES_ON": re.compile(r"\b(expires on|valid until)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "DATE" else None,
-    
-            # GPE to CARDINAL Relationships
-            "POPULATION_CARDINAL": re.compile(r"\b(population of|has a population of)\b") if ent1["label"] == "GPE" and ent2["label"] == "CARDINAL" else None,
-    
-            # ORG to CARDINAL Relationships
-            "EMPLOYEES_CARDINAL": re.compile(r"\b(employees|staff|workforce)\b") if ent1["label"] == "ORG" and ent2["label"] == "CARDINAL" else None,
-    
-            # Product to CARDINAL Relationships
-            "COST_CARDINAL": re.compile(r"\b(costs|priced at|valued at)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "CARDINAL" else None,
-            "QUANTITY_CARDINAL": re.compile(r"\b(quantity|amount|number)\b") if ent1["label"] == "PRODUCT" and ent2["label"] == "CARDINAL" else None,
-        }
-        
-        return patterns
-    
-    def extract_relationships(self, text, entities):
+        return self.relation_engine.compile_patterns(ent1["label"], ent2["label"])
     
+    def extract_relationships(self, text, entities, window=None, window_unit="sentence"):
+        """
+        Extracts relationships between entities from regex trigger phrases in the
+        text between them.
+
+        Args:
+            text: The article text.
+            entities: The entities returned by extract_entities.
+            window: None to pair every entity with every later entity, matching each
+                entity text at its first occurrence. Otherwise only mentions at most
+                this many sentences (or tokens) apart are paired, using the spaCy
+                offsets stored on each entity, and every mention is considered.
+            window_unit: "sentence" or "token", the unit of window.
+
+        Returns:
+            A list of relationship dictionaries.
+        """
+        with metrics.timer("extract_relationships_seconds"):
+            return self._extract_relationships(text, entities, window, window_unit)
+
+    def _extract_relationships(self, text, entities, window, window_unit):
         relationships = []
         text_lower = text.lower()
+        if window is not None and len(text_lower) != len(text):
+            # Keep spaCy character offsets valid for the few characters that grow when lowercased
+            text_lower = "".join(char.lower()[:1] for char in text)
+    
+        # Scan the article once for relationship trigger phrases
+        phrase_index = self.relation_engine.scan(text_lower)
+    
+        if window is None:
+            pairs = self._all_pairs(text_lower, entities)
+        else:
+            pairs = self._windowed_pairs(entities, window, window_unit)
+    
+        seen = set()
+        evaluated = 0
+        for ent1, ent2, between_start, between_end in pairs:
+            evaluated += 1
+            relations = self.relation_engine.relations_between(
+                phrase_index, ent1["label"], ent2["label"], between_start, between_end
+            )
+    
+            for relation in relations:
+                if window is not None:
+                    key = (ent1["text"], ent1["label"], relation, ent2["text"], ent2["label"])
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                neo4j_relationship = {
+                    "entity1": {"text": ent1["text"], "label": ent1["label"]},
+                    "relation": relation,
+                    "entity2": {"text": ent2["text"], "label": ent2["label"]},
+                }
+                relationships.append(neo4j_relationship)
+    
+        metrics.observe("pairs_evaluated_per_article", evaluated)
+        metrics.observe("relationships_per_article", len(relationships))
+        return relationships
+    
+    def _all_pairs(self, text_lower, entities):
+        """Yields every (i, j > i) entity pair, located at the first occurrence of each entity text."""
         entity_positions = {}  # Store entity positions to avoid redundant searches
     
         # Pre-compute entity positions
@@ -216,19 +253,26 @@ class CustomNer:
                 ent2_start, ent2_end = entity_positions[ent2["text"]]
     
                 if ent2_start > ent1_end:
-                    between_text = text_lower[ent1_end:ent2_start]
-    
-                    patterns = self.get_regex_matching_patterns(ent1, ent2)
-    
-                    for rel_type, pattern in patterns.items():
-                        if pattern and pattern.search(between_text):
-                            neo4j_relationship = {
-                                "entity1": {"text": ent1["text"], "label": ent1["label"]},
-                                "relation": "IS_RELATED_TO" if rel_type.startswith("IS_RELATED_TO_") else rel_type,
-                                "entity2": {"text": ent2["text"], "label": ent2["label"]},
-                            }
-                            relationships.append(neo4j_relationship)
-    
-        return relationships
-
-    
\ No newline at end of file
+                    yield ent1, ent2, ent1_end, ent2_start
+    
+    def _windowed_pairs(self, entities, window, window_unit):
+        """Yields the pairs of entity mentions that fall within a sentence or token window."""
+        if window_unit == "sentence":
+            start_key, end_key = "sent", "sent"
+        elif window_unit == "token":
+            start_key, end_key = "token_start", "token_end"
+        else:
+            raise ValueError(f"Unknown window unit: {window_unit}")
+    
+        mentions = [ent for ent in entities if "start_char" in ent]
+        if len(mentions) != len(entities):
+            raise ValueError("Windowed pairing needs entities with spaCy offsets from extract_entities.")
+        mentions.sort(key=lambda ent: ent["start_char"])
+    
+        for i, ent1 in enumerate(mentions):
+            for j in range(i + 1, len(mentions)):
+                ent2 = mentions[j]
+                if ent2[start_key] - ent1[end_key] > window:
+                    break
+                if ent2["start_char"] > ent1["end_char"] and ent1["text"].lower() != ent2["text"].lower():
+                    yield ent1, ent2, ent1["end_char"], ent2["start_char"]
@@ -0,0 +1,231 @@
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    An on-disk embedding cache keyed by a hash of the model name and the text.
+
+    Entries live in a SQLite table with a last-used tick, and the least recently
+    used entries are evicted once the cache grows past max_entries. Safe to share
+    between threads.
+    """
+
+    def __init__(self, path="embedding_cache.sqlite", namespace="", max_entries=1_000_000):
+        """
+        Initializes the EmbeddingCache.
+
+        Args:
+            path: The SQLite database file.
+            namespace: Mixed into every key, normally the embedding model name, so
+                embeddings of different models never mix.
+            max_entries: The number of embeddings kept before LRU eviction.
+        """
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, used INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings (used)")
+        self._conn.commit()
+        self._tick, self._count = self._conn.execute("SELECT COALESCE(MAX(used), 0), COUNT(*) FROM embeddings").fetchone()
+
+    def key(self, text):
+        """Returns the cache key of a text."""
+        return hashlib.sha256(f"{self.namespace}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """Returns a dictionary of key to embedding for the keys that are cached."""
+        found = {}
+        keys = list(keys)
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                batch = keys[i:i + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(batch))})", batch
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32).tolist()
+            if found:
+                self._tick += 1
+                self._conn.executemany("UPDATE embeddings SET used = ? WHERE key = ?", [(self._tick, key) for key in found])
+                self._conn.commit()
+        return found
+
+    def put_many(self, items):
+        """Stores a dictionary of key to embedding, evicting the least recently used entries if needed."""
+        if not items:
+            return
+        with self._lock:
+            self._tick += 1
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (key, vector, used) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), self._tick) for key, vector in items.items()],
+            )
+            self._count += self._conn.total_changes - before
+            if self._count > self.max_entries:
+                excess = self._count - self.max_entries
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY used LIMIT ?)", (excess,)
+                )
+                self._count -= excess
+            self._conn.commit()
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self._conn.close()
+
+
+class BatchedEmbedder:
+    """
+    Wraps an embedding backend with batching, bounded concurrency and an
+    optional EmbeddingCache.
+
+    Exposes embed_documents and embed_query like a LangChain Embeddings object,
+    so it can also stand in for the model inside a SemanticChunker.
+    """
+
+    def __init__(self, backend, cache=None, batch_size=32, max_concurrency=4):
+        """
+        Initializes the BatchedEmbedder.
+
+        Args:
+            backend: An object with embed_documents(texts) and embed_query(text),
+                e.g. OllamaEmbeddings.
+            cache: An optional EmbeddingCache.
+            batch_size: The number of texts sent to the backend per call.
+            max_concurrency: The number of backend calls in flight at once.
+        """
+        self.backend = backend
+        self.cache = cache
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency) if max_concurrency > 1 else None
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.backend_calls = 0
+
+    def _key(self, text):
+        return self.cache.key(text) if self.cache is not None else text
+
+    def _embed_batch(self, texts):
+        with self._stats_lock:
+            self.backend_calls += 1
+        return self.backend.embed_documents(texts)
+
+    def embed_documents(self, texts):
+        """Embeds texts, sending only uncached, distinct texts to the backend."""
+        return self._embed_many(texts, "")
+
+    def embed_queries(self, texts):
+        """
+        Embeds many queries with batched backend calls, cached under the same keys
+        as embed_query. Assumes the backend embeds queries and documents alike, as
+        OllamaEmbeddings does.
+        """
+        return self._embed_many(texts, "query\0")
+
+    def _embed_many(self, texts, key_prefix):
+        keys = [self._key(key_prefix + text) for text in texts]
+        unique = dict(zip(keys, texts))
+        vectors = self.cache.get_many(unique) if self.cache is not None else {}
+
+        missing = [(key, text) for key, text in unique.items() if key not in vectors]
+        batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+        texts_per_batch = [[text for _, text in batch] for batch in batches]
+        if self._executor is not None and len(batches) > 1:
+            results = list(self._executor.map(self._embed_batch, texts_per_batch))
+        else:
+            results = [self._embed_batch(batch) for batch in texts_per_batch]
+
+        computed = {}
+        for batch, embeddings in zip(batches, results):
+            for (key, _), embedding in zip(batch, embeddings):
+                computed[key] = embedding
+        if self.cache is not None:
+            self.cache.put_many(computed)
+        vectors.update(computed)
+
+        with self._stats_lock:
+            self.hits += len(keys) - len(computed)
+            self.misses += len(computed)
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, text):
+        """Embeds a query, cached separately from documents in case the backend embeds them differently."""
+        key = self._key("query\0" + text)
+        if self.cache is not None:
+            cached = self.cache.get_many([key])
+            if key in cached:
+                with self._stats_lock:
+                    self.hits += 1
+                return cached[key]
+        with self._stats_lock:
+            self.backend_calls += 1
+            self.misses += 1
+        embedding = self.backend.embed_query(text)
+        if self.cache is not None:
+            self.cache.put_many({key: embedding})
+        return embedding
+
+    def stats(self):
+        """Returns hit, miss and backend call counts and the hit ratio."""
+        with self._stats_lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "backend_calls": self.backend_calls,
+                "hit_ratio": self.hits / total if total else 0.0,
+            }
+
+
+class HashEmbeddings:
+    """
+    A deterministic, offline stand-in for an embedding model.
+
+    Each text becomes a signed, hashed bag of its lowercased words, L2-normalized,
+    so texts that share words are close, as with a real model. Matches the
+    768-d output of nomic-embed-text by default.
+    """
+
+    def __init__(self, dim=768, latency=0.0):
+        """
+        Initializes the HashEmbeddings.
+
+        Args:
+            dim: The embedding size.
+            latency: Seconds each call sleeps, to simulate a model server.
+        """
+        self.dim = dim
+        self.latency = latency
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r"\w+", text.lower()):
+            digest = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector[digest % self.dim] += 1.0 if digest >> 63 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
@@ -1,57 +1,1172 @@
 from imports import *
 
+WAL_FILE = "wal.bin"
+WAL_MAGIC = b"VWAL"
+WAL_MAGIC_METADATA = b"VWL2"  # records that also carry each chunk's metadata
+WAL_HEADER = struct.Struct("<4sQIIQ")  # magic, start id, vector count, dimension, payload bytes
+
+
+def encode_wal_record(start, embeddings, texts, metadata=None):
+    """
+    Encodes appended vectors, their texts and, optionally, their chunk metadata
+    as one checksummed write-ahead log record.
+    """
+    encoded_texts = [text.encode("utf-8") for text in texts]
+    payload = embeddings.astype(np.float32).tobytes() + b"".join(
+        struct.pack("<I", len(encoded)) + encoded for encoded in encoded_texts
+    )
+    magic = WAL_MAGIC
+    if metadata is not None:
+        encoded_metadata = json.dumps(metadata).encode("utf-8")
+        payload += struct.pack("<I", len(encoded_metadata)) + encoded_metadata
+        magic = WAL_MAGIC_METADATA
+    header = WAL_HEADER.pack(magic, start, len(texts), embeddings.shape[1], len(payload))
+    return header + payload + struct.pack("<I", zlib.crc32(payload))
+
+
+def read_wal_records(path, truncate=False):
+    """
+    Reads the (start id, embeddings, texts, metadata) records of a write-ahead
+    log; metadata is None for records written without it.
+
+    Reading stops at the first torn or corrupt record, which is what a crash
+    in the middle of a commit leaves behind. With truncate, the file is cut
+    back to the last complete record so later commits append cleanly.
+    """
+    records = []
+    with open(path, "rb") as f:
+        data = f.read()
+    position = 0
+    while position + WAL_HEADER.size <= len(data):
+        magic, start, n, dim, payload_size = WAL_HEADER.unpack_from(data, position)
+        end = position + WAL_HEADER.size + payload_size + 4
+        if magic not in (WAL_MAGIC, WAL_MAGIC_METADATA) or end > len(data):
+            break
+        payload = data[position + WAL_HEADER.size:end - 4]
+        if struct.unpack("<I", data[end - 4:end])[0] != zlib.crc32(payload):
+            break
+        vectors_size = n * dim * 4
+        embeddings = np.frombuffer(payload[:vectors_size], dtype=np.float32).reshape(n, dim)
+        texts = []
+        offset = vectors_size
+        for _ in range(n):
+            (length,) = struct.unpack_from("<I", payload, offset)
+            texts.append(payload[offset + 4:offset + 4 + length].decode("utf-8"))
+            offset += 4 + length
+        metadata = None
+        if magic == WAL_MAGIC_METADATA:
+            (length,) = struct.unpack_from("<I", payload, offset)
+            metadata = json.loads(payload[offset + 4:offset + 4 + length].decode("utf-8"))
+        records.append((start, embeddings, texts, metadata))
+        position = end
+    if truncate and position < len(data):
+        with open(path, "r+b") as f:
+            f.truncate(position)
+    return records
+
+
+class ChunkTexts:
+    """
+    A list-like view of chunk texts stored in an offset-indexed file.
+
+    The texts file is memory-mapped and a text is only decoded when it is
+    accessed. Texts added after loading are kept in memory until the next
+    save_index, which maps the file it writes in place of this one.
+    """
+
+    def __init__(self, texts_path, offsets_path, count=None):
+        self._offsets = np.load(offsets_path, mmap_mode="r")
+        if count is not None:
+            self._offsets = self._offsets[:count + 1]
+        self._file = open(texts_path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self._stored = len(self._offsets) - 1
+        self._appended = []
+
+    @staticmethod
+    def write(texts, texts_path, offsets_path, count=None):
+        """Writes the first count texts as concatenated UTF-8 with an array of count + 1 byte offsets."""
+        count = len(texts) if count is None else count
+        offsets = np.zeros(count + 1, dtype=np.uint64)
+        with open(texts_path, "wb") as f:
+            position = 0
+            for i in range(count):
+                encoded = texts[i].encode("utf-8")
+                f.write(encoded)
+                position += len(encoded)
+                offsets[i + 1] = position
+        with open(offsets_path, "wb") as f:
+            np.save(f, offsets)
+
+    def __len__(self):
+        return self._stored + len(self._appended)
+
+    def __getitem__(self, i):
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("chunk index out of range")
+        if i >= self._stored:
+            return self._appended[i - self._stored]
+        return self._data[int(self._offsets[i]):int(self._offsets[i + 1])].decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def extend(self, texts):
+        self._appended.extend(texts)
+
+
+class ChunkMetadata:
+    """
+    The article URL, publish time and entity names of each chunk, with an
+    inverted index from entity to the ids of the chunks that mention it.
+
+    A chunk's id is its position in the VectorDB, which is also its FAISS id,
+    so ids stay stable as chunks are appended. Entities are looked up by
+    entity_key, so "the White House" finds chunks tagged "White House".
+    """
+
+    FILES = {
+        "urls": "chunk_urls.bin",
+        "url_offsets": "chunk_urls.idx.npy",
+        "published": "chunk_published.npy",
+        "entities": "chunk_entities.npy",
+        "entity_offsets": "chunk_entities.idx.npy",
+        "names": "entity_names.json",
+    }
+
+    def __init__(self):
+        self.urls = []
+        self.published = array("d")  # seconds since the epoch, NaN if unknown
+        self.names = []  # entity number -> name, as first seen
+        self._numbers = {}  # entity key -> entity number
+        self.entity_offsets = array("q", [0])  # chunk id -> span of entity_numbers
+        self.entity_numbers = array("q")
+        self.postings = []  # entity number -> ascending chunk ids
+
+    def __len__(self):
+        return len(self.published)
+
+    def extend(self, entries):
+        """Appends the metadata of new chunks: dictionaries with optional "url", "published" and "entities" keys."""
+        urls = []
+        for entry in entries:
+            chunk_id = len(self.published)
+            urls.append(entry.get("url") or "")
+            published = entry.get("published")
+            self.published.append(math.nan if published is None else float(published))
+            numbers = []
+            for name in entry.get("entities") or ():
+                key = entity_key(name)
+                if not key:
+                    continue
+                number = self._numbers.get(key)
+                if number is None:
+                    number = self._numbers[key] = len(self.names)
+                    self.names.append(name)
+                    self.postings.append(array("q"))
+                if number not in numbers:
+                    numbers.append(number)
+                    self.postings[number].append(chunk_id)
+            self.entity_numbers.extend(numbers)
+            self.entity_offsets.append(len(self.entity_numbers))
+        self.urls.extend(urls)
+
+    def get(self, chunk_id):
+        """Returns a chunk's metadata as a dictionary of url, published and entities."""
+        published = self.published[chunk_id]
+        numbers = self.entity_numbers[self.entity_offsets[chunk_id]:self.entity_offsets[chunk_id + 1]]
+        return {
+            "url": self.urls[chunk_id] or None,
+            "published": None if math.isnan(published) else published,
+            "entities": [self.names[number] for number in numbers],
+        }
+
+    def mentioning(self, entities):
+        """Returns the ascending ids of the chunks that mention any of the entities."""
+        numbers = {self._numbers.get(entity_key(name)) for name in entities} - {None}
+        if not numbers:
+            return np.empty(0, dtype=np.int64)
+        if len(numbers) == 1:
+            return np.array(self.postings[numbers.pop()], dtype=np.int64)
+        return np.unique(np.concatenate([np.array(self.postings[number], dtype=np.int64) for number in numbers]))
+
+    def published_between(self, since=None, until=None, ids=None):
+        """
+        Returns the ascending ids of the chunks published in [since, until), out
+        of ids if given. Chunks without a publish time never match.
+        """
+        # A view rather than a copy; the VectorDB lock keeps appends, which would
+        # fail while the view exists, out until it is dropped
+        published = np.frombuffer(self.published, dtype=np.float64)
+        if ids is not None:
+            published = published[ids]
+        keep = np.ones(len(published), dtype=bool)
+        if since is not None:
+            keep &= published >= since
+        if until is not None:
+            keep &= published < until
+        return np.flatnonzero(keep) if ids is None else ids[keep]
+
+    def snapshot(self, count):
+        """Copies what write() needs of the first count chunks, so appends can continue while it writes."""
+        entity_end = self.entity_offsets[count]
+        return (
+            self.urls,
+            np.array(self.published[:count], dtype=np.float64),
+            np.array(self.entity_numbers[:entity_end], dtype=np.int64),
+            np.array(self.entity_offsets[:count + 1], dtype=np.int64),
+            list(self.names),
+            count,
+        )
+
+    @classmethod
+    def write(cls, snapshot, path, suffix=""):
+        """Writes a snapshot() to a VectorDB directory, each file under its name plus suffix."""
+        urls, published, entity_numbers, entity_offsets, names, count = snapshot
+        files = {name: os.path.join(path, file) + suffix for name, file in cls.FILES.items()}
+        ChunkTexts.write(urls, files["urls"], files["url_offsets"], count=count)
+        for name, values in (("published", published), ("entities", entity_numbers), ("entity_offsets", entity_offsets)):
+            with open(files[name], "wb") as f:
+                np.save(f, values)
+        with open(files["names"], "w") as f:
+            json.dump(names, f)
+
+    @classmethod
+    def load(cls, path, count):
+        """
+        Loads the metadata of the first count chunks written to a VectorDB
+        directory. Chunks from before metadata was kept get empty metadata.
+        """
+        metadata = cls()
+        files = {name: os.path.join(path, file) for name, file in cls.FILES.items()}
+        if not all(os.path.exists(file) for file in files.values()):
+            metadata.extend([{}] * count)
+            return metadata
+
+        published = np.load(files["published"])[:count]
+        stored = len(published)
+        entity_offsets = np.load(files["entity_offsets"])[:stored + 1].astype(np.int64)
+        entity_numbers = np.load(files["entities"])[:entity_offsets[-1]].astype(np.int64)
+        with open(files["names"]) as f:
+            metadata.names = json.load(f)
+        metadata._numbers = {entity_key(name): number for number, name in enumerate(metadata.names)}
+        metadata.urls = ChunkTexts(files["urls"], files["url_offsets"], stored)
+        metadata.published.frombytes(published.astype(np.float64).tobytes())
+        metadata.entity_offsets = array("q")
+        metadata.entity_offsets.frombytes(entity_offsets.tobytes())
+        metadata.entity_numbers.frombytes(entity_numbers.tobytes())
+
+        # Rebuild the inverted index: chunk ids grouped by entity, ascending within each group
+        chunk_ids = np.repeat(np.arange(stored, dtype=np.int64), np.diff(entity_offsets))
+        order = np.argsort(entity_numbers, kind="stable")
+        bounds = np.searchsorted(entity_numbers[order], np.arange(len(metadata.names) + 1))
+        grouped = chunk_ids[order]
+        for number in range(len(metadata.names)):
+            postings = array("q")
+            postings.frombytes(grouped[bounds[number]:bounds[number + 1]].tobytes())
+            metadata.postings.append(postings)
+        metadata.extend([{}] * (count - stored))
+        return metadata
+
+
+# Saves of one directory write the same temporary files and rotate the same log,
+# so they run one at a time, whichever VectorDB of the process makes them
+_SAVE_LOCKS = {}
+_SAVE_LOCKS_LOCK = threading.Lock()
+
+
+def _save_lock(path):
+    with _SAVE_LOCKS_LOCK:
+        return _SAVE_LOCKS.setdefault(os.path.realpath(path), threading.Lock())
+
+
+class ReadWriteLock:
+    """
+    A lock many threads can hold for reading at once, or one thread for writing.
+
+    Waiting writers go first, so a steady stream of searches cannot starve adds.
+    The writing thread may take the lock again, for reading or writing; a reader
+    must not take it again, as a writer queued in between would deadlock them.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._depth = 0
+        self._waiting_writers = 0
+
+    def acquire_read(self):
+        with self._condition:
+            if self._writer == threading.get_ident():
+                self._depth += 1
+                return
+            while self._writer is not None or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self):
+        with self._condition:
+            if self._writer == threading.get_ident():
+                self._depth -= 1
+                return
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._depth += 1
+                return
+            self._waiting_writers += 1
+            while self._writer is not None or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = me
+            self._depth = 1
+
+    def release_write(self):
+        with self._condition:
+            self._depth -= 1
+            if not self._depth:
+                self._writer = None
+                self._condition.notify_all()
+
+    @contextmanager
+    def read(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
 class VectorDB:
-    def __init__(self, embedding_dim=768):  # Ensure this matches your embedding model's output size
+    def __init__(self, embedding_dim=768, index_spec="Flat", nprobe=None, ef_search=None, train_size=None,
+                 exact_filter_size=10000):  # Ensure embedding_dim matches your embedding model's output size
+        """
+        Initializes the VectorDB.
+
+        Args:
+            embedding_dim: The size of the embeddings.
+            index_spec: A faiss index factory string, e.g. "Flat", "HNSW32",
+                "IVF1024,Flat" or "IVF1024,PQ64".
+            nprobe: The default number of IVF lists visited per query.
+            ef_search: The default HNSW search depth per query.
+            train_size: The number of vectors buffered before an index that needs
+                training (IVF) is trained on a sample of them. Defaults to 39
+                vectors per IVF list or PQ centroid, faiss's recommended minimum.
+            exact_filter_size: Search filters that select at most this many chunks
+                of an IVF or HNSW index compare the query with each selected
+                vector, since approximate search reaches too few of them to fill
+                top_k. Flat indexes always do.
+        """
         self.embedding_dim = embedding_dim
-        self.index = faiss.IndexFlatL2(self.embedding_dim)
+        self.index_spec = index_spec
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.index = faiss.index_factory(self.embedding_dim, self.index_spec)
+        self.train_size = train_size or max(39 * max(self._nlist(), self._pq_centroids()), 1)
+        self.exact_filter_size = exact_filter_size
         self.text_data = []
+        self.metadata = ChunkMetadata()
+        self.pending = []
+        # Searches share the read side; adds, commits, saves and loads take the write side
+        self._lock = ReadWriteLock()
+        self._uncommitted = []
+        self._store_path = None
+        self._wal = None
+        self._compaction_thread = None
+
+    def _nlist(self):
+        """Returns the number of IVF lists of the index, or 0 if it is not an IVF index."""
+        try:
+            return faiss.extract_index_ivf(self.index).nlist
+        except RuntimeError:
+            return 0
+
+    def _pq_centroids(self):
+        """Returns the number of centroids per product quantizer of an IVF-PQ index, or 0."""
+        if not self._nlist():
+            return 0
+        ivf = faiss.downcast_index(faiss.extract_index_ivf(self.index))
+        return ivf.pq.ksub if hasattr(ivf, "pq") else 0
+
+    def _ensure_trained(self):
+        """Trains the index on a sample of the buffered vectors and adds them."""
+        if not self.pending:
+            return
+        vectors = np.vstack(self.pending)
+        if not self.index.is_trained:
+            sample_size = min(len(vectors), max(self.train_size, 256 * self._nlist()))
+            sample = vectors[np.random.default_rng(0).choice(len(vectors), sample_size, replace=False)]
+            try:
+                self.index.train(sample)
+            except RuntimeError as e:
+                raise ValueError(f"Not enough vectors to train a {self.index_spec} index: {len(vectors)}") from e
+        self.index.add(vectors)
+        self.pending = []
+
+    @property
+    def ntotal(self):
+        """The number of stored vectors, including those waiting for training."""
+        return self.index.ntotal + sum(len(vectors) for vectors in self.pending)
 
     def add_embeddings(self, chunk_embeddings):
-        """Add chunk embeddings to the FAISS index."""
+        """
+        Add chunk embeddings to the FAISS index.
+
+        Args:
+            chunk_embeddings: Dictionaries with the chunk's "text" and "embedding",
+                and optionally its article's "url" and "published" time and the
+                "entities" it mentions, which search filters can select on.
+        """
         embeddings = np.array(
             [
                 entry["embedding"] for entry in chunk_embeddings
             ]
         ).astype(np.float32)
-        self.index.add(embeddings)
-        self.text_data.extend(
-            [
-                entry["text"] for entry in chunk_embeddings
-            ]
-        )
+        texts = [
+            entry["text"] for entry in chunk_embeddings
+        ]
+        metadata = [
+            {"url": entry.get("url"), "published": entry.get("published"), "entities": list(entry.get("entities") or ())}
+            for entry in chunk_embeddings
+        ]
+        with metrics.timer("vector_add_seconds"), self._lock.write():
+            self._uncommitted.append((len(self.text_data), embeddings, texts, metadata))
+            self._add(embeddings, texts, metadata)
+        metrics.inc("vectors_added_total", len(texts))
+
+    def _add(self, embeddings, texts, metadata):
+        if self.index.is_trained:
+            self.index.add(embeddings)
+        else:
+            # Buffer until there are enough vectors to train on
+            self.pending.append(embeddings)
+            if self.ntotal >= self.train_size:
+                self._ensure_trained()
+        self.text_data.extend(texts)
+        self.metadata.extend(metadata)
+
+    def commit(self, path="faiss_index"):
+        """
+        Appends the embeddings added since the last commit or save to the
+        write-ahead log of an index directory and syncs it to disk.
+
+        This only writes the new vectors and texts, so it is cheap enough to call
+        after every article. The first commit to a directory writes a full save.
+        """
+        with self._lock.write():
+            first_save = self._store_path != path
+            if first_save:
+                if os.path.exists(os.path.join(path, "meta.json")):
+                    raise ValueError(f"{path} holds another index; load_index it before committing to it.")
+            elif self._uncommitted:
+                with metrics.timer("vector_commit_seconds"):
+                    if self._wal is None:
+                        self._wal = open(os.path.join(path, WAL_FILE), "ab")
+                    for start, embeddings, texts, metadata in self._uncommitted:
+                        self._wal.write(encode_wal_record(start, embeddings, texts, metadata))
+                    self._wal.flush()
+                    os.fsync(self._wal.fileno())
+                self._uncommitted = []
+        # After releasing the lock, since a save takes the directory's save lock first
+        if first_save:
+            self.save_index(path)
+
+    def save_index(self, path="faiss_index", blocking=True):
+        """
+        Save FAISS index and text data to a directory, compacting its write-ahead log.
+
+        The index is written with faiss's native writer and the chunk texts to an
+        offset-indexed file, so load_index can memory-map both; the chunk
+        metadata is written next to them. Every file is written under a
+        temporary name and renamed into place, so workers that have the
+        previous files mapped keep a consistent view. Only taking the
+        snapshot holds the lock; writing it does not block add_embeddings.
+        Saves of the same directory run one at a time.
+
+        Args:
+            path: The index directory.
+            blocking: Whether to wait for a save of the directory that is in
+                progress; if False, such a save is left to finish and this one skipped.
+
+        Returns:
+            True if the index was saved, False if the save was skipped.
+        """
+        save_lock = _save_lock(path)
+        if not save_lock.acquire(blocking):
+            return False
+        try:
+            self._save_index(path)
+        finally:
+            save_lock.release()
+        return True
+
+    def _save_index(self, path):
+        os.makedirs(path, exist_ok=True)
+        files = {
+            "index": os.path.join(path, "index.faiss"),
+            "texts": os.path.join(path, "texts.bin"),
+            "offsets": os.path.join(path, "texts.idx.npy"),
+            "pending": os.path.join(path, "pending.npy"),
+            "meta": os.path.join(path, "meta.json"),
+            **{name: os.path.join(path, file) for name, file in ChunkMetadata.FILES.items()},
+        }
+
+        with self._lock.write():
+            count = len(self.text_data)
+            index_bytes = faiss.serialize_index(self.index)
+            pending = np.vstack(self.pending) if self.pending else None
+            texts = self.text_data
+            metadata = self.metadata.snapshot(count)
+            # Everything logged so far is covered by this snapshot; later commits
+            # go to a fresh log, and the old ones are removed once it is written.
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+            compacted = glob.glob(os.path.join(path, "wal.*.old"))
+            wal_path = os.path.join(path, WAL_FILE)
+            if os.path.exists(wal_path):
+                rotated = os.path.join(path, f"wal.{count}.old")
+                os.replace(wal_path, rotated)
+                compacted.append(rotated)
+            self._uncommitted = []
+            self._store_path = path
+
+        index_bytes.tofile(files["index"] + ".tmp")
+        ChunkTexts.write(texts, files["texts"] + ".tmp", files["offsets"] + ".tmp", count=count)
+        ChunkMetadata.write(metadata, path, suffix=".tmp")
+        if pending is not None:
+            with open(files["pending"] + ".tmp", "wb") as f:
+                np.save(f, pending)
+        with open(files["meta"] + ".tmp", "w") as f:
+            json.dump(
+                {
+                    "index_spec": self.index_spec,
+                    "embedding_dim": self.embedding_dim,
+                    "count": count,
+                },
+                f,
+            )
+
+        # The texts go first and the index is the source of truth for the count on
+        # load, so a crash part way through leaves a loadable snapshot that the
+        # log (only removed at the end) brings up to date.
+        for name in ["texts", "offsets", *ChunkMetadata.FILES, "index", "pending", "meta"]:
+            if os.path.exists(files[name] + ".tmp"):
+                os.replace(files[name] + ".tmp", files[name])
+            elif name == "pending" and os.path.exists(files[name]):
+                os.remove(files[name])
+        for wal_path in compacted:
+            os.remove(wal_path)
+        self._map_saved_texts(path, count)
 
-    def save_index(self, path="faiss_index.pkl"):
-        """Save FAISS index and text data."""
-        with open(path, "wb") as f:
-            pickle.dump({"index": self.index, "texts": self.text_data}, f)
+    def _map_saved_texts(self, path, count):
+        """
+        Replaces the chunk texts and URLs with views of the files save_index just
+        wrote, so the ones held in memory since the last load or save are freed.
+        """
+        files = {name: os.path.join(path, file) for name, file in ChunkMetadata.FILES.items()}
+        texts = ChunkTexts(os.path.join(path, "texts.bin"), os.path.join(path, "texts.idx.npy"), count)
+        urls = ChunkTexts(files["urls"], files["url_offsets"], count)
+        with self._lock.write():
+            if self._store_path != path:
+                return  # saved somewhere else meanwhile
+            # Chunks added while the files were written stay in memory
+            texts.extend([self.text_data[i] for i in range(count, len(self.text_data))])
+            urls.extend([self.metadata.urls[i] for i in range(count, len(self.metadata.urls))])
+            self.text_data = texts
+            self.metadata.urls = urls
 
-    def load_index(self, path="faiss_index.pkl"):
-        """Load FAISS index and text data."""
+    def start_compaction(self, path="faiss_index", interval=300.0, min_log_bytes=64 * 1024 * 1024):
+        """
+        Starts a background thread that compacts the write-ahead log into a full
+        save whenever it has grown past min_log_bytes, checking every interval seconds.
+        """
+        self.stop_compaction()
+        self._compaction_stop = threading.Event()
+
+        def compact_periodically(stop):
+            while not stop.wait(interval):
+                wal_path = os.path.join(path, WAL_FILE)
+                if os.path.exists(wal_path) and os.path.getsize(wal_path) >= min_log_bytes:
+                    try:
+                        # An explicit save of the directory in progress compacts the log too
+                        self.save_index(path, blocking=False)
+                    except Exception as e:
+                        print(f"Error compacting index: {e}")
+
+        self._compaction_thread = threading.Thread(target=compact_periodically, args=(self._compaction_stop,), daemon=True)
+        self._compaction_thread.start()
+
+    def stop_compaction(self):
+        """Stops the background compaction thread, if one is running."""
+        if self._compaction_thread is not None:
+            self._compaction_stop.set()
+            self._compaction_thread.join()
+            self._compaction_thread = None
+
+    def close(self):
+        """Stops background compaction and closes the write-ahead log."""
+        self.stop_compaction()
+        with self._lock.write():
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+
+    def load_index(self, path="faiss_index", memory_map=False):
+        """
+        Load FAISS index and text data, replaying the write-ahead log.
+
+        Args:
+            path: A directory written by save_index, or a legacy pickle file.
+            memory_map: Map the index read-only instead of reading it into RAM, so
+                several query workers share it through the page cache. Indexes
+                loaded this way cannot be added to, so the index is read into RAM
+                after all when the log holds vectors that are not in the snapshot.
+        """
+        if os.path.isfile(path):
+            self._load_pickle(path)
+            return
+
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if memory_map else 0
+        index = faiss.read_index(os.path.join(path, "index.faiss"), flags)
+        # Buffered vectors only exist while an index is untrained; a pending file
+        # next to a trained index is left over from an interrupted save.
+        pending_path = os.path.join(path, "pending.npy")
+        pending = [np.load(pending_path)] if os.path.exists(pending_path) and not index.is_trained else []
+        count = index.ntotal + sum(len(vectors) for vectors in pending)
+
+        records = []
+        for wal_path in glob.glob(os.path.join(path, "wal*")):
+            records.extend(read_wal_records(wal_path, truncate=wal_path.endswith(WAL_FILE)))
+        records = [record for record in sorted(records, key=lambda record: record[0]) if record[0] + len(record[2]) > count]
+        if records and memory_map:
+            # A read-only mapped index cannot take the logged vectors
+            index = faiss.read_index(os.path.join(path, "index.faiss"))
+
+        with self._lock.write():
+            self.index = index
+            self.pending = pending
+            self.text_data = ChunkTexts(os.path.join(path, "texts.bin"), os.path.join(path, "texts.idx.npy"), count)
+            self.metadata = ChunkMetadata.load(path, count)
+            self.index_spec = meta["index_spec"]
+            self.embedding_dim = meta["embedding_dim"]
+
+            for start, embeddings, texts, metadata in records:
+                if start > len(self.text_data):
+                    raise ValueError(f"Write-ahead log in {path} is missing vectors {len(self.text_data)} to {start}.")
+                skip = len(self.text_data) - start
+                if skip < len(texts):
+                    self._add(embeddings[skip:], texts[skip:], (metadata or [{}] * len(texts))[skip:])
+
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+            self._uncommitted = []
+            self._store_path = path
+
+    def _load_pickle(self, path):
+        """Load a FAISS index and text data pickled by earlier versions of save_index."""
         with open(path, "rb") as f:
             data = pickle.load(f)
             self.index = data["index"]
             self.text_data = data["texts"]
+            self.pending = data.get("pending", [])
+            self.index_spec = data.get("index_spec", "Flat")
+            self.metadata = ChunkMetadata()
+            self.metadata.extend([{}] * len(self.text_data))
 
-    def search(self, query_embedding, top_k):
-        """Search for the top K most relevant documents with error handling."""
-        query_vector = np.array(query_embedding).astype(np.float32).reshape(1, -1)
-        if query_vector.shape[1] != self.index.d:
-            raise ValueError(f"Embedding size mismatch: Expected {self.index.d}, but got {query_vector.shape[1]}")
+    @classmethod
+    def migrate_pickle(cls, pickle_path="faiss_index.pkl", path="faiss_index"):
+        """Converts a legacy faiss_index.pkl into the directory format of save_index."""
+        vector_db = cls()
+        vector_db.load_index(pickle_path)
+        vector_db.embedding_dim = vector_db.index.d
+        vector_db.save_index(path)
+        return vector_db
+
+    def _search_parameters(self, nprobe=None, ef_search=None, selector=None):
+        """
+        Builds per-query faiss search parameters, so concurrent searches can tune
+        them independently. A selector restricts the search to the ids it accepts.
+        """
+        nprobe = nprobe or self.nprobe
+        ef_search = ef_search or self.ef_search
+        extra = {"sel": selector} if selector is not None else {}
+        # IVF and HNSW indexes only take their own parameter types
+        if self._nlist() and (nprobe or selector is not None):
+            return faiss.SearchParametersIVF(nprobe=nprobe or faiss.extract_index_ivf(self.index).nprobe, **extra)
+        if isinstance(self.index, faiss.IndexHNSW) and (ef_search or selector is not None):
+            return faiss.SearchParametersHNSW(efSearch=ef_search or self.index.hnsw.efSearch, **extra)
+        return faiss.SearchParameters(**extra) if extra else None
+
+    def select_ids(self, entities=None, since=None, until=None):
+        """
+        Returns the ascending ids of the chunks that mention any of the entities
+        and were published in [since, until), or None if there is no filter.
+
+        Args:
+            entities: Entity names, matched by entity_key; None for any entity.
+            since: The earliest publish time, in seconds since the epoch.
+            until: The publish time chunks must be older than.
+        """
+        with self._lock.read():
+            return self._select_ids(entities, since, until)
+
+    def _select_ids(self, entities, since, until):
+        if entities is None and since is None and until is None:
+            return None
+        ids = self.metadata.mentioning(entities) if entities is not None else None
+        if since is not None or until is not None:
+            ids = self.metadata.published_between(since, until, ids)
+        return ids
 
-        top_k = min(top_k, self.index.ntotal)  # Avoid exceeding available data
-        distances, indices = self.index.search(query_vector, top_k)
-        if indices[0][0] == -1:
+    def _id_selector(self, ids):
+        # A flat index only visits the ids of an IDSelectorArray; IVF and HNSW
+        # test each candidate, which the hash set of an IDSelectorBatch answers faster
+        if self._nlist() or isinstance(self.index, faiss.IndexHNSW):
+            return faiss.IDSelectorBatch(ids)
+        return faiss.IDSelectorArray(ids)
+
+    def search_batch(self, query_embeddings, top_k, nprobe=None, ef_search=None, entities=None, since=None, until=None):
+        """
+        Search for the top K documents of many queries with a single FAISS call.
+
+        With an entity or time filter, FAISS only considers the chunks that
+        select_ids returns, so an entity-scoped query ranks the chunks that
+        mention the entity rather than the whole index. The same filter applies
+        to every query in the batch. Until an index that needs training has
+        buffered enough vectors to train on, the buffer is searched exactly.
+
+        Args:
+            query_embeddings: An (n, d) array of query embeddings.
+            top_k: The number of results per query.
+            entities: Only search chunks that mention any of these entity names.
+            since: Only search chunks published at or after this time.
+            until: Only search chunks published before this time.
+
+        Returns:
+            A tuple of (ids, distances), both (n, top_k) NumPy arrays. Rows with
+            fewer than top_k results are padded with id -1. Use texts_for(ids) to
+            fetch the texts of the hits.
+        """
+        with metrics.timer("vector_search_seconds"):
+            return self._search_batch(query_embeddings, top_k, nprobe, ef_search, entities, since, until)
+
+    def _search_batch(self, query_embeddings, top_k, nprobe, ef_search, entities, since, until):
+        query_vectors = np.ascontiguousarray(query_embeddings, dtype=np.float32)
+        if query_vectors.ndim == 1:
+            query_vectors = query_vectors.reshape(1, -1)
+        if query_vectors.shape[1] != self.index.d:
+            raise ValueError(f"Embedding size mismatch: Expected {self.index.d}, but got {query_vectors.shape[1]}")
+
+        if (entities is not None or since is not None or until is not None) and self._nlist():
+            self._ensure_direct_map()
+        # faiss does not support searching an index while another thread adds to it,
+        # so searches share the read side of the lock that add_embeddings writes
+        with self._lock.read():
+            selected = self._select_ids(entities, since, until)
+            metrics.inc("vector_search_queries_total", len(query_vectors))
+            if selected is not None:
+                metrics.observe("vector_search_selected_ids", len(selected))
+            if self.ntotal == 0 or top_k == 0 or (selected is not None and len(selected) == 0):
+                shape = (len(query_vectors), top_k)
+                return np.full(shape, -1, dtype=np.int64), np.full(shape, np.finfo(np.float32).max, dtype=np.float32)
+
+            if self.pending:
+                # Not trained yet: search the buffered vectors exactly. Only adding
+                # enough vectors trains the index, never a search.
+                ids = selected if selected is not None else np.arange(self.ntotal, dtype=np.int64)
+                vectors = np.vstack(self.pending)[ids - self.index.ntotal]
+                return self._exact_search(query_vectors, top_k, ids, vectors)
+
+            approximate = self._nlist() or isinstance(self.index, faiss.IndexHNSW)
+            if selected is not None and approximate and len(selected) <= self.exact_filter_size:
+                return self._search_selected(query_vectors, top_k, selected)
+
+            # The selector must outlive the search, so keep a reference to it here
+            selector = self._id_selector(selected) if selected is not None else None
+            params = self._search_parameters(nprobe, ef_search, selector)
+            if params is None:
+                distances, ids = self.index.search(query_vectors, top_k)
+            else:
+                distances, ids = self.index.search(query_vectors, top_k, params=params)
+            return ids, distances
+
+    def _ensure_direct_map(self):
+        """
+        Gives an IVF index the id -> list map that reconstructing selected vectors
+        needs. Built under the write lock, as it changes the index; later adds keep
+        it up to date and it is saved with the index.
+        """
+        if faiss.extract_index_ivf(self.index).direct_map.type != faiss.DirectMap.NoMap:
+            return
+        with self._lock.write():
+            ivf = faiss.extract_index_ivf(self.index)
+            if ivf.direct_map.type == faiss.DirectMap.NoMap:
+                ivf.make_direct_map()
+
+    def _search_selected(self, query_vectors, top_k, selected):
+        """
+        Exact search over the vectors of a few selected ids, padded like
+        search_batch. Called under the read lock, after _ensure_direct_map.
+        """
+        vectors = self.index.reconstruct_batch(selected)
+        return self._exact_search(query_vectors, top_k, selected, vectors)
+
+    def _exact_search(self, query_vectors, top_k, ids, vectors):
+        """Compares the queries with every one of vectors, whose ids are ids; padded like search_batch."""
+        k = min(top_k, len(ids))
+        distances, positions = faiss.knn(query_vectors, vectors, k, metric=self.index.metric_type)
+        padded_ids = np.full((len(query_vectors), top_k), -1, dtype=np.int64)
+        padded = np.full((len(query_vectors), top_k), np.finfo(np.float32).max, dtype=np.float32)
+        padded_ids[:, :k] = ids[positions]
+        padded[:, :k] = distances
+        return padded_ids, padded
+
+    def texts_for(self, ids):
+        """Returns the chunk texts for each row of ids from search_batch, skipping -1 padding."""
+        return [[self.text_data[i] for i in row if i != -1] for row in ids]
+
+    def chunks_for(self, ids, distances):
+        """
+        Returns the chunks for each row of ids and distances from search_batch,
+        skipping -1 padding, as dictionaries of id, match_distance, text, url,
+        published and entities.
+        """
+        with self._lock.read():
+            return [
+                [
+                    {"id": int(i), "match_distance": distance, "text": self.text_data[i], **self.metadata.get(i)}
+                    for i, distance in zip(row_ids, row_distances) if i != -1
+                ]
+                for row_ids, row_distances in zip(ids, distances)
+            ]
+
+    def search(self, query_embedding, top_k, nprobe=None, ef_search=None, entities=None, since=None, until=None):
+        """Search for the top K most relevant documents with error handling."""
+        top_k = min(top_k, self.ntotal)  # Avoid exceeding available data
+        ids, distances = self.search_batch(
+            np.asarray(query_embedding).reshape(1, -1), top_k, nprobe, ef_search, entities, since, until
+        )
+        if top_k == 0 or ids[0][0] == -1:
             return [("No relevant document found.", None)]
 
-        return ((self.text_data[i], distances[0][j]) for j, i in enumerate(indices[0]))
+        # Approximate indexes pad rows with -1 when fewer than top_k neighbours are found
+        valid = ids[0] != -1
+        return list(zip(self.texts_for(ids[:1])[0], distances[0][valid]))
+
+
+    def retrieve_relevant_chunks(self, query_embedding, top_k=3, nprobe=None, ef_search=None, entities=None, since=None,
+                                 until=None):
+        """Retrieve relevant document chunks based on a query, optionally filtered as in search_batch."""
+        top_k = min(top_k, self.ntotal)
+        ids, distances = self.search_batch(
+            np.asarray(query_embedding).reshape(1, -1), top_k, nprobe, ef_search, entities, since, until
+        )
+        relevant_chunks = self.chunks_for(ids, distances)[0]
+        if not relevant_chunks:
+            return [{"match_distance": None, "text": "No relevant document found."}]
+        return relevant_chunks
+
+    def retrieve_relevant_chunks_batch(self, query_embeddings, top_k=3, nprobe=None, ef_search=None, entities=None,
+                                       since=None, until=None):
+        """Retrieve relevant document chunks for many queries with one FAISS call, optionally filtered as in search_batch."""
+        ids, distances = self.search_batch(query_embeddings, top_k, nprobe, ef_search, entities, since, until)
+        return self.chunks_for(ids, distances)
+
+SHARDS_FILE = "shards.json"
+SHARD_PERIODS = {"day": 86400, "week": 7 * 86400}
+# The epoch fell on a Thursday; weeks start on Mondays, as ISO weeks do
+_PERIOD_ORIGINS = {"day": 0, "week": 4 * 86400}
+
+
+class ShardedVectorDB:
+    """
+    A vector store split into shards by publish time, one VectorDB per day or week.
+
+    Chunks are added to the shard of their article's publish time, or of the
+    time they are added if it is unknown, which is then also their publish time
+    for filters. Searches fan out to the shards in parallel, skipping those
+    outside a since/until window, so a "last 48 hours" query touches two or
+    three daily shards, and the per-shard top k are merged. Shards older than
+    the retention period are dropped or moved to an archive directory whole,
+    so expiring content never rebuilds an index and the searched set stays
+    bounded under continuous ingest.
+
+    On disk, each shard is a VectorDB directory named after its first day
+    (YYYY-MM-DD, in UTC) inside the store's directory.
+    """
+
+    def __init__(self, period="day", retention=None, archive_path=None, search_workers=8, **vector_db_options):
+        """
+        Initializes the ShardedVectorDB.
+
+        Args:
+            period: "day" or "week"; load_index takes the period of the store it loads.
+            retention: Seconds a shard is kept after its period ends, or None to keep
+                every shard. Chunks that would land in an expired shard are dropped.
+            archive_path: A directory expired shards are moved to, or None to delete them.
+            search_workers: The number of threads searches fan out on.
+            vector_db_options: Keyword arguments for each shard's VectorDB, e.g.
+                embedding_dim and index_spec. Shards start small, so indexes that
+                need training (IVF) only suit weekly shards of a busy feed.
+        """
+        if period not in SHARD_PERIODS:
+            raise ValueError(f"Unknown shard period {period!r}, expected one of {sorted(SHARD_PERIODS)}")
+        self.period = period
+        self.retention = retention
+        self.archive_path = archive_path
+        self.vector_db_options = vector_db_options
+        self.shards = {}  # period start time -> VectorDB
+        self.dropped = 0
+        self._lock = threading.RLock()
+        self._store_path = None
+        self.search_executor = ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix="shard-search")
+
+    @property
+    def period_seconds(self):
+        return SHARD_PERIODS[self.period]
+
+    def shard_start(self, timestamp):
+        """Returns the start time of the period a timestamp falls in."""
+        origin = _PERIOD_ORIGINS[self.period]
+        return origin + math.floor((timestamp - origin) / self.period_seconds) * self.period_seconds
+
+    @staticmethod
+    def shard_name(start):
+        return time.strftime("%Y-%m-%d", time.gmtime(start))
+
+    @staticmethod
+    def _parse_shard_name(name):
+        try:
+            return calendar.timegm(time.strptime(name, "%Y-%m-%d"))
+        except ValueError:
+            return None
+
+    @property
+    def ntotal(self):
+        """The number of stored vectors across the shards."""
+        with self._lock:
+            shards = list(self.shards.values())
+        return sum(shard.ntotal for shard in shards)
 
+    def _retention_cutoff(self, now=None):
+        """Returns the start time before which a shard has expired, or None without retention."""
+        if self.retention is None:
+            return None
+        return (time.time() if now is None else now) - self.retention - self.period_seconds
 
-    def retrieve_relevant_chunks(self, query_embedding, top_k=3):
-        """Retrieve relevant document chunks based on a query."""
-        top_k = min(top_k, self.index.ntotal)  # Avoid requesting more results than available
-        results = list(self.search(query_embedding, top_k))
-        relevant_chunks = [
-            {"match_distance": distance, "text": text}
-            for text, distance in results  # Unpack tuples from the list
+    def add_embeddings(self, chunk_embeddings):
+        """
+        Adds chunk embeddings, as for VectorDB.add_embeddings, each to the shard of
+        its "published" time.
+        """
+        now = time.time()
+        cutoff = self._retention_cutoff(now)
+        by_shard = {}
+        for entry in chunk_embeddings:
+            if entry.get("published") is None:
+                entry = dict(entry, published=now)
+            start = self.shard_start(entry["published"])
+            if cutoff is not None and start < cutoff:
+                self.dropped += 1
+                continue
+            by_shard.setdefault(start, []).append(entry)
+        for start, entries in by_shard.items():
+            # Added under the lock, so expire() cannot close the shard in between and lose them
+            with self._lock:
+                shard = self.shards.get(start)
+                if shard is None:
+                    shard = self.shards[start] = VectorDB(**self.vector_db_options)
+                shard.add_embeddings(entries)
+
+    def commit(self, path="faiss_shards"):
+        """
+        Commits every shard's new embeddings to its write-ahead log, as
+        VectorDB.commit does, and then expires shards past the retention period.
+        The first commit to a directory writes a full save.
+        """
+        with self._lock:
+            if self._store_path != path:
+                if os.path.exists(os.path.join(path, SHARDS_FILE)):
+                    raise ValueError(f"{path} holds another sharded index; load_index it before committing to it.")
+                self.save_index(path)
+                return
+            shards = list(self.shards.items())
+        for start, shard in shards:
+            shard.commit(os.path.join(path, self.shard_name(start)))
+        self.expire()
+
+    def save_index(self, path="faiss_shards"):
+        """
+        Saves every shard to a subdirectory of path, compacting their write-ahead
+        logs. Saves of the same directory run one at a time.
+        """
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            shards = list(self.shards.items())
+            self._store_path = path
+        with _save_lock(path):
+            for start, shard in shards:
+                shard.save_index(os.path.join(path, self.shard_name(start)))
+            with open(os.path.join(path, SHARDS_FILE) + ".tmp", "w") as f:
+                json.dump({"period": self.period}, f)
+            os.replace(os.path.join(path, SHARDS_FILE) + ".tmp", os.path.join(path, SHARDS_FILE))
+        self.expire()
+
+    def load_index(self, path="faiss_shards", memory_map=False):
+        """
+        Loads the shards saved in a directory in parallel, replaying their
+        write-ahead logs. Shards past the retention period are not loaded, but
+        are left on disk for the next commit or expire() to remove.
+
+        Args:
+            path: A directory written by save_index or commit.
+            memory_map: Passed to each shard's VectorDB.load_index.
+        """
+        with open(os.path.join(path, SHARDS_FILE)) as f:
+            self.period = json.load(f)["period"]
+        cutoff = self._retention_cutoff()
+        starts = {}
+        for name in sorted(os.listdir(path)):
+            start = self._parse_shard_name(name)
+            if start is not None and os.path.exists(os.path.join(path, name, "meta.json")):
+                starts[start] = os.path.join(path, name)
+
+        def load(shard_path):
+            shard = VectorDB(**self.vector_db_options)
+            shard.load_index(shard_path, memory_map=memory_map)
+            return shard
+
+        live = [start for start in starts if cutoff is None or start >= cutoff]
+        loaded = list(self.search_executor.map(load, [starts[start] for start in live]))
+        with self._lock:
+            for shard in self.shards.values():
+                shard.close()
+            self.shards = dict(zip(live, loaded))
+            self._store_path = path
+
+    def expire(self, now=None):
+        """
+        Drops the shards whose period ended more than the retention period ago,
+        deleting their directories, including those of shards that were never
+        loaded, or moving them to archive_path.
+
+        Returns:
+            The names of the expired shards.
+        """
+        cutoff = self._retention_cutoff(now)
+        if cutoff is None:
+            return []
+        with self._lock:
+            expired = [start for start in self.shards if start < cutoff]
+            for start in expired:
+                # Searches already running keep their reference to the shard
+                self.shards.pop(start).close()
+        if self._store_path is not None:
+            for name in os.listdir(self._store_path):
+                start = self._parse_shard_name(name)
+                if start is not None and start < cutoff and start not in expired:
+                    expired.append(start)
+            for start in expired:
+                self._remove_shard_files(start)
+        return sorted(self.shard_name(start) for start in expired)
+
+    def _remove_shard_files(self, start):
+        shard_path = os.path.join(self._store_path, self.shard_name(start))
+        if os.path.exists(shard_path):
+            try:
+                if self.archive_path is not None:
+                    os.makedirs(self.archive_path, exist_ok=True)
+                    shutil.move(shard_path, os.path.join(self.archive_path, self.shard_name(start)))
+                else:
+                    shutil.rmtree(shard_path)
+            except OSError as e:
+                print(f"Error expiring shard {shard_path}: {e}")
+
+    def shards_between(self, since=None, until=None):
+        """Returns the (start, VectorDB) of the shards whose period overlaps [since, until), newest first."""
+        with self._lock:
+            shards = sorted(self.shards.items(), reverse=True)
+        return [
+            (start, shard) for start, shard in shards
+            if (since is None or start + self.period_seconds > since) and (until is None or start < until)
         ]
-        return relevant_chunks
\ No newline at end of file
+
+    def retrieve_relevant_chunks_batch(self, query_embeddings, top_k=3, nprobe=None, ef_search=None, entities=None,
+                                       since=None, until=None):
+        """
+        Retrieves the top_k chunks of many queries from the shards that overlap
+        [since, until), searching them in parallel and merging their results.
+        Arguments are as for VectorDB.retrieve_relevant_chunks_batch; chunks also
+        carry the name of their "shard", as their ids are per shard.
+        """
+        query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+        if query_embeddings.ndim == 1:
+            query_embeddings = query_embeddings.reshape(1, -1)
+
+        def search(start, shard):
+            # Shards wholly inside the window need no per-chunk time filter
+            shard_since = since if since is not None and start < since else None
+            shard_until = until if until is not None and start + self.period_seconds > until else None
+            name = self.shard_name(start)
+            try:
+                rows = shard.retrieve_relevant_chunks_batch(
+                    query_embeddings, top_k, nprobe, ef_search, entities, shard_since, shard_until
+                )
+            except Exception as e:
+                # e.g. an IVF shard that has not seen enough vectors to train yet
+                print(f"Error searching shard {name}: {e}")
+                metrics.inc("shard_search_errors_total")
+                return [[] for _ in query_embeddings]
+            return [[dict(chunk, shard=name) for chunk in row] for row in rows]
+
+        shards = self.shards_between(since, until)
+        futures = [self.search_executor.submit(search, start, shard) for start, shard in shards]
+        metrics.observe("shards_searched", len(futures))
+        merged = [[] for _ in query_embeddings]
+        for future in futures:
+            for row, chunks in zip(merged, future.result()):
+                row.extend(chunks)
+        # Every shard holds the same model's embeddings under the same metric, so
+        # distances compare across shards; inner product ranks larger first
+        descending = bool(shards) and shards[0][1].index.metric_type == faiss.METRIC_INNER_PRODUCT
+        return [sorted(row, key=lambda chunk: chunk["match_distance"], reverse=descending)[:top_k] for row in merged]
+
+    def retrieve_relevant_chunks(self, query_embedding, top_k=3, nprobe=None, ef_search=None, entities=None, since=None,
+                                 until=None):
+        """Retrieves the top_k chunks of one query, as retrieve_relevant_chunks_batch does."""
+        chunks = self.retrieve_relevant_chunks_batch(
+            np.asarray(query_embedding).reshape(1, -1), top_k, nprobe, ef_search, entities, since, until
+        )[0]
+        if not chunks:
+            return [{"match_distance": None, "text": "No relevant document found."}]
+        return chunks
+
+    def close(self):
+        """Closes every shard and stops the search threads."""
+        with self._lock:
+            for shard in self.shards.values():
+                shard.close()
+        self.search_executor.shutdown(wait=False)
\ No newline at end of file
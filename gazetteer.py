@@ -0,0 +1,191 @@
+import re
+import threading
+import time
+import unicodedata
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_END = object()
+
+
+def fold(token):
+    """Case- and accent-folds a token, so "Zelenskyy", "ZELENSKYY" and "Zelénskyy" match alike."""
+    if token.isascii():
+        return token.lower()
+    decomposed = unicodedata.normalize("NFKD", token)
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch)).casefold()
+
+
+def tokenize(text):
+    """Returns the (folded token, start_char, end_char) tuples of a text; punctuation marks are tokens of their own."""
+    return [(fold(m.group()), m.start(), m.end()) for m in _TOKEN.finditer(text)]
+
+
+def name_tokens(name):
+    """Returns the folded tokens of an entity name; a leading "the" is not part of a name."""
+    tokens = [token for token, _, _ in tokenize(name)]
+    return tokens[1:] if len(tokens) > 1 and tokens[0] == "the" else tokens
+
+
+def entity_key(name):
+    """Returns a key under which spellings of a name such as "The White House" and "white house" compare equal."""
+    return " ".join(name_tokens(name))
+
+
+class Gazetteer:
+    """
+    Finds known entity names in short texts, such as user queries, without a model.
+
+    Names are stored in a trie over folded tokens and matched leftmost-longest in
+    one pass over the query, so "New York Times" wins over "New York". This is
+    Aho-Corasick restricted to token boundaries: queries are a few tokens long,
+    so the trie walk is as fast as following failure links, and adding a name
+    only inserts its path, with no automaton to rebuild. That lets ingest add
+    names as it writes them.
+
+    A leading "the" is not part of a name, and single-token names only match a
+    capitalized word, so "apple pie" does not find Apple.
+    """
+
+    def __init__(self, surname_aliases=True, case_sensitive_single_tokens=True):
+        """
+        Initializes the Gazetteer.
+
+        Args:
+            surname_aliases: Whether a multi-token PERSON name is also found by its
+                last token ("Biden" for "Joe Biden"), unless two people share it.
+            case_sensitive_single_tokens: Whether single-token names only match
+                words that start with an uppercase letter.
+        """
+        self.surname_aliases = surname_aliases
+        self.case_sensitive_single_tokens = case_sensitive_single_tokens
+        self._root = {}
+        self._labels = {}
+        self._surnames = {}
+        self._lock = threading.Lock()
+        self.refreshed_at = None
+        self.hits = 0
+        self.misses = 0
+
+    def _insert(self, tokens, name):
+        node = self._root
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node[_END] = name
+
+    def add(self, name, label, aliases=()):
+        """
+        Adds an entity name, and aliases that should find it too.
+
+        Args:
+            name: The name as stored in the graph, which match() returns.
+            label: The entity label, e.g. "PERSON".
+            aliases: Other names of the entity, e.g. "UN" for "the United Nations".
+        """
+        tokens = name_tokens(name)
+        if not tokens:
+            return
+        with self._lock:
+            self._labels[name] = label
+            self._insert(tokens, name)
+            for alias in aliases:
+                alias_tokens = name_tokens(alias)
+                if alias_tokens:
+                    self._insert(alias_tokens, name)
+            if self.surname_aliases and label == "PERSON" and len(tokens) > 1:
+                self._add_surname(tokens[-1], name)
+
+    def _add_surname(self, surname, name):
+        owner = self._surnames.get(surname, name)
+        if owner is None:
+            return  # already shared by two people
+        node = self._root.setdefault(surname, {})
+        if owner != name:
+            # Shared by two people, so the surname alone is ambiguous
+            self._surnames[surname] = None
+            if node.get(_END) == owner:
+                del node[_END]
+        else:
+            self._surnames[surname] = name
+            if _END not in node:
+                node[_END] = name
+
+    def add_entities(self, entities):
+        """
+        Adds a dictionary of entity name to label. Can be registered with
+        Neo4jAuraDB.add_write_listener, so ingest keeps the gazetteer current.
+        """
+        for name, label in dict(entities).items():
+            if label is not None and name not in self._labels:
+                self.add(name, label)
+
+    def refresh(self, graph_db, overlap=60.0):
+        """
+        Adds the graph's entity names created since the last refresh, or all of
+        them on the first call.
+
+        Args:
+            graph_db: A Neo4jAuraDB.
+            overlap: Seconds the refresh window reaches back, for clock skew
+                between the ingest hosts and this one.
+
+        Returns:
+            The number of names added.
+        """
+        since = self.refreshed_at - overlap if self.refreshed_at is not None else None
+        started = time.time()
+        before = len(self)
+        self.add_entities((name, label) for name, label in graph_db.fetch_entity_names(since=since))
+        self.refreshed_at = started
+        return len(self) - before
+
+    def match(self, text):
+        """
+        Returns the known entities in a text as (name, label) tuples, in order of
+        appearance and without repeats.
+        """
+        tokens = tokenize(text)
+        found = {}
+        i = 0
+        while i < len(tokens):
+            node = self._root
+            longest = None
+            j = i
+            while j < len(tokens):
+                node = node.get(tokens[j][0])
+                if node is None:
+                    break
+                j += 1
+                name = node.get(_END)
+                if name is not None:
+                    longest = (j, name)
+            if longest is not None and self._accept(text, tokens[i], longest[0] - i):
+                found.setdefault(longest[1], self._labels.get(longest[1]))
+                i = longest[0]
+            else:
+                i += 1
+        if found:
+            self.hits += 1
+        else:
+            self.misses += 1
+        return list(found.items())
+
+    def _accept(self, text, first, length):
+        if length > 1 or not self.case_sensitive_single_tokens:
+            return True
+        return text[first[1]].isupper()
+
+    def __len__(self):
+        return len(self._labels)
+
+    def __contains__(self, name):
+        return name in self._labels
+
+    def stats(self):
+        """Returns the number of names and how often a text had a known entity."""
+        total = self.hits + self.misses
+        return {
+            "names": len(self),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / total if total else 0.0,
+        }
@@ -1,50 +1,254 @@
 from imports import *
 
+# Numbers the workflows of a process, which label their exported stats
+_WORKFLOW_NUMBERS = itertools.count()
+
 
 class GraphRagWorkflow:
-    def __init__(self, embedding_model):
+    def __init__(self, embedding_model, embeddings=None, ner=None, cache_path="embedding_cache.sqlite",
+                 cache_size=1_000_000, embed_batch_size=32, embed_concurrency=4, chunker="semantic",
+                 chunker_options=None, graph_db=None, vector_db=None, query_cache=None, search_workers=8,
+                 graph_retrieval="one_hop", graph_options=None, entity_filter=False):
+        """
+        Initializes the GraphRagWorkflow.
+
+        Args:
+            embedding_model: The Ollama embedding model name.
+            embeddings: The embedding backend; defaults to OllamaEmbeddings for the model.
+                Pass a HashEmbeddings to run offline.
+            ner: The CustomNer to use; the shared one from get_ner() is loaded on first
+                use if None.
+            cache_path: The embedding cache file, or None to disable caching.
+            cache_size: The number of cached embeddings kept before LRU eviction.
+            embed_batch_size: The number of texts per embedding request.
+            embed_concurrency: The number of embedding requests in flight at once.
+            chunker: A chunking strategy from CHUNKING_STRATEGIES ("semantic", "window" or
+                "hybrid"), or a chunker object with chunk(text, sentences=None).
+            chunker_options: Keyword arguments for the chunker built from a strategy name.
+            graph_db: The Neo4jAuraDB related nodes are fetched from. Its writes invalidate
+                the cached neighborhoods and chunks of the entities they touch.
+            vector_db: The VectorDB chunks are retrieved from.
+            query_cache: The QueryCache for query entities, graph neighborhoods and
+                retrieved chunks; a default one is created if None.
+            search_workers: The number of threads graphrag_search runs branches on.
+            graph_retrieval: "one_hop" for Neo4jAuraDB.fetch_related_nodes, or "ranked" for
+                fetch_ranked_neighborhood, which ranks multi-hop neighborhoods by
+                co-mentions and recency.
+            graph_options: Keyword arguments for fetch_ranked_neighborhood, e.g.
+                {"hops": 2, "max_rows": 50}.
+            entity_filter: Whether a query's vector search only ranks the chunks that
+                mention its entities. Queries without entities, or whose entities
+                no chunk mentions, search every chunk.
+        """
         self.EMBEDDING_MODEL = embedding_model
-        self.text_splitter = SemanticChunker(
-            OllamaEmbeddings(model=self.EMBEDDING_MODEL), 
-            breakpoint_threshold_type="percentile",
-        )
-        self.embed = OllamaEmbeddings(model=self.EMBEDDING_MODEL)
-        self.ner = CustomNer()
+        if embeddings is None:
+            from langchain_ollama import OllamaEmbeddings
+
+            embeddings = OllamaEmbeddings(model=self.EMBEDDING_MODEL)
+        self.embed = embeddings
+        cache = EmbeddingCache(cache_path, namespace=self.EMBEDDING_MODEL, max_entries=cache_size) if cache_path else None
+        self.embedder = BatchedEmbedder(self.embed, cache=cache, batch_size=embed_batch_size, max_concurrency=embed_concurrency)
+        # The chunker embeds through the same batching and cache
+        if isinstance(chunker, str):
+            chunker = make_chunker(chunker, self.embedder, **(chunker_options or {}))
+        self.chunker = chunker
+        self._ner = ner
+        self.graph_db = graph_db
+        self.vector_db = vector_db
+        self.query_cache = query_cache if query_cache is not None else QueryCache()
+        if graph_db is not None:
+            graph_db.add_write_listener(self.query_cache.invalidate_graph)
+        if graph_retrieval not in ("one_hop", "ranked"):
+            raise ValueError(f"Unknown graph retrieval {graph_retrieval!r}, expected 'one_hop' or 'ranked'")
+        self.graph_retrieval = graph_retrieval
+        self.graph_options = graph_options or {}
+        self.entity_filter = entity_filter
+        self.search_executor = ThreadPoolExecutor(max_workers=search_workers, thread_name_prefix="graphrag-search")
+        # Exported with the process metrics, read when they are; labelled, as a
+        # process may build several workflows
+        self.workflow_number = next(_WORKFLOW_NUMBERS)
+        metrics.add_collector("embedding", self.embedding_stats, workflow=str(self.workflow_number))
+        metrics.add_collector("query_cache", self.cache_stats, workflow=str(self.workflow_number))
+
+    @property
+    def ner(self):
+        if self._ner is None:
+            self._ner = get_ner()
+        return self._ner
+
+    def embedding_stats(self):
+        """Returns the embedding cache hits, misses, backend calls and hit ratio."""
+        return self.embedder.stats()
+
+    def cache_stats(self):
+        """Returns the hit/miss metrics of every query cache tier."""
+        return self.query_cache.stats()
+
+    def invalidate_cache(self, entity_names=None):
+        """
+        Drops cached neighborhoods and chunks that involve the entities, e.g. after
+        ingesting an article that mentions them, or everything if None.
+        """
+        self.query_cache.invalidate_graph(entity_names)
+        self.query_cache.invalidate_chunks(entity_names)
+
+    def parse_query(self, query):
+        """Returns the key entities of a query, cached by normalized query."""
+        key = normalize_query(query)
+        entities = self.query_cache.entities.get(key)
+        if entities is None:
+            entities = self.ner.parse_query(key) or []
+            self.query_cache.entities.set(key, entities)
+        return list(entities) or None
+
+    def parse_queries(self, queries):
+        """Returns the key entities of many queries, parsing the uncached ones in one NER batch."""
+        keys = [normalize_query(query) for query in queries]
+        found = {key: self.query_cache.entities.get(key) for key in dict.fromkeys(keys)}
+        missing = [key for key, entities in found.items() if entities is None]
+        if missing:
+            for key, entities in zip(missing, self.ner.parse_queries(missing)):
+                found[key] = entities or []
+                self.query_cache.entities.set(key, found[key])
+        return [list(found[key]) or None for key in keys]
+
+    def related_nodes(self, key_entities):
+        """Returns the graph neighborhood of a set of entities, cached by entity set."""
+        if not key_entities:
+            return []
+        key = frozenset(key_entities)
+        rows = self.query_cache.neighborhoods.get(key)
+        if rows is None:
+            tags = set(key)
+            rows = self._fetch_neighborhood(sorted(key))
+            if not rows:
+                # No node has one of the exact names, e.g. a misspelled or partial name
+                # the gazetteer did not know; retry with the closest full-text matches
+                matches = {name for entity in key for name in self.graph_db.search_entities(entity, limit=1)}
+                if matches - key:
+                    rows = self._fetch_neighborhood(sorted(matches))
+                    tags |= matches
+            # Tagged with every node the rows name too, so a write to a farther hop also drops the entry
+            for row in rows:
+                tags.update((row["source"], row["target"]))
+            self.query_cache.neighborhoods.set(key, rows, entities=tags)
+        return list(rows)
+
+    def _fetch_neighborhood(self, entities):
+        if self.graph_retrieval == "ranked":
+            return self.graph_db.fetch_ranked_neighborhood(entities, **self.graph_options)
+        return self.graph_db.fetch_related_nodes(entities)
+
+    def retrieve_chunks(self, query, top_k=5, key_entities=None):
+        """
+        Returns the top_k chunks for a query, cached by normalized query and top_k.
+
+        Args:
+            query: The user query.
+            top_k: The number of chunks to retrieve.
+            key_entities: The query's entities, if already parsed; they tag the cache
+                entry so ingest of those entities invalidates it. Only parsed here if
+                entity_filter is set; an untagged entry is dropped on every ingest.
+        """
+        key = (normalize_query(query), top_k)
+        chunks = self.query_cache.chunks.get(key)
+        if chunks is None:
+            query_embedding = self.generate_embeddings(key[0])
+            if query_embedding is None:
+                return []
+            if key_entities is None and self.entity_filter:
+                key_entities = self.parse_query(key[0])
+            query_embedding = np.asarray(query_embedding, dtype=np.float32)
+            chunks = self._filtered_chunks(query_embedding.reshape(1, -1), top_k, [key_entities])[0]
+            if not chunks:
+                chunks = self.vector_db.retrieve_relevant_chunks(query_embedding, top_k=top_k)
+            self.query_cache.chunks.set(key, chunks, entities=key_entities or ())
+        return list(chunks)
+
+    def retrieve_chunks_batch(self, queries, top_k=5, key_entities=None):
+        """
+        Returns the top_k chunks for many queries, embedding and searching the
+        uncached ones in one batch.
+
+        Args:
+            queries: The user queries.
+            top_k: The number of chunks to retrieve per query.
+            key_entities: The entities of each query, if already parsed; only parsed
+                here if entity_filter is set.
+        """
+        keys = [(normalize_query(query), top_k) for query in queries]
+        found = {key: self.query_cache.chunks.get(key) for key in dict.fromkeys(keys)}
+        missing = [key for key, chunks in found.items() if chunks is None]
+        if missing:
+            try:
+                query_embeddings = self.embedder.embed_queries([query for query, _ in missing])
+            except Exception as e:
+                print(f"Error generating embeddings: {e}")
+                return [list(found[key] or []) for key in keys]
+            if key_entities is None:
+                key_entities = self.parse_queries(queries) if self.entity_filter else [None] * len(queries)
+            entities_by_key = dict(zip(keys, key_entities))
+            query_embeddings = np.asarray(query_embeddings, dtype=np.float32)
+            batch = self._filtered_chunks(query_embeddings, top_k, [entities_by_key[key] for key in missing])
+            unfiltered = [i for i, chunks in enumerate(batch) if not chunks]
+            if unfiltered:
+                rows = self.vector_db.retrieve_relevant_chunks_batch(query_embeddings[unfiltered], top_k=top_k)
+                for i, chunks in zip(unfiltered, rows):
+                    batch[i] = chunks
+            for key, chunks in zip(missing, batch):
+                found[key] = chunks
+                self.query_cache.chunks.set(key, chunks, entities=entities_by_key[key] or ())
+        return [list(found[key]) for key in keys]
+
+    def _filtered_chunks(self, query_embeddings, top_k, key_entities):
+        """
+        Searches the chunks that mention each query's entities if entity_filter is
+        set; one FAISS call per distinct entity set. Returns an empty list for
+        queries that are left to the unfiltered search.
+        """
+        results = [[] for _ in key_entities]
+        if not self.entity_filter:
+            return results
+        groups = {}
+        for i, entities in enumerate(key_entities):
+            if entities:
+                groups.setdefault(frozenset(entities), []).append(i)
+        for entities, indices in groups.items():
+            rows = self.vector_db.retrieve_relevant_chunks_batch(query_embeddings[indices], top_k=top_k, entities=entities)
+            for i, chunks in zip(indices, rows):
+                results[i] = chunks
+        return results
 
     def generate_embeddings(self, text):
         """Generate embeddings for the given text."""
         try:
-            vector_embeddings = self.embed.embed_query(text)
+            vector_embeddings = self.embedder.embed_query(text)
             return vector_embeddings
         except Exception as e:
             print(f"Error generating embeddings: {e}")
             return None
 
-    def chunk_and_embed_news(self, news_article_text):
+    def chunk_and_embed_news(self, news_article_text, sentences=None):
         """
-        Chunks a news article using semantic chunking and generates embeddings.
+        Chunks a news article with the configured chunker and generates embeddings.
 
         Args:
             news_article_text: The text content of the news article.
+            sentences: Optional sentence spans of the article, e.g. from
+                CustomNer.extract_entities_batch, reused by the window and hybrid chunkers.
 
         Returns:
             A list of dictionaries, where each dictionary contains the chunk text and its embedding.
         """
 
         try:
-            # Create a Document object for LangChain
-            document = Document(page_content=news_article_text)
-
-            # Split the document into chunks
-            chunks = self.text_splitter.split_documents([document])
-
-            # Generate embeddings for each chunk
-            chunk_embeddings = []
-            for chunk in chunks:
-                chunk_text = chunk.page_content
-                response = ollama.embeddings(self.EMBEDDING_MODEL, chunk_text)
-                embedding = response['embedding']
-                chunk_embeddings.append({"text": chunk_text, "embedding": embedding})
+            with metrics.timer("chunk_and_embed_news_seconds"):
+                chunk_texts, embeddings = self.chunker.chunk(news_article_text, sentences=sentences)
+            chunk_embeddings = [
+                {"text": chunk_text, "embedding": embedding}
+                for chunk_text, embedding in zip(chunk_texts, embeddings)
+            ]
+            metrics.observe("chunks_per_article", len(chunk_embeddings))
 
             return chunk_embeddings
 
@@ -53,9 +257,115 @@ class GraphRagWorkflow:
             return None
         
     # Combine graph and vector data, generate response
-    def graphrag_search(self, query):
-        # Parse query for entity
-        key_entities = self.ner.parse_query(query)
-        return key_entities
-        # Fetch graph data
-        
\ No newline at end of file
+    def graphrag_search(self, query, top_k=5, graph_timeout=5.0, vector_timeout=5.0, weights=None, rrf_k=60):
+        """
+        Retrieves graph facts and chunks for a query concurrently and fuses them.
+
+        The graph branch parses the query's entities and fetches their neighborhood;
+        the vector branch embeds the query and searches the vector store. Both run
+        at the same time, so latency is the slower branch rather than the sum. A
+        branch that misses its timeout contributes nothing, but keeps running in
+        the background and fills the query cache for the next request.
+
+        Args:
+            query: The user query.
+            top_k: The number of chunks to retrieve.
+            graph_timeout: Seconds to wait for the graph branch.
+            vector_timeout: Seconds to wait for the vector branch.
+            weights: Reciprocal rank fusion weights per branch, e.g. {"graph": 1.0, "vector": 2.0}.
+            rrf_k: The reciprocal rank fusion constant.
+
+        Returns:
+            A SearchContext with the entities, graph rows, chunks, fused results and
+            per-branch timings.
+        """
+        return self.graphrag_search_batch([query], top_k, graph_timeout, vector_timeout, weights, rrf_k)[0]
+
+    def graphrag_search_batch(self, queries, top_k=5, graph_timeout=5.0, vector_timeout=5.0, weights=None, rrf_k=60):
+        """
+        Runs graphrag_search for many queries at once: one NER batch, one embedding
+        batch and one FAISS search for all of them, and one graph lookup per
+        distinct entity set. Arguments are as for graphrag_search.
+
+        Returns:
+            A SearchContext per query, in order. Timings and timeouts are those of
+            the whole batch.
+        """
+        start = time.perf_counter()
+        # The vector branch needs the entities to filter on, so both branches wait on
+        # one parse; it is queued first, so a branch never waits on a parse that
+        # cannot start, and each branch's timeout covers it
+        parsed = None
+        if self.entity_filter and self.vector_db is not None:
+            parsed = self.search_executor.submit(self.parse_queries, queries)
+
+        # Branches return their results instead of writing to the contexts, which a
+        # branch that timed out could otherwise still change after they are returned
+        def graph_branch():
+            branch_start = time.perf_counter()
+            with metrics.timer("graph_branch_seconds"):
+                entities = parsed.result() if parsed is not None else self.parse_queries(queries)
+                rows = {}
+                if self.graph_db is not None:
+                    for key_entities in entities:
+                        if key_entities and frozenset(key_entities) not in rows:
+                            rows[frozenset(key_entities)] = self.related_nodes(key_entities)
+            return {
+                "entities": entities,
+                "rows": [rows.get(frozenset(key_entities or ()), []) for key_entities in entities],
+                "seconds": time.perf_counter() - branch_start,
+            }
+
+        def vector_branch():
+            branch_start = time.perf_counter()
+            with metrics.timer("vector_branch_seconds"):
+                if self.vector_db is not None:
+                    key_entities = parsed.result() if parsed is not None else [()] * len(queries)
+                    chunks = self.retrieve_chunks_batch(queries, top_k=top_k, key_entities=key_entities)
+                else:
+                    chunks = [[] for _ in queries]
+            return {"chunks": chunks, "seconds": time.perf_counter() - branch_start}
+
+        branches = [
+            ("graph", self.search_executor.submit(graph_branch), graph_timeout),
+            ("vector", self.search_executor.submit(vector_branch), vector_timeout),
+        ]
+        results, timings, timed_out, errors = {}, {}, [], {}
+        for name, future, timeout in branches:
+            try:
+                results[name] = future.result(timeout=max(timeout - (time.perf_counter() - start), 0))
+                timings[name] = results[name]["seconds"]
+            except FutureTimeoutError:
+                metrics.inc("search_timeouts_total", branch=name)
+                timed_out.append(name)
+                timings[name] = time.perf_counter() - start
+                results[name] = {}
+            except Exception as e:
+                print(f"Error in {name} retrieval: {e}")
+                metrics.inc("search_errors_total", branch=name)
+                errors[name] = e
+                timings[name] = time.perf_counter() - start
+                results[name] = {}
+
+        contexts = []
+        for i, query in enumerate(queries):
+            context = SearchContext(query)
+            context.entities = results["graph"]["entities"][i] if "entities" in results["graph"] else None
+            context.graph_rows = results["graph"]["rows"][i] if "rows" in results["graph"] else []
+            context.chunks = results["vector"]["chunks"][i] if "chunks" in results["vector"] else []
+            fused = reciprocal_rank_fusion(
+                {
+                    "graph": [(format_graph_row(row), format_graph_row(row)) for row in context.graph_rows],
+                    "vector": [(chunk["text"], chunk["text"]) for chunk in context.chunks],
+                },
+                weights=weights,
+                k=rrf_k,
+            )
+            context.fused = [{"text": entry["item"], "source": entry["sources"][0], "score": entry["score"]} for entry in fused]
+            context.timings = dict(timings, total=time.perf_counter() - start)
+            context.timed_out = list(timed_out)
+            context.errors = dict(errors)
+            contexts.append(context)
+        metrics.observe("search_batch_seconds", time.perf_counter() - start)
+        metrics.observe("search_batch_size", len(queries))
+        return contexts
\ No newline at end of file
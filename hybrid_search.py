@@ -0,0 +1,73 @@
+def format_graph_row(row):
+    """Renders a fetch_related_nodes row as a one-line fact."""
+    return f"{row['source']} {row['relationship']} {row['target']} ({row['target_labels']})"
+
+
+def reciprocal_rank_fusion(ranked_lists, weights=None, k=60):
+    """
+    Fuses ranked result lists with (weighted) reciprocal rank fusion.
+
+    Every item scores sum(weight / (k + rank)) over the lists it appears in, with
+    1-based ranks, so items ranked high by any branch rise and items found by
+    several branches rise further.
+
+    Args:
+        ranked_lists: A dictionary of source name to a list of (key, item) in rank
+            order; items with the same key in several lists are merged.
+        weights: A dictionary of source name to weight; missing sources weigh 1.
+        k: The RRF constant; larger values flatten the rank differences.
+
+    Returns:
+        A list of {"item", "score", "sources"} dictionaries, best first.
+    """
+    weights = weights or {}
+    fused = {}
+    for source, ranked in ranked_lists.items():
+        weight = weights.get(source, 1.0)
+        for rank, (key, item) in enumerate(ranked, 1):
+            entry = fused.setdefault(key, {"item": item, "score": 0.0, "sources": []})
+            entry["score"] += weight / (k + rank)
+            entry["sources"].append(source)
+    return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)
+
+
+class SearchContext:
+    """
+    The result of GraphRagWorkflow.graphrag_search.
+
+    Attributes:
+        query: The user query.
+        entities: The key entities parsed from the query, or None if the graph
+            branch did not get that far.
+        graph_rows: The related-node rows of the graph branch.
+        chunks: The {"match_distance", "text"} chunks of the vector branch.
+        fused: The fused results, best first, as {"text", "source", "score"} dictionaries.
+        timings: Seconds per branch ("graph", "vector") and in total ("total").
+        timed_out: The branches that missed their timeout; their results are empty.
+        errors: A dictionary of branch name to the error it raised.
+    """
+
+    def __init__(self, query):
+        self.query = query
+        self.entities = None
+        self.graph_rows = []
+        self.chunks = []
+        self.fused = []
+        self.timings = {}
+        self.timed_out = []
+        self.errors = {}
+
+    def graph_context(self):
+        """Returns the graph facts, one per line."""
+        return "\n".join(format_graph_row(row) for row in self.graph_rows)
+
+    def as_text(self, max_items=None):
+        """Returns the fused results as prompt context, best first."""
+        return "\n\n".join(result["text"] for result in self.fused[:max_items])
+
+    def __repr__(self):
+        timings = ", ".join(f"{name}={seconds * 1000:.1f}ms" for name, seconds in self.timings.items())
+        return (
+            f"SearchContext(query={self.query!r}, entities={self.entities}, graph_rows={len(self.graph_rows)}, "
+            f"chunks={len(self.chunks)}, timed_out={self.timed_out}, {timings})"
+        )
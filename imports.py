@@ -1,41 +1,87 @@
+import calendar
 import gc
+import glob
 import os
 os.environ["KMP_DUPLICATE_LIB_OK"]="TRUE"
 
+import importlib
+import itertools
+import json
+import math
+import mmap
 import pickle
 import re
+import shutil
+import struct
+import threading
+import time
+import zlib
+from array import array
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
 
 
-import faiss
-import google.generativeai as genai
 import numpy as np
-import spacy
-import spacy_transformers
 from dotenv import load_dotenv
-from langchain.chains import GraphCypherQAChain, RetrievalQA
-from langchain_community.vectorstores import Neo4jVector
-from langchain_core.vectorstores import InMemoryVectorStore
-from langchain.docstore.document import Document
-from langchain_experimental.text_splitter import SemanticChunker
-from langchain.prompts import (
-    HumanMessagePromptTemplate,
-    PromptTemplate,
-    SystemMessagePromptTemplate,
-)
-from langchain_google_genai import (
-    ChatGoogleGenerativeAI,
-    GoogleGenerativeAI,
-    GoogleGenerativeAIEmbeddings,
-)
-from langchain_neo4j import Neo4jGraph
-from langchain_ollama import OllamaEmbeddings
-import ollama
-from neo4j import GraphDatabase
-import newspaper
-from newspaper import Article, Config
 from tqdm import tqdm
 
-from custom_ner import CustomNer
-from faiss_lib import VectorDB
-from graphrag_workflow import GraphRagWorkflow
-from neo4j_auradb import Neo4jAuraDB
\ No newline at end of file
+from lazy_imports import lazy_import
+
+# Heavy libraries are imported on first attribute access, so a process only pays
+# for the ones it uses. Run benchmarks/bench_startup.py to see what is left.
+faiss = lazy_import("faiss")
+genai = lazy_import("google.generativeai")
+neo4j = lazy_import("neo4j")
+newspaper = lazy_import("newspaper")
+ollama = lazy_import("ollama")
+spacy = lazy_import("spacy")
+
+# Imported on first use by __getattr__ below. `from imports import *` does not export
+# these, so import them by name, e.g. `from imports import Neo4jGraph`.
+_LAZY_NAMES = {
+    "GraphCypherQAChain": "langchain.chains",
+    "RetrievalQA": "langchain.chains",
+    "Neo4jVector": "langchain_community.vectorstores",
+    "InMemoryVectorStore": "langchain_core.vectorstores",
+    "Document": "langchain.docstore.document",
+    "SemanticChunker": "langchain_experimental.text_splitter",
+    "HumanMessagePromptTemplate": "langchain.prompts",
+    "PromptTemplate": "langchain.prompts",
+    "SystemMessagePromptTemplate": "langchain.prompts",
+    "ChatGoogleGenerativeAI": "langchain_google_genai",
+    "GoogleGenerativeAI": "langchain_google_genai",
+    "GoogleGenerativeAIEmbeddings": "langchain_google_genai",
+    "Neo4jGraph": "langchain_neo4j",
+    "OllamaEmbeddings": "langchain_ollama",
+    "GraphDatabase": "neo4j",
+    "Article": "newspaper",
+    "Config": "newspaper",
+    # These modules star-import this one, so importing them here would be circular
+    "ShardedVectorDB": "faiss_lib",
+    "VectorDB": "faiss_lib",
+    "GraphRagWorkflow": "graphrag_workflow",
+    "Neo4jAuraDB": "neo4j_auradb",
+}
+
+
+def __getattr__(name):
+    module = _LAZY_NAMES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+from article_fetcher import ArticleFetcher, publish_timestamp
+from chunking import CHUNKING_STRATEGIES, make_chunker
+from crawl_state import CrawlState, canonical_url
+from custom_ner import ENTITY_LABELS, CustomNer
+from embeddings import BatchedEmbedder, EmbeddingCache, HashEmbeddings
+from gazetteer import Gazetteer, entity_key
+from metrics import Metrics, SamplingProfiler, metrics, timed
+from hybrid_search import SearchContext, format_graph_row, reciprocal_rank_fusion
+from model_registry import DEFAULT_SPACY_MODEL, get_ner, get_spacy_model
+from query_cache import QueryCache, TTLCache, normalize_query
+from pipeline import IngestPipeline, PipelineStage, build_ingest_pipeline
\ No newline at end of file
@@ -1,4 +1,5 @@
 from imports import *
+from imports import ChatGoogleGenerativeAI, Config, GraphRagWorkflow, Neo4jAuraDB, Neo4jGraph, OllamaEmbeddings, VectorDB
 
 load_dotenv()
 
@@ -9,8 +10,11 @@ NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 EMBEDDING_MODEL = "nomic-embed-text"
 GEMINI_MODEL = "gemini-2.0-flash"
+CHUNKING_STRATEGY = "semantic"  # or "window" / "hybrid", see chunking.py
 
 NEWS_URL = 'https://www.nytimes.com/'
+# Set to a directory to sample stacks during ingest and write per-stage flame graphs there
+PROFILE_DIR = os.getenv('NEWSNEXUS_PROFILE_DIR')
 
 config = Config()
 config.memoize_articles = False
@@ -20,17 +24,25 @@ config.language = 'en'
 genai.configure(api_key=GEMINI_API_KEY)
 llm = ChatGoogleGenerativeAI(model=GEMINI_MODEL, api_key=GEMINI_API_KEY)
 
-text_splitter = SemanticChunker(
-    OllamaEmbeddings(model=EMBEDDING_MODEL), 
-    breakpoint_threshold_type="percentile",
-)
 embed = OllamaEmbeddings(model=EMBEDDING_MODEL)
-ner = CustomNer()
+ner = get_ner()  # shared with Neo4jAuraDB and GraphRagWorkflow
 vector_db = VectorDB()
+# Remembers what earlier crawls ingested, so only new and changed articles are processed
+crawl_state = CrawlState("crawl_state.sqlite")
 
-neo4jConnect = Neo4jAuraDB(NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD)
+neo4jConnect = Neo4jAuraDB(NEO4J_URI, NEO4J_USERNAME, NEO4J_PASSWORD, crawl_state=crawl_state)
 graph = Neo4jGraph(url=NEO4J_URI, username=NEO4J_USERNAME, password=NEO4J_PASSWORD)
-graphRAG = GraphRagWorkflow(embedding_model=EMBEDDING_MODEL)
+# Ranked two-hop neighborhoods keep hub entities' context to their most co-mentioned, recent relationships,
+# and queries that name entities only search the chunks that mention them
+graphRAG = GraphRagWorkflow(
+    embedding_model=EMBEDDING_MODEL, chunker=CHUNKING_STRATEGY, graph_db=neo4jConnect,
+    graph_retrieval="ranked", graph_options={"hops": 2, "max_rows": 50}, entity_filter=True,
+)
+# Query NER matches names already in the graph, and ingest adds new ones as it writes them
+gazetteer = Gazetteer()
+gazetteer.refresh(neo4jConnect)
+neo4jConnect.add_write_listener(gazetteer.add_entities)
+ner.gazetteer = gazetteer
 
 news_paper = newspaper.build(NEWS_URL, config=config)
 articles = news_paper.articles
@@ -40,32 +52,33 @@ len(articles)
 category = news_paper.category_urls()
 category
 
-neo4jConnect.store_articles_to_neo4j(articles[:5])
-
-query = 'Fetch news related to Trump'
-key_entities = graphRAG.graphrag_search(query)
-related_nodes = neo4jConnect.fetch_related_nodes(key_entities)
-graph_context = "\n".join(
-    [
-        f"{r['source']} {r['relationship']} {r['target']} ({r['target_labels']})" 
-        for r in related_nodes
-    ]
+# Fetch, extract, write the graph and embed in one streaming pass. The crawl state
+# skips what earlier runs ingested, so continue from the saved index rather than replacing it.
+if os.path.isdir("faiss_index"):
+    vector_db.load_index("faiss_index")
+vector_db.save_index()
+pipeline = build_ingest_pipeline(
+    neo4jConnect, graphRAG, vector_db, neo4jConnect.fetcher, index_path="faiss_index", crawl_state=crawl_state
 )
+# The pipeline starts the profiler once its worker processes are forked
+pipeline.run(articles[:5], profile_interval=0.01 if PROFILE_DIR else None)
+vector_db.save_index()
+if pipeline.profiler is not None:
+    pipeline.profiler.write(PROFILE_DIR)
+# Per-stage timings, entity and pair counts, Neo4j round trips and cache hits of the crawl
+with open("ingest_metrics.json", "w") as f:
+    f.write(metrics.to_json(indent=2))
 
-parsed_articles = neo4jConnect.get_parsed_articles()
-for parsed_article in parsed_articles:
-    chunk_embeddings = graphRAG.chunk_and_embed_news(parsed_article)
-    vector_db.add_embeddings(chunk_embeddings=chunk_embeddings)
-    vector_db.save_index()
 del vector_db
 gc.collect()
 
 vector_db = VectorDB()
-vector_db.load_index("faiss_index.pkl")
+vector_db.load_index("faiss_index")
+graphRAG.vector_db = vector_db
 
+# Graph facts and chunks are retrieved concurrently and fused
 query_text = "What is the news about Trump?"
-query_embedding = graphRAG.generate_embeddings(query_text)
-query_embedding = np.array(query_embedding).astype(np.float32)
-
-relevant_chunks = vector_db.retrieve_relevant_chunks(query_embedding=query_embedding, top_k=5)
-print(relevant_chunks)
+search_context = graphRAG.graphrag_search(query_text, top_k=5)
+graph_context = search_context.graph_context()
+print(search_context)
+print(search_context.chunks)
@@ -0,0 +1,51 @@
+import importlib
+import sys
+import threading
+import types
+
+_lock = threading.RLock()
+
+
+class LazyModule(types.ModuleType):
+    """
+    A stand-in for a module that imports it on first attribute access.
+
+    Unlike importlib.util.LazyLoader, the first access is guarded by a lock, so
+    threads of the ingest pipeline can race to it safely. Once loaded, the real
+    module's attributes are copied in, so later lookups cost nothing extra.
+    """
+
+    def __init__(self, name):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+
+    def _load(self):
+        module = self.__dict__["_lazy_module"]
+        if module is None:
+            with _lock:
+                module = self.__dict__["_lazy_module"]
+                if module is None:
+                    module = importlib.import_module(self.__name__)
+                    self.__dict__.update(module.__dict__)
+                    self.__dict__["_lazy_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        # Only called for attributes not copied in yet, e.g. submodules imported later
+        if attr.startswith("__") and attr.endswith("__"):
+            raise AttributeError(attr)
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_lazy_module"] is not None else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name):
+    """Returns the module name if it is already imported, otherwise a LazyModule for it."""
+    with _lock:
+        module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
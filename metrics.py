@@ -0,0 +1,415 @@
+import functools
+import inspect
+import json
+import math
+import os
+import sys
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import Counter
+
+# Upper bounds of the histogram buckets, in seconds for timers and in items for counts
+TIME_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+
+class Histogram:
+    """Counts observations into cumulative-style buckets, as Prometheus histograms do, with their sum."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # the last bucket is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, counts, total, count):
+        for i, n in enumerate(counts):
+            self.counts[i] += n
+        self.sum += total
+        self.count += count
+
+    def quantile(self, q):
+        """Estimates a quantile by linear interpolation inside its bucket; None without observations."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                return lower + (self.buckets[i] - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class _Timer:
+    __slots__ = ("registry", "name", "labels", "stage", "start")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.stage = None
+
+    def __enter__(self):
+        profiler = self.registry.profiler
+        if profiler is not None:
+            self.stage = profiler.enter(self.labels.get("stage") or self.name.removesuffix("_seconds"))
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        if self.stage is not None:
+            self.stage.pop()
+        if self.registry.enabled:
+            self.registry.observe(self.name, elapsed, **self.labels)
+        return False
+
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """
+    A thread-safe registry of counters, histograms and timers, keyed by name and labels.
+
+    Timers are histograms of seconds. Collectors are functions returning a
+    (possibly nested) dictionary of numbers, such as the stats() of a cache,
+    and are read at export time as gauges, so hot paths that already count
+    do not count twice. With enabled False, and no profiler running, every
+    call returns at once.
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.profiler = None
+        self._counters = {}
+        self._histograms = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        """Adds value to a counter."""
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, buckets=None, **labels):
+        """
+        Records a value in a histogram. Names ending in _seconds default to
+        TIME_BUCKETS, others to COUNT_BUCKETS; the buckets of a histogram are
+        fixed by its first observation.
+        """
+        if not self.enabled:
+            return
+        key = self._key(name, labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                if buckets is None:
+                    buckets = TIME_BUCKETS if name.endswith("_seconds") else COUNT_BUCKETS
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def timer(self, name, **labels):
+        """
+        Returns a context manager that records its duration in the histogram name.
+        While the profiler runs, samples taken inside it count towards its stage:
+        the "stage" label, or the name without _seconds.
+        """
+        if not self.enabled and self.profiler is None:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def add_collector(self, name, collect, **labels):
+        """
+        Registers a function whose numbers are exported as gauges prefixed with
+        name and carrying labels; replaces one of the same name and labels. A
+        bound method is held weakly, so its object is not kept alive for the
+        metrics, and is dropped with it.
+        """
+        if inspect.ismethod(collect):
+            collect = weakref.WeakMethod(collect)
+        with self._lock:
+            self._collectors[self._key(name, labels)] = collect
+
+    def remove_collector(self, name, **labels):
+        with self._lock:
+            self._collectors.pop(self._key(name, labels), None)
+
+    def reset(self):
+        """Clears the counters and histograms; collectors stay registered."""
+        with self._lock:
+            self._counters = {}
+            self._histograms = {}
+
+    def _gauges(self):
+        with self._lock:
+            collectors = list(self._collectors.items())
+        gauges = []
+
+        def flatten(prefix, labels, value):
+            if isinstance(value, dict):
+                for key, item in value.items():
+                    flatten(f"{prefix}_{key}", labels, item)
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                gauges.append({"name": prefix, "labels": dict(labels), "value": value})
+
+        for key, collect in collectors:
+            name, labels = key
+            if isinstance(collect, weakref.WeakMethod):
+                collect = collect()
+                if collect is None:
+                    self._drop_collector(key)
+                    continue
+            try:
+                flatten(name, labels, collect())
+            except Exception as e:
+                print(f"Error collecting {name} metrics: {e}")
+        return gauges
+
+    def _drop_collector(self, key):
+        with self._lock:
+            collect = self._collectors.get(key)
+            if isinstance(collect, weakref.WeakMethod) and collect() is None:
+                del self._collectors[key]
+
+    def snapshot(self):
+        """
+        Returns every metric as a JSON-serializable dictionary: "counters",
+        "histograms" and, from the collectors, "gauges", as lists of series with
+        their labels. Histograms include estimated p50, p95 and p99.
+        """
+        with self._lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value} for (name, labels), value in self._counters.items()]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": histogram.sum,
+                    "buckets": list(histogram.buckets),
+                    "counts": list(histogram.counts),
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                    "p99": histogram.quantile(0.99),
+                }
+                for (name, labels), histogram in self._histograms.items()
+            ]
+        return {"counters": counters, "histograms": histograms, "gauges": self._gauges()}
+
+    def drain(self):
+        """Returns the counters and histograms recorded since the last drain, and clears them; None if there are none."""
+        with self._lock:
+            if not self._counters and not self._histograms:
+                return None
+            counters, histograms = self._counters, self._histograms
+            self._counters, self._histograms = {}, {}
+        return {
+            "counters": [(name, labels, value) for (name, labels), value in counters.items()],
+            "histograms": [
+                (name, labels, h.buckets, h.counts, h.sum, h.count) for (name, labels), h in histograms.items()
+            ],
+        }
+
+    def merge(self, drained):
+        """Adds what drain() returned in another process, e.g. a pipeline worker, to this registry."""
+        if not drained or not self.enabled:
+            return
+        with self._lock:
+            for name, labels, value in drained["counters"]:
+                key = (name, labels)
+                self._counters[key] = self._counters.get(key, 0) + value
+            for name, labels, buckets, counts, total, count in drained["histograms"]:
+                key = (name, labels)
+                histogram = self._histograms.get(key)
+                if histogram is None:
+                    histogram = self._histograms[key] = Histogram(buckets)
+                histogram.merge(counts, total, count)
+
+    def to_json(self, indent=None):
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix="newsnexus_"):
+        """Returns every metric in the Prometheus text exposition format."""
+        snapshot = self.snapshot()
+        lines = []
+
+        def label_text(labels, extra=None):
+            pairs = {**labels, **(extra or {})}
+            if not pairs:
+                return ""
+            escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in pairs.values())
+            return "{" + ",".join(f'{key}="{value}"' for key, value in zip(pairs, escaped)) + "}"
+
+        def by_name(series):
+            grouped = {}
+            for entry in series:
+                grouped.setdefault(entry["name"], []).append(entry)
+            return sorted(grouped.items())
+
+        for name, series in by_name(snapshot["counters"]):
+            lines.append(f"# TYPE {prefix}{name} counter")
+            for entry in series:
+                lines.append(f"{prefix}{name}{label_text(entry['labels'])} {entry['value']}")
+        for name, series in by_name(snapshot["histograms"]):
+            lines.append(f"# TYPE {prefix}{name} histogram")
+            for entry in series:
+                cumulative = 0
+                for bound, count in zip([*entry["buckets"], math.inf], entry["counts"]):
+                    cumulative += count
+                    le = "+Inf" if bound == math.inf else repr(float(bound))
+                    lines.append(f"{prefix}{name}_bucket{label_text(entry['labels'], {'le': le})} {cumulative}")
+                lines.append(f"{prefix}{name}_sum{label_text(entry['labels'])} {entry['sum']}")
+                lines.append(f"{prefix}{name}_count{label_text(entry['labels'])} {entry['count']}")
+        for name, series in by_name(snapshot["gauges"]):
+            metric = "".join(char if char.isalnum() or char == "_" else "_" for char in name)
+            lines.append(f"# TYPE {prefix}{metric} gauge")
+            for entry in series:
+                lines.append(f"{prefix}{metric}{label_text(entry['labels'])} {entry['value']}")
+        return "\n".join(lines) + "\n"
+
+    def start_profiler(self, interval=0.01):
+        """Starts a SamplingProfiler that attributes samples to the open timers; returns it."""
+        self.stop_profiler()
+        self.profiler = SamplingProfiler(interval)
+        self.profiler.start()
+        return self.profiler
+
+    def stop_profiler(self):
+        """Stops the running profiler and returns it, so its samples can still be written; None if none ran."""
+        profiler, self.profiler = self.profiler, None
+        if profiler is not None:
+            profiler.stop()
+        return profiler
+
+
+class SamplingProfiler:
+    """
+    Samples the Python stack of every thread at an interval and counts each stack
+    under the stage of the innermost Metrics timer open on that thread.
+
+    Threads outside any timer are not sampled unless all_threads is set, so idle
+    workers waiting on queues do not drown the stages out. Only the threads of
+    this process are seen: pipeline stages that run in worker processes show up
+    as their parent thread waiting on the pool.
+    """
+
+    def __init__(self, interval=0.01, all_threads=False):
+        self.interval = interval
+        self.all_threads = all_threads
+        self.samples = {}  # stage -> Counter of folded stacks
+        self._stages = {}  # thread ident -> stack of open stage names
+        self._stop = threading.Event()
+        self._thread = None
+        self.started = None
+        self.duration = 0.0
+
+    def enter(self, stage):
+        """Marks the calling thread as inside stage; returns the list to pop() when it leaves."""
+        stack = self._stages.get(threading.get_ident())
+        if stack is None:
+            stack = self._stages[threading.get_ident()] = []
+        stack.append(stage)
+        return stack
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.duration = time.perf_counter() - self.started
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stages = self._stages.get(ident)
+                stage = stages[-1] if stages else None
+                if stage is None and not self.all_threads:
+                    continue
+                self.samples.setdefault(stage or "other", Counter())[self._fold(frame)] += 1
+
+    @staticmethod
+    def _fold(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def stats(self):
+        """Returns the number of samples per stage."""
+        return {stage: sum(stacks.values()) for stage, stacks in self.samples.items()}
+
+    def write(self, directory):
+        """
+        Writes one <stage>.folded file per stage, in the collapsed-stack format that
+        flamegraph.pl and speedscope read, and a summary.json of samples per stage.
+
+        Returns:
+            The paths written.
+        """
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for stage, stacks in self.samples.items():
+            safe = "".join(char if char.isalnum() or char in "-_." else "_" for char in stage)
+            path = os.path.join(directory, f"{safe}.folded")
+            with open(path, "w") as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            paths.append(path)
+        path = os.path.join(directory, "summary.json")
+        with open(path, "w") as f:
+            json.dump({"interval": self.interval, "duration": self.duration, "samples": self.stats()}, f, indent=2)
+        paths.append(path)
+        return paths
+
+
+def timed(name, **labels):
+    """Decorates a function to record its duration in the timer name of the process-wide metrics."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with metrics.timer(name, **labels):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+# The process-wide registry every module records into
+metrics = Metrics()
@@ -0,0 +1,50 @@
+import threading
+
+# The spaCy pipeline CustomNer uses unless given another one.
+DEFAULT_SPACY_MODEL = "en_core_web_trf"
+
+_lock = threading.RLock()
+_models = {}
+_ners = {}
+
+
+def get_spacy_model(name=DEFAULT_SPACY_MODEL):
+    """
+    Returns the spaCy pipeline name, loading it on first use and sharing it
+    afterwards, so a process loads each pipeline at most once.
+
+    Args:
+        name: A spaCy model name, or "blank:<lang>" for a blank pipeline with the
+            rule-based sentencizer.
+    """
+    with _lock:
+        nlp = _models.get(name)
+        if nlp is None:
+            import spacy
+
+            if name.startswith("blank:"):
+                nlp = spacy.blank(name.split(":", 1)[1])
+                nlp.add_pipe("sentencizer")
+            else:
+                if "_trf" in name:
+                    import spacy_transformers  # registers the transformer architectures
+                nlp = spacy.load(name)
+            _models[name] = nlp
+        return nlp
+
+
+def get_ner(name=DEFAULT_SPACY_MODEL):
+    """Returns the CustomNer shared by everything in the process that uses the spaCy pipeline name."""
+    with _lock:
+        ner = _ners.get(name)
+        if ner is None:
+            from custom_ner import CustomNer
+
+            ner = _ners[name] = CustomNer(get_spacy_model(name))
+        return ner
+
+
+def loaded_models():
+    """Returns the names of the spaCy pipelines loaded so far."""
+    with _lock:
+        return list(_models)
@@ -6,12 +6,57 @@ NEO4J_URI = os.getenv('NEO4J_URI')
 NEO4J_USERNAME = os.getenv('NEO4J_USERNAME')
 NEO4J_PASSWORD = os.getenv('NEO4J_PASSWORD')
 
+# The characters Lucene's query syntax reserves, escaped in full-text entity queries
+_LUCENE_SPECIAL = re.compile(r'[+\-&|!(){}\[\]^"~*?:\\/]')
+
 class Neo4jAuraDB:
     """
     A class to manage connections and queries to a Neo4j AuraDB instance.
     """
 
-    def __init__(self, uri, user, password):
+    # One branch per entity label, so each can seek the label's name index
+    RELATED_NODES_QUERY = (
+        "CALL { "
+        + " UNION ".join(
+            f"MATCH (n:`{label}`) WHERE n.name IN $key_entities RETURN n"
+            for label in ENTITY_LABELS
+        )
+        + " } "
+        "MATCH (n)-[r]->(m) "
+        "RETURN DISTINCT n.name AS source, type(r) AS relationship, m.name AS target, labels(m) AS target_labels "
+        "LIMIT 50"
+    )
+
+    # The nodes of the key entities, the seeds of the ranked neighborhood
+    SEED_NODES_QUERY = (
+        "CALL { "
+        + " UNION ".join(
+            f"MATCH (n:`{label}`) WHERE n.name IN $key_entities RETURN n"
+            for label in ENTITY_LABELS
+        )
+        + " } "
+        "RETURN elementId(n) AS id"
+    )
+
+    # Entity names and labels for the query gazetteer, optionally only those created since $since
+    ENTITY_NAMES_QUERY = " UNION ALL ".join(
+        f"MATCH (n:`{label}`) RETURN n.name AS name, '{label}' AS label" for label in ENTITY_LABELS
+    )
+    NEW_ENTITY_NAMES_QUERY = " UNION ALL ".join(
+        f"MATCH (n:`{label}`) WHERE n.created_at >= $since RETURN n.name AS name, '{label}' AS label"
+        for label in ENTITY_LABELS
+    )
+
+    # Entity names matching a Lucene query on the full-text name index, best first
+    ENTITY_SEARCH_QUERY = (
+        "CALL db.index.fulltext.queryNodes('entity_name_fulltext', $q) YIELD node, score "
+        "RETURN node.name AS name, score LIMIT $limit"
+    )
+
+    # Relationship patterns of the ranked neighborhood, from the frontier node n
+    HOP_PATTERNS = {"both": "(n)-[r]-(m)", "out": "(n)-[r]->(m)", "in": "(n)<-[r]-(m)"}
+
+    def __init__(self, uri, user, password, ner=None, fetcher=None, batch_size=1000, crawl_state=None):
         """
         Initializes the Neo4jAuraDB instance.
 
@@ -19,13 +64,31 @@ class Neo4jAuraDB:
             uri: The URI of the AuraDB instance.
             user: The username for authentication.
             password: The password for authentication.
+            ner: The CustomNer used to extract entities and relationships; the shared
+                one from get_ner() is loaded on first use if None.
+            fetcher: The ArticleFetcher used to download articles.
+            batch_size: The default number of relationships per UNWIND write.
+            crawl_state: An optional CrawlState; known, unchanged and duplicate articles
+                are then skipped, and changed ones are reduced to their new paragraphs.
         """
         self.uri = uri
         self.user = user
         self.password = password
         self.parsed_articles = []
         self.driver = self._connect()
-        self.ner = CustomNer()
+        self._ner = ner
+        self.fetcher = fetcher or ArticleFetcher()
+        self.batch_size = batch_size
+        self.crawl_state = crawl_state
+        self.write_listeners = []
+        if self.driver is not None:
+            self.ensure_schema()
+
+    @property
+    def ner(self):
+        if self._ner is None:
+            self._ner = get_ner()
+        return self._ner
 
     def _connect(self):
         """
@@ -35,7 +98,7 @@ class Neo4jAuraDB:
             A GraphDatabase driver object, or None if connection fails.
         """
         try:
-            driver = GraphDatabase.driver(self.uri, auth=(self.user, self.password))
+            driver = neo4j.GraphDatabase.driver(self.uri, auth=(self.user, self.password))
             driver.verify_connectivity()
             print("Connection successful!")
             return driver
@@ -43,6 +106,88 @@ class Neo4jAuraDB:
             print(f"Error connecting to AuraDB: {e}")
             return None
     
+    def ensure_schema(self):
+        """
+        Creates the constraints and indexes the ingest and query paths rely on.
+
+        Every entity label gets a uniqueness constraint on name, which is backed by
+        an index that MERGE and name lookups seek into, and an index on created_at
+        for incremental gazetteer refreshes. A full-text index over the
+        names of all entity labels serves the fuzzy lookup of search_entities. All statements use
+        IF NOT EXISTS, so this is safe to run on every connect.
+        """
+        statements = [
+            f"CREATE CONSTRAINT {label.lower()}_name_unique IF NOT EXISTS "
+            f"FOR (n:`{label}`) REQUIRE n.name IS UNIQUE"
+            for label in ENTITY_LABELS
+        ]
+        statements.extend(
+            f"CREATE INDEX {label.lower()}_created_at IF NOT EXISTS FOR (n:`{label}`) ON (n.created_at)"
+            for label in ENTITY_LABELS
+        )
+        statements.append(
+            "CREATE FULLTEXT INDEX entity_name_fulltext IF NOT EXISTS "
+            f"FOR (n:{'|'.join(ENTITY_LABELS)}) ON EACH [n.name]"
+        )
+        for statement in statements:
+            try:
+                self.driver.execute_query(statement)
+            except Exception as e:
+                print(f"Error creating schema: {e}")
+
+    def explain_query(self, query, parameters=None):
+        """
+        Returns the operators of the plan Neo4j picks for a query, without running it.
+
+        Args:
+            query: The Cypher query to explain.
+            parameters: Optional parameters for the query.
+
+        Returns:
+            A list of operator names, e.g. "NodeUniqueIndexSeek" or "NodeByLabelScan".
+        """
+        with self.driver.session() as session:
+            summary = session.run("EXPLAIN " + query, parameters or {}).consume()
+
+        operators = []
+        stack = [summary.plan] if summary.plan else []
+        while stack:
+            plan = stack.pop()
+            operators.append(plan["operatorType"].split("@")[0])
+            stack.extend(plan.get("children", []))
+        return operators
+
+    def report_query_plans(self):
+        """
+        Reports whether the ingest MERGE and the related-node lookup use index seeks.
+
+        Returns:
+            A dictionary of query name to {"operators": [...], "uses_index": bool}.
+        """
+        queries = {
+            f"merge_{label.lower()}": (f"MERGE (s:`{label}` {{name: $name}})", {"name": ""})
+            for label in ENTITY_LABELS
+        }
+        queries["fetch_related_nodes"] = (self.RELATED_NODES_QUERY, {"key_entities": []})
+        queries["ranked_neighborhood_seeds"] = (self.SEED_NODES_QUERY, {"key_entities": []})
+
+        report = {}
+        for name, (query, parameters) in queries.items():
+            operators = self.explain_query(query, parameters)
+            report[name] = {
+                "operators": operators,
+                "uses_index": any("IndexSeek" in operator for operator in operators),
+            }
+        return report
+
+    def add_write_listener(self, callback):
+        """
+        Registers a callback that is called with a dictionary of entity name to
+        label for every successful relationship write, e.g. to invalidate query
+        caches. Iterating it gives the names the write touched.
+        """
+        self.write_listeners.append(callback)
+
     def get_driver_info(self):
         return self.driver
 
@@ -63,6 +208,7 @@ class Neo4jAuraDB:
 
         try:
             with self.driver.session() as session:
+                metrics.inc("neo4j_round_trips_total", operation="execute_query")
                 if parameters:
                     results = session.run(query, parameters)
                 else:
@@ -73,40 +219,106 @@ class Neo4jAuraDB:
             print(f"Error executing query: {e}")
             return None
 
-    def store_relationships_auradb(self, relationships):
-        """Stores extracted relationships in Neo4j AuraDB, ensuring uniqueness."""
+    def store_relationships_auradb(self, relationships, batch_size=None, published=None):
+        """
+        Stores extracted relationships in Neo4j AuraDB, ensuring uniqueness.
+
+        Relationships are grouped by (subject label, object label, relationship type)
+        and every group is written with one parameterized UNWIND query per batch of
+        rows, all in a single write transaction. Each relationship counts its
+        co-mentions in r.mentions and keeps the newest article time in r.last_seen,
+        which the ranked neighborhood retrieval scores by.
+
+        Args:
+            relationships: The relationship dictionaries from CustomNer.extract_relationships.
+            batch_size: The maximum number of rows per UNWIND transaction.
+            published: The article's publish time in epoch seconds; defaults to now.
+
+        Returns:
+            True if the relationships were written, False if the write failed.
+        """
+        if self.driver is None:
+            print("Driver is not initialized.")
+            return False
+
+        batch_size = batch_size or self.batch_size
+        groups = {}
         for relationship in relationships:
-            subject_text = relationship["entity1"]["text"]
-            subject_label = relationship["entity1"]["label"]
-            relationship_type = relationship["relation"]
-            object_text = relationship["entity2"]["text"]
-            object_label = relationship["entity2"]["label"]
-
-            # Use the execute_query method to run Cypher queries with parameters
-            self.driver.execute_query(
-                f"MERGE (s:{subject_label} {{name: $subject_text}})",
-                {"subject_text": subject_text}
+            key = (
+                relationship["entity1"]["label"],
+                relationship["entity2"]["label"],
+                relationship["relation"],
             )
-            self.driver.execute_query(
-                f"MERGE (o:{object_label} {{name: $object_text}})",
-                {"object_text": object_text}
-            )
-            self.driver.execute_query(
-                f"MATCH (s:{subject_label} {{name: $subject_text}}) "
-                f"MATCH (o:{object_label} {{name: $object_text}}) "
-                f"MERGE (s)-[:{relationship_type}]->(o)",
-                {"subject_text": subject_text, "object_text": object_text}
+            pairs = groups.setdefault(key, {})
+            pair = (relationship["entity1"]["text"], relationship["entity2"]["text"])
+            pairs[pair] = pairs.get(pair, 0) + 1
+
+        statements = []
+        for (subject_label, object_label, relationship_type), pairs in groups.items():
+            query = (
+                "UNWIND $rows AS row "
+                f"MERGE (s:`{subject_label}` {{name: row.subject}}) ON CREATE SET s.created_at = $ingested_at "
+                f"MERGE (o:`{object_label}` {{name: row.object}}) ON CREATE SET o.created_at = $ingested_at "
+                f"MERGE (s)-[r:`{relationship_type}`]->(o) "
+                # Ranking weights: how often the pair was mentioned, and how recently
+                "SET r.mentions = coalesce(r.mentions, 0) + row.mentions, "
+                "r.last_seen = CASE WHEN r.last_seen IS NULL OR r.last_seen < $published "
+                "THEN $published ELSE r.last_seen END"
             )
+            rows = [{"subject": subject, "object": obj, "mentions": mentions} for (subject, obj), mentions in pairs.items()]
+            for i in range(0, len(rows), batch_size):
+                statements.append((query, rows[i:i + batch_size]))
+
+        if statements:
+            try:
+                with metrics.timer("store_relationships_auradb_seconds"), self.driver.session() as session:
+                    now = time.time()
+                    session.execute_write(self._run_writes, statements, published if published is not None else now, now)
+            except Exception as e:
+                print(f"Error storing relationships: {e}")
+                metrics.inc("neo4j_write_errors_total", operation="store_relationships")
+                return False
+            # One per statement and one for the commit
+            metrics.inc("neo4j_round_trips_total", len(statements) + 1, operation="store_relationships")
+            metrics.observe("relationships_per_write", len(relationships))
+
+            entity_names = {}
+            for (subject_label, object_label, _), pairs in groups.items():
+                for subject, obj in pairs:
+                    entity_names[subject] = subject_label
+                    entity_names[obj] = object_label
+            for callback in self.write_listeners:
+                callback(entity_names)
+        return True
+
+    @staticmethod
+    def _run_writes(tx, statements, published, ingested_at):
+        for query, rows in statements:
+            tx.run(query, rows=rows, published=published, ingested_at=ingested_at).consume()
         
     def store_articles_to_neo4j(self, articles):
-        for article in articles:
-            parsed_article = self.ner.parse_article(article)
-            entities = self.ner.extract_entities(parsed_article)
-            relationships = self.ner.extract_relationships(parsed_article, entities)
-            # self.store_relationships_auradb(relationships)
-            print(relationships)
-            self.close()
-            self.parsed_articles.append(parsed_article)
+        if self.crawl_state is not None:
+            articles = (article for article in articles if self.crawl_state.should_fetch(article.url, sinks=("graph",)))
+        for article, parsed_article in self.fetcher.fetch(articles):
+            if not parsed_article:
+                continue
+            text = parsed_article
+            if self.crawl_state is not None:
+                decision = self.crawl_state.check(article.url, parsed_article, "graph")
+                text = decision.text
+            stored = True
+            if text:
+                entities = self.ner.extract_entities(text)
+                relationships = self.ner.extract_relationships(text, entities)
+                stored = self.store_relationships_auradb(relationships, published=publish_timestamp(article))
+                self.parsed_articles.append(text)
+            if self.crawl_state is None:
+                continue
+            if stored:
+                self.crawl_state.record(article.url, parsed_article, "graph", duplicate_of=decision.duplicate_of)
+            else:
+                # Not marked processed, so the next crawl fetches it again
+                self.crawl_state.record_failure(article.url, "graph", "relationship write failed")
             
     def get_parsed_articles(self):
         return self.parsed_articles
@@ -122,16 +334,10 @@ class Neo4jAuraDB:
         Returns:
             A list of dictionaries, where each dictionary represents a relationship.
         """
-        query = """
-        MATCH (n)-[r]->(m)
-        WHERE n.name IN $key_entities
-        AND (n:GPE OR n:PERSON OR n:ORG)
-        RETURN DISTINCT n.name AS source, type(r) AS relationship, m.name AS target, labels(m) AS target_labels 
-        LIMIT 50;
-        """
         try:
-            with self.driver.session() as session:
-                results = session.run(query, key_entities=key_entities)
+            with metrics.timer("fetch_related_nodes_seconds"), self.driver.session() as session:
+                metrics.inc("neo4j_round_trips_total", operation="fetch_related_nodes")
+                results = session.run(self.RELATED_NODES_QUERY, key_entities=key_entities)
                 return [
                     {
                         "source": r["source"],
@@ -145,6 +351,178 @@ class Neo4jAuraDB:
             print(f"Error fetching related nodes: {e}")
             return [] # Return an empty list in case of error.
     
+    def search_entities(self, text, limit=5):
+        """
+        Finds entity names that match text approximately, e.g. a misspelled or partial
+        name, through the entity_name_fulltext index. Every word of the text must match
+        a word of the name within a small edit distance.
+
+        Args:
+            text: The entity name as written in the query.
+            limit: The maximum number of names returned.
+
+        Returns:
+            A list of entity names, best match first.
+        """
+        # Lowercased, as Lucene reads AND, OR and NOT as operators
+        words = [_LUCENE_SPECIAL.sub(r"\\\g<0>", word) for word in text.lower().split()]
+        if self.driver is None or not words:
+            return []
+        query = " AND ".join(word + "~" for word in words)
+        try:
+            with metrics.timer("search_entities_seconds"), self.driver.session() as session:
+                metrics.inc("neo4j_round_trips_total", operation="search_entities")
+                return [record["name"] for record in session.run(self.ENTITY_SEARCH_QUERY, q=query, limit=limit)]
+        except Exception as e:
+            print(f"Error searching entities: {e}")
+            return []
+
+    def fetch_entity_names(self, since=None):
+        """
+        Streams the (name, label) of every entity node, or only of those created
+        since the given epoch time.
+        """
+        if self.driver is None:
+            return
+        try:
+            with self.driver.session() as session:
+                metrics.inc("neo4j_round_trips_total", operation="fetch_entity_names")
+                if since is None:
+                    results = session.run(self.ENTITY_NAMES_QUERY)
+                else:
+                    results = session.run(self.NEW_ENTITY_NAMES_QUERY, since=since)
+                for record in results:
+                    yield record["name"], record["label"]
+        except Exception as e:
+            print(f"Error fetching entity names: {e}")
+
+    def _hop_query(self, direction):
+        """One hop of the ranked neighborhood: every frontier node keeps its fanout best relationships."""
+        return (
+            "UNWIND $frontier AS f "
+            "MATCH (n) WHERE elementId(n) = f.id "
+            "CALL { "
+            "WITH n, f "
+            f"MATCH {self.HOP_PATTERNS[direction]} "
+            "WHERE NOT elementId(r) IN $seen_edges "
+            "WITH r, m, f.score * ($mention_weight * log(1 + coalesce(r.mentions, 1)) "
+            "+ $recency_weight * exp(-$decay * ($now - coalesce(r.last_seen, 0)))) AS score "
+            "RETURN r, m, score ORDER BY score DESC LIMIT $fanout "
+            "} "
+            "RETURN elementId(r) AS edge_id, elementId(m) AS node_id, startNode(r).name AS source, "
+            "type(r) AS relationship, endNode(r).name AS target, labels(endNode(r)) AS target_labels, "
+            "score, coalesce(r.mentions, 1) AS mentions, r.last_seen AS last_seen "
+            "ORDER BY score DESC"
+        )
+
+    def iter_ranked_neighborhood(self, key_entities, hops=2, fanout=25, frontier_size=25, direction="both",
+                                 mention_weight=1.0, recency_weight=1.0, half_life_days=30.0, hop_decay=0.5,
+                                 page_size=25):
+        """
+        Streams the multi-hop neighborhood of the key entities, ranked on the server.
+
+        Each hop expands the frontier nodes in one query, keeping only each node's
+        fanout best relationships, so a hub entity such as a head of state costs
+        fanout rows instead of its whole neighborhood. A relationship scores
+        mention_weight * log(1 + co-mentions) + recency_weight * 2^(-age / half_life),
+        times the score of the frontier node it was reached from. The frontier_size
+        best new nodes of a hop are expanded next, scored relative to the hop's best
+        node and times hop_decay per hop, so farther rows rank lower.
+
+        Args:
+            key_entities: A list of entity names to start from.
+            hops: The number of hops to expand.
+            fanout: The number of relationships kept per frontier node.
+            frontier_size: The number of nodes expanded in the next hop.
+            direction: "both", "out" or "in".
+            mention_weight: The weight of the co-mention count.
+            recency_weight: The weight of the recency of the newest mention.
+            half_life_days: The age at which the recency score halves.
+            hop_decay: The factor applied to scores at each further hop.
+            page_size: The number of rows per page, and per fetch from the server.
+
+        Yields:
+            Lists of up to page_size rows, nearest hop first and best first within a
+            hop. Rows have the keys of fetch_related_nodes plus "score", "hop",
+            "mentions" and "last_seen".
+        """
+        if direction not in self.HOP_PATTERNS:
+            raise ValueError(f"Unknown direction {direction!r}, expected one of {sorted(self.HOP_PATTERNS)}")
+        if self.driver is None or not key_entities:
+            return
+
+        query = self._hop_query(direction)
+        parameters = {
+            "fanout": fanout,
+            "mention_weight": mention_weight,
+            "recency_weight": recency_weight,
+            "decay": math.log(2) / (half_life_days * 86400),
+            "now": time.time(),
+        }
+        try:
+            with self.driver.session(fetch_size=page_size) as session:
+                metrics.inc("neo4j_round_trips_total", operation="ranked_neighborhood")
+                seeds = session.run(self.SEED_NODES_QUERY, key_entities=list(key_entities))
+                frontier = [{"id": record["id"], "score": 1.0} for record in seeds]
+                reached = {node["id"] for node in frontier}
+                seen_edges = set()
+                page = []
+                for hop in range(1, hops + 1):
+                    if not frontier:
+                        break
+                    new_nodes = {}
+                    # Rows are consumed as they stream in; the next hop only needs the node scores
+                    metrics.inc("neo4j_round_trips_total", operation="ranked_neighborhood")
+                    result = session.run(query, frontier=frontier, seen_edges=list(seen_edges), **parameters)
+                    for record in result:
+                        if record["edge_id"] in seen_edges:
+                            continue  # reached from both of its ends
+                        seen_edges.add(record["edge_id"])
+                        if record["node_id"] not in reached:
+                            new_nodes[record["node_id"]] = max(new_nodes.get(record["node_id"], 0.0), record["score"])
+                        page.append(
+                            {
+                                "source": record["source"],
+                                "relationship": record["relationship"],
+                                "target": record["target"],
+                                "target_labels": record["target_labels"],
+                                "score": record["score"],
+                                "hop": hop,
+                                "mentions": record["mentions"],
+                                "last_seen": record["last_seen"],
+                            }
+                        )
+                        if len(page) == page_size:
+                            yield page
+                            page = []
+                    reached.update(new_nodes)
+                    best = sorted(new_nodes.items(), key=lambda item: item[1], reverse=True)[:frontier_size]
+                    # Relative to the hop's best node, so scores shrink with every hop instead of compounding
+                    top = best[0][1] if best and best[0][1] > 0 else 1.0
+                    frontier = [{"id": node_id, "score": hop_decay ** hop * score / top} for node_id, score in best]
+                if page:
+                    yield page
+        except Exception as e:
+            print(f"Error fetching the ranked neighborhood: {e}")
+
+    def fetch_ranked_neighborhood(self, key_entities, max_rows=50, **options):
+        """
+        Returns the first max_rows rows of iter_ranked_neighborhood, reading only the
+        pages needed. options are passed to iter_ranked_neighborhood.
+        """
+        options.setdefault("page_size", max_rows)
+        pages = self.iter_ranked_neighborhood(key_entities, **options)
+        rows = []
+        with metrics.timer("fetch_ranked_neighborhood_seconds"):
+            try:
+                for page in pages:
+                    rows.extend(page)
+                    if len(rows) >= max_rows:
+                        break
+            finally:
+                pages.close()
+        return rows[:max_rows]
+
     def close(self):
         """
         Closes the Neo4j driver connection.
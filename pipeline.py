@@ -0,0 +1,464 @@
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from article_fetcher import publish_timestamp
+from custom_ner import CustomNer
+from gazetteer import Gazetteer
+from metrics import metrics
+from model_registry import get_ner, get_spacy_model
+
+# Put on a queue once per downstream worker when the upstream stage is finished.
+_DONE = object()
+
+# The handler, name and batch size of a process-pool stage, set in each worker process by the pool initializer.
+_process_handler = None
+_process_stage = None
+_process_batch_size = None
+
+
+def _init_process(handler, name, batch_size, metrics_enabled):
+    global _process_handler, _process_stage, _process_batch_size
+    _process_handler = handler
+    _process_stage = name
+    _process_batch_size = batch_size
+    # A forked worker starts with a copy of the parent's metrics, which the parent already has
+    metrics.reset()
+    metrics.enabled = metrics_enabled
+    metrics.profiler = None
+
+
+def _call_handler(handler, name, batch_size, payload):
+    if batch_size is None:
+        with metrics.timer("stage_seconds", stage=name):
+            return handler(payload)
+    # A batch is timed as a whole, and stage_seconds gets the per-item share, so it
+    # means the same for batched and unbatched stages
+    start = time.perf_counter()
+    with metrics.timer("stage_batch_seconds", stage=name):
+        results = handler(payload)
+    per_item = (time.perf_counter() - start) / len(payload)
+    for _ in payload:
+        metrics.observe("stage_seconds", per_item, stage=name)
+    return results
+
+
+def _call_process(payload):
+    # The metrics the handler recorded travel back with its result, for the parent to merge
+    result = _call_handler(_process_handler, _process_stage, _process_batch_size, payload)
+    return result, metrics.drain()
+
+
+def _noop(_):
+    return None
+
+
+class PipelineStage:
+    """
+    One step of an IngestPipeline.
+
+    The handler takes an item and returns the item for the next stage, or None to
+    drop it. Stages with use_processes run the handler in a process pool with one
+    process per worker, so the handler and items must be picklable.
+
+    With a batch_size, the handler takes a list of items and returns a list of
+    the same length. A worker takes whatever is already queued, up to
+    batch_size items, so batches only grow while the stage is behind and no item
+    waits for a batch to fill.
+    """
+
+    def __init__(self, name, handler, workers=1, use_processes=False, batch_size=None):
+        """
+        Initializes the PipelineStage.
+
+        Args:
+            name: The stage name shown in the summary.
+            handler: A callable taking one item and returning the next item or None,
+                or taking and returning lists of items if batch_size is set.
+            workers: The number of items, or batches, the stage works on at once.
+            use_processes: Whether to run the handler in worker processes instead of threads.
+            batch_size: The largest number of items per handler call, or None for a
+                handler of single items.
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.use_processes = use_processes
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.processed = 0
+        self.dropped = 0
+        self.errors = 0
+        self.busy = 0.0
+        self.blocked = 0.0
+        self.started = None
+        self.finished = None
+
+    def _record(self, result, error, busy, blocked):
+        with self._lock:
+            if error:
+                self.errors += 1
+            elif result is None:
+                self.dropped += 1
+            else:
+                self.processed += 1
+            self.busy += busy
+            self.blocked += blocked
+
+    def stats(self):
+        """Returns the stage counters, throughput and worker utilization."""
+        elapsed = (self.finished or time.perf_counter()) - self.started if self.started else 0.0
+        return {
+            "workers": self.workers,
+            "processes": self.use_processes,
+            "processed": self.processed,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "items_per_second": self.processed / elapsed if elapsed else 0.0,
+            "utilization": self.busy / (elapsed * self.workers) if elapsed else 0.0,
+            "blocked_seconds": self.blocked,
+        }
+
+
+class IngestPipeline:
+    """
+    Runs items through a chain of stages connected by bounded queues.
+
+    Every stage has its own workers, and a worker blocks while the next stage's
+    queue is full, so a slow stage holds back the ones before it and at most
+    queue_size items wait between any two stages, however long the source is.
+    """
+
+    def __init__(self, stages, queue_size=16, mp_context=None):
+        """
+        Initializes the IngestPipeline.
+
+        Args:
+            stages: The PipelineStages, in order.
+            queue_size: The capacity of the queue in front of each stage.
+            mp_context: The multiprocessing start method for process stages. Defaults
+                to "fork" where available, since "spawn" re-runs a calling script
+                that has no __main__ guard in every worker.
+        """
+        self.stages = stages
+        self.queue_size = queue_size
+        if mp_context is None:
+            mp_context = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        self.mp_context = multiprocessing.get_context(mp_context)
+        self.profiler = None
+
+    def run(self, source, summary=True, profile_interval=None):
+        """
+        Runs every item of source through the pipeline and waits for it to drain.
+
+        Args:
+            source: An iterable of items for the first stage; it is consumed lazily.
+            summary: Whether to print the per-stage throughput summary.
+            profile_interval: Seconds between stack samples, to run the metrics
+                profiler during the run; the finished profiler is kept in
+                self.profiler. Use this rather than starting the profiler before
+                run(), as its sampling thread must not exist when the worker
+                processes are forked.
+
+        Returns:
+            A dictionary of stage name to the stage's stats().
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        remaining = [stage.workers for stage in self.stages]
+        remaining_lock = threading.Lock()
+
+        # Start the worker processes before any pipeline thread exists, so forking is safe
+        pools = {}
+        for i, stage in enumerate(self.stages):
+            stage.reset()
+            if stage.use_processes:
+                pools[i] = ProcessPoolExecutor(
+                    max_workers=stage.workers,
+                    mp_context=self.mp_context,
+                    initializer=_init_process,
+                    initargs=(stage.handler, stage.name, stage.batch_size, metrics.enabled),
+                )
+                list(pools[i].map(_noop, range(stage.workers)))
+        if profile_interval is not None:
+            metrics.start_profiler(profile_interval)
+
+        def work(i):
+            stage = self.stages[i]
+            inbox = queues[i]
+            outbox = queues[i + 1] if i + 1 < len(self.stages) else None
+            finished = False
+            while not finished:
+                item = inbox.get()
+                if item is _DONE:
+                    break
+                items = [item]
+                while len(items) < (stage.batch_size or 1):
+                    try:
+                        item = inbox.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _DONE:
+                        finished = True
+                        break
+                    items.append(item)
+                payload = items if stage.batch_size is not None else items[0]
+
+                start = time.perf_counter()
+                with stage._lock:
+                    if stage.started is None:
+                        stage.started = start
+                error = False
+                try:
+                    if i in pools:
+                        result, drained = pools[i].submit(_call_process, payload).result()
+                        metrics.merge(drained)
+                    else:
+                        result = _call_handler(stage.handler, stage.name, stage.batch_size, payload)
+                    results = result if stage.batch_size is not None else [result]
+                except Exception as e:
+                    print(f"Error in {stage.name} stage: {e}")
+                    metrics.inc("stage_errors_total", stage=stage.name)
+                    results = [None] * len(items)
+                    error = True
+                busy = (time.perf_counter() - start) / len(items)
+
+                for result in results:
+                    blocked = 0.0
+                    if result is not None and outbox is not None:
+                        put_start = time.perf_counter()
+                        outbox.put(result)
+                        blocked = time.perf_counter() - put_start
+                        metrics.observe("stage_blocked_seconds", blocked, stage=stage.name)
+                    stage._record(result, error, busy, blocked)
+
+            with remaining_lock:
+                remaining[i] -= 1
+                last = remaining[i] == 0
+            if last:
+                stage.finished = time.perf_counter()
+                if outbox is not None:
+                    for _ in range(self.stages[i + 1].workers):
+                        outbox.put(_DONE)
+
+        threads = [
+            threading.Thread(target=work, args=(i,), name=f"{stage.name}-{n}", daemon=True)
+            for i, stage in enumerate(self.stages)
+            for n in range(stage.workers)
+        ]
+        start = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for item in source:
+                queues[0].put(item)
+            for _ in range(self.stages[0].workers):
+                queues[0].put(_DONE)
+            for thread in threads:
+                thread.join()
+        finally:
+            for pool in pools.values():
+                pool.shutdown()
+            if profile_interval is not None:
+                self.profiler = metrics.stop_profiler()
+        elapsed = time.perf_counter() - start
+
+        stats = {stage.name: stage.stats() for stage in self.stages}
+        if summary:
+            self.print_summary(stats, elapsed)
+        return stats
+
+    @staticmethod
+    def print_summary(stats, elapsed):
+        print(f"{'stage':<16} {'workers':>7} {'done':>6} {'dropped':>7} {'errors':>6} {'items/s':>8} {'busy':>5} {'blocked s':>9}")
+        for name, s in stats.items():
+            workers = f"{s['workers']}{'p' if s['processes'] else 't'}"
+            print(
+                f"{name:<16} {workers:>7} {s['processed']:6d} {s['dropped']:7d} {s['errors']:6d} "
+                f"{s['items_per_second']:8.2f} {s['utilization']:5.0%} {s['blocked_seconds']:9.1f}"
+            )
+        print(f"total {elapsed:.1f}s")
+
+
+def parse_html(item):
+    """Parses downloaded article HTML into its text; drops articles without text."""
+    from newspaper import Article
+
+    article = Article(item["url"], fetch_images=False)
+    article.download(input_html=item["html"])
+    article.parse()
+    if not article.text:
+        return None
+    return {"url": item["url"], "text": article.text, "published": publish_timestamp(article)}
+
+
+class NerWorker:
+    """
+    Adds entities and sentence spans to a batch of items, in one nlp.pipe call.
+    The spaCy model is loaded on first use, inside the worker process, and is
+    never pickled.
+    """
+
+    def __init__(self, model="en_core_web_trf"):
+        self.model = model
+        self.ner = None
+
+    def __getstate__(self):
+        return {"model": self.model, "ner": None}
+
+    def __call__(self, items):
+        if self.ner is None:
+            self.ner = get_ner(self.model)
+        texts = [item.get("graph_text", item["text"]) for item in items]
+        for item, result in zip(items, self.ner.extract_entities_batch(texts, batch_size=len(texts))):
+            item["entities"] = result["entities"]
+            item["sentences"] = result["sentences"]
+        return items
+
+
+class RelationWorker:
+    """Adds relationships to an item. Only the regex engine is needed, so no model is loaded."""
+
+    def __init__(self, window=1, window_unit="sentence"):
+        self.window = window
+        self.window_unit = window_unit
+        self.ner = None
+
+    def __getstate__(self):
+        return {"window": self.window, "window_unit": self.window_unit, "ner": None}
+
+    def __call__(self, item):
+        if self.ner is None:
+            self.ner = CustomNer(get_spacy_model("blank:en"))
+        entities = item.pop("entities")
+        item["relationships"] = self.ner.extract_relationships(
+            item.get("graph_text", item["text"]), entities, window=self.window, window_unit=self.window_unit
+        )
+        item["entity_names"] = {entity["text"]: entity["label"] for entity in entities}
+        return item
+
+
+def tag_chunks(chunks, item):
+    """
+    Adds the article's URL and publish time to each of its chunks, and the
+    article entities the chunk mentions, which VectorDB searches can filter on.
+    A person is also found by surname, as in the query gazetteer.
+    """
+    gazetteer = Gazetteer()
+    gazetteer.add_entities(item.get("entity_names", {}))
+    for chunk in chunks:
+        chunk["url"] = item["url"]
+        chunk["published"] = item.get("published")
+        chunk["entities"] = [name for name, _ in gazetteer.match(chunk["text"])]
+    return chunks
+
+
+def build_ingest_pipeline(graph_db, graphrag, vector_db, fetcher, index_path="faiss_index", ner_model="en_core_web_trf",
+                          workers=None, queue_size=16, window=1, window_unit="sentence", crawl_state=None,
+                          ner_batch_size=8):
+    """
+    Builds the fetch -> parse -> NER -> relations -> graph write -> chunk/embed ->
+    vector append pipeline over newspaper Article objects.
+
+    Parsing, NER and relation extraction run in process pools; downloads, graph
+    writes and embedding requests wait on I/O and run in threads. Each article is
+    committed to the vector store's write-ahead log as it arrives, its chunks
+    tagged with the article's URL, publish time and the entities they mention.
+
+    With a crawl_state, known URLs are not downloaded again, and a dedup stage
+    after parsing drops unchanged and duplicate articles and reduces changed ones
+    to their new paragraphs, separately for the graph and the vector store. Each
+    store records an article in the crawl state once it has written it.
+
+    Args:
+        graph_db: The Neo4jAuraDB relationships are written to.
+        graphrag: The GraphRagWorkflow that chunks and embeds article texts.
+        vector_db: The VectorDB or ShardedVectorDB chunks are appended to; it should
+            already be saved to index_path, so commit() only appends to its log.
+        fetcher: The ArticleFetcher used to download articles.
+        index_path: The VectorDB directory.
+        ner_model: The spaCy model each NER process loads.
+        workers: A dictionary of stage name to worker count, overriding the defaults.
+        queue_size: The capacity of the queue in front of each stage.
+        window: Passed to CustomNer.extract_relationships; by default only entities
+            in the same or adjacent sentences are paired. None pairs all of them.
+        window_unit: Passed to CustomNer.extract_relationships.
+        crawl_state: An optional CrawlState.
+        ner_batch_size: The most articles an NER worker tags in one nlp.pipe call.
+
+    Returns:
+        An IngestPipeline; call run(articles) on it.
+    """
+    counts = {"fetch": 8, "parse": 2, "dedup": 1, "ner": 1, "relations": 2, "graph_write": 1, "chunk_embed": 2, "vector_append": 1}
+    counts.update(workers or {})
+
+    def fetch(article):
+        if crawl_state is not None and not crawl_state.should_fetch(article.url):
+            return None
+        html = fetcher.download_one(article)
+        # Free the HTML on the Article, so a list of articles held by the caller does not grow with the crawl
+        article.html = ""
+        return {"url": article.url, "html": html} if html else None
+
+    def dedup(item):
+        graph = crawl_state.check(item["url"], item["text"], "graph")
+        vector = crawl_state.check(item["url"], item["text"], "vector")
+        if not graph.text and not vector.text:
+            crawl_state.record(item["url"], item["text"], "graph", duplicate_of=graph.duplicate_of)
+            crawl_state.record(item["url"], item["text"], "vector", duplicate_of=vector.duplicate_of)
+            return None
+        item["graph_text"] = graph.text
+        item["vector_text"] = vector.text
+        item["duplicate_of"] = {"graph": graph.duplicate_of, "vector": vector.duplicate_of}
+        return item
+
+    def record(item, sink):
+        if crawl_state is not None:
+            crawl_state.record(item["url"], item["text"], sink, duplicate_of=item.get("duplicate_of", {}).get(sink))
+
+    def graph_write(item):
+        relationships = item.pop("relationships")
+        if relationships and not graph_db.store_relationships_auradb(relationships, published=item.get("published")):
+            # The vector store still gets the article; the next crawl retries the graph
+            if crawl_state is not None:
+                crawl_state.record_failure(item["url"], "graph", "relationship write failed")
+            return item
+        record(item, "graph")
+        return item
+
+    def chunk_embed(item):
+        text = item.get("vector_text", item["text"])
+        # NER's sentence spans only fit the text when both stores process the same part of the article
+        sentences = item.pop("sentences") if text == item.get("graph_text", item["text"]) else None
+        item["chunks"] = graphrag.chunk_and_embed_news(text, sentences=sentences) if text else []
+        if item["chunks"] is None:
+            return None
+        tag_chunks(item["chunks"], item)
+        return item
+
+    def vector_append(item):
+        if item["chunks"]:
+            vector_db.add_embeddings(item["chunks"])
+            vector_db.commit(index_path)
+            # Cached retrievals for these entities, or for no entities, may now miss the new chunks
+            graphrag.query_cache.invalidate_chunks(item["entity_names"])
+        record(item, "vector")
+        return item
+
+    return IngestPipeline(
+        [
+            PipelineStage("fetch", fetch, counts["fetch"]),
+            PipelineStage("parse", parse_html, counts["parse"], use_processes=True),
+            *([PipelineStage("dedup", dedup, counts["dedup"])] if crawl_state is not None else []),
+            PipelineStage("ner", NerWorker(ner_model), counts["ner"], use_processes=True, batch_size=ner_batch_size),
+            PipelineStage("relations", RelationWorker(window, window_unit), counts["relations"], use_processes=True),
+            PipelineStage("graph_write", graph_write, counts["graph_write"]),
+            PipelineStage("chunk_embed", chunk_embed, counts["chunk_embed"]),
+            PipelineStage("vector_append", vector_append, counts["vector_append"]),
+        ],
+        queue_size=queue_size,
+    )
@@ -0,0 +1,171 @@
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from gazetteer import entity_key
+
+
+def normalize_query(query):
+    """Returns the cache key of a query: NFC-normalized with whitespace collapsed. Case is kept, since NER uses it."""
+    return " ".join(unicodedata.normalize("NFC", query).split())
+
+
+class TTLCache:
+    """
+    A thread-safe LRU cache whose entries also expire ttl seconds after they are set.
+
+    Every entry can be tagged with entity names, so invalidate() drops exactly the
+    entries that depend on entities an ingest touched. Tags are compared by
+    tag_key, so the spelling of a query and the stored name need not match exactly.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300.0, tag_key=entity_key):
+        """
+        Initializes the TTLCache.
+
+        Args:
+            max_entries: The number of entries kept before the least recently used is evicted.
+            ttl: Seconds an entry stays valid, or None to keep entries until evicted.
+            tag_key: The function mapping an entity name to the tag it is compared by.
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.tag_key = tag_key
+        self._entries = OrderedDict()
+        self._by_entity = {}
+        self._untagged = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires, _ = entry
+            if expires is not None and expires < time.monotonic():
+                self._remove(key)
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, entities=()):
+        """Stores a value, tagged with the entity names it depends on."""
+        entities = frozenset(map(self.tag_key, entities))
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, expires, entities)
+            for entity in entities:
+                self._by_entity.setdefault(entity, set()).add(key)
+            if not entities:
+                self._untagged.add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, _, entities = self._entries.pop(key)
+        for entity in entities:
+            keys = self._by_entity.get(entity)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_entity[entity]
+        self._untagged.discard(key)
+
+    def invalidate(self, entities=None, untagged=True):
+        """
+        Drops the entries tagged with any of the entity names, and the untagged ones
+        if untagged is True. Drops everything if entities is None.
+
+        Returns:
+            The number of entries dropped.
+        """
+        with self._lock:
+            if entities is None:
+                keys = list(self._entries)
+            else:
+                keys = set()
+                for entity in entities:
+                    keys.update(self._by_entity.get(self.tag_key(entity), ()))
+                if untagged:
+                    keys.update(self._untagged)
+            for key in keys:
+                self._remove(key)
+            self.invalidations += len(keys)
+            return len(keys)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+            }
+
+
+class QueryCache:
+    """
+    The query-time cache tiers of GraphRagWorkflow:
+
+    - entities: normalized query -> entities from parse_query. Depends only on the
+      NER model, so it is never invalidated by ingest.
+    - neighborhoods: entity set -> related-node rows from the graph.
+    - chunks: (normalized query, top_k) -> retrieved chunks.
+
+    Ingest invalidates the neighborhoods and chunks that involve the entities it
+    wrote; chunks of queries without entities are dropped on every vector write.
+    """
+
+    def __init__(self, max_entries=4096, entity_ttl=24 * 3600.0, neighborhood_ttl=600.0, chunk_ttl=300.0):
+        """
+        Initializes the QueryCache.
+
+        Args:
+            max_entries: The size limit of each tier.
+            entity_ttl: Seconds query entities stay cached.
+            neighborhood_ttl: Seconds graph neighborhoods stay cached.
+            chunk_ttl: Seconds retrieved chunks stay cached.
+        """
+        self.entities = TTLCache(max_entries, entity_ttl)
+        self.neighborhoods = TTLCache(max_entries, neighborhood_ttl)
+        self.chunks = TTLCache(max_entries, chunk_ttl)
+
+    def invalidate_graph(self, entity_names=None):
+        """Drops the neighborhoods that include any of the entities, or all of them if None."""
+        return self.neighborhoods.invalidate(entity_names, untagged=False)
+
+    def invalidate_chunks(self, entity_names=None):
+        """Drops the chunks of queries about any of the entities and of queries without entities, or all if None."""
+        return self.chunks.invalidate(entity_names)
+
+    def clear(self):
+        for tier in (self.entities, self.neighborhoods, self.chunks):
+            tier.invalidate()
+
+    def stats(self):
+        """Returns each tier's size, hits, misses, hit ratio, evictions, expirations and invalidations."""
+        return {
+            "entities": self.entities.stats(),
+            "neighborhoods": self.neighborhoods.stats(),
+            "chunks": self.chunks.stats(),
+        }
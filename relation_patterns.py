@@ -0,0 +1,305 @@
+import re
+from bisect import bisect_left
+
+
+# Relationship rules as (relation type, trigger phrases, label pairs the rule applies to).
+# A label pair of None means the rule applies to every pair; None inside a pair
+# matches any label on that side.
+RELATION_RULES = [
+    # General Relationships
+    ("MET_WITH", ("met", "meet", "saw", "encountered", "chatted with", "spoke to"), None),
+    ("LOCATED_IN", ("located", "lives", "resides", "in", "situated in", "based in"), ((None, "GPE"),)),
+    ("WORKS_FOR", ("works", "employed", "for", "is employed by", "is a member of"), None),
+    ("PART_OF", ("part of", "belong to", "within", "is a component of", "is a subset of"), ((None, "ORG"), (None, "GPE"))),
+    ("CONTAINS", ("contains", "includes", "holds", "encompasses", "comprises"), (("GPE", "GPE"), ("ORG", "PRODUCT"), ("GPE", "ORG"))),
+    ("SERVES", ("serves", "provides", "offers", "delivers", "supplies"), (("ORG", "PRODUCT"), ("ORG", "GPE"))),
+    ("LOCATED_AT", ("located at", "at", "situated at", "found at", "is based at"), (("ORG", "GPE"),)),
+    ("IS_RELATED_TO", ("is related to", "connected to", "has ties with", "shares a connection with"), None),
+
+    # Person-Specific Relationships
+    ("IS_AFFILIATED_WITH", ("is", "are", "a", "an"), (("PERSON", "ORG"),)),
+    ("IS_MARRIED_TO", ("married", "spouse", "partner", "husband", "wife"), (("PERSON", "PERSON"),)),
+    ("IS_RELATED_TO_FAMILY", ("child", "son", "daughter", "parent", "father", "mother", "sibling", "brother", "sister"), (("PERSON", "PERSON"),)),
+    ("BORN_IN", ("born in", "was born in"), (("PERSON", "GPE"),)),
+    ("DIED_IN", ("died in", "passed away in"), (("PERSON", "GPE"),)),
+    ("EDUCATED_AT", ("educated at", "studied at", "attended", "graduated from"), (("PERSON", "ORG"),)),
+    ("AWARDED_TO", ("awarded to", "received", "won", "honored with"), (("ORG", "PERSON"), ("EVENT", "PERSON"))),
+    ("IS_LEADER_OF", ("leader of", "CEO of", "president of", "head of", "director of"), (("PERSON", "ORG"),)),
+    ("IS_MEMBER_OF", ("member of", "part of", "joined", "is a member of"), (("PERSON", "ORG"),)),
+    ("CREATED", ("created", "made", "developed", "invented", "authored"), (("PERSON", "PRODUCT"),)),
+    ("DIRECTED_BY", ("directed by", "by", "filmed by", "produced by"), (("PRODUCT", "PERSON"),)),
+
+    # Organization-Specific Relationships
+    ("FOUNDED_BY", ("founded by", "established by", "created by", "started by"), (("ORG", "PERSON"),)),
+    ("PRODUCED_BY", ("produced by", "manufactured by", "made by", "built by"), (("PRODUCT", "ORG"),)),
+    ("INVESTED_IN", ("invested in", "funding", "financed", "backed"), (("ORG", "ORG"),)),
+    ("PUBLISHED_BY", ("published by", "released by", "distributed by"), (("PRODUCT", "ORG"),)),
+    ("HEADQUARTERED_IN", ("headquartered in", "is based in", "has its headquarters in"), (("ORG", "GPE"),)),
+    ("SUBSIDIARY_OF", ("subsidiary of", "is a subsidiary of", "owned by"), (("ORG", "ORG"),)),
+
+    # Event-Specific Relationships
+    ("HELD_IN", ("held in", "took place in", "occurred in"), (("EVENT", "GPE"),)),
+    ("PARTICIPATED_IN", ("participated in", "attended", "was present at"), (("PERSON", "EVENT"),)),
+    ("ORGANIZED_BY", ("organized by", "hosted by", "sponsored by"), (("EVENT", "ORG"),)),
+
+    # Product-Specific Relationships
+    ("HAS_DATE", ("is", "are", "has", "have", "was", "were"), ((None, "DATE"),)),
+    ("HAS_NUMBER", ("is", "are", "has", "have", "was", "were"), ((None, "CARDINAL"),)),
+    ("HAS_PRODUCT", ("is", "are", "has", "have", "includes", "contains"), ((None, "PRODUCT"),)),
+    ("RELEASED_IN", ("released in", "launched in"), (("PRODUCT", "DATE"),)),
+    ("SOLD_IN", ("sold in", "available in"), (("PRODUCT", "GPE"),)),
+
+    # Date-Specific Relationships
+    ("OCCURRED_ON", ("occurred on", "happened on", "took place on"), (("EVENT", "DATE"),)),
+    ("VALID_UNTIL", ("valid until", "expires on"), (("PRODUCT", "DATE"),)),
+
+    # Cardinal-Specific Relationships
+    ("MEASURED_IN", ("measured in", "counts", "amounts to"), (("PRODUCT", "CARDINAL"),)),
+    ("POPULATION_OF", ("population of", "has a population of"), (("GPE", "CARDINAL"),)),
+    ("NUMBER_OF", ("number of", "consists of", "contains"), (("ORG", "CARDINAL"), ("PRODUCT", "CARDINAL"))),
+
+    # GPE-Specific Relationships
+    ("CAPITAL_OF", ("capital of", "is the capital of"), (("GPE", "GPE"),)),
+    ("BORDERED_BY", ("bordered by", "shares a border with", "adjacent to"), (("GPE", "GPE"),)),
+    ("IS_IN_REGION", ("is in", "is part of", "located in"), (("GPE", "GPE"),)),
+
+    # Event to Event relationships
+    ("PRECEDED_BY", ("preceded by", "occurred before"), (("EVENT", "EVENT"),)),
+    ("FOLLOWED_BY", ("followed by", "occurred after"), (("EVENT", "EVENT"),)),
+    ("CAUSED_BY", ("caused by", "resulted from"), (("EVENT", "EVENT"),)),
+    ("LED_TO", ("led to", "resulted in"), (("EVENT", "EVENT"),)),
+
+    # Product to Product relationships
+    ("IS_A_TYPE_OF", ("is a type of", "is a kind of", "is a variation of"), (("PRODUCT", "PRODUCT"),)),
+    ("REQUIRES", ("requires", "needs", "uses"), (("PRODUCT", "PRODUCT"),)),
+    ("COMPATIBLE_WITH", ("compatible with", "works with"), (("PRODUCT", "PRODUCT"),)),
+    ("REPLACES", ("replaces", "substitutes", "is a replacement for"), (("PRODUCT", "PRODUCT"),)),
+
+    # ORG to ORG Relationships
+    ("MERGED_WITH", ("merged with", "acquired by"), (("ORG", "ORG"),)),
+    ("PARTNERED_WITH", ("partnered with", "collaborated with"), (("ORG", "ORG"),)),
+    ("COMPETES_WITH", ("competes with", "rivals"), (("ORG", "ORG"),)),
+    ("SUPPLIES", ("supplies", "provides"), (("ORG", "ORG"),)),
+    ("DISTRIBUTES", ("distributes", "sells"), (("ORG", "ORG"),)),
+
+    # Person to Event Relationships
+    ("ATTENDED", ("attended", "participated in"), (("PERSON", "EVENT"),)),
+    ("SPOKE_AT", ("spoke at", "gave a speech at"), (("PERSON", "EVENT"),)),
+    ("PERFORMED_AT", ("performed at", "played at"), (("PERSON", "EVENT"),)),
+
+    # Person to Product Relationships
+    ("USES", ("uses", "utilizes", "employs"), (("PERSON", "PRODUCT"),)),
+    ("OWNS", ("owns", "possesses"), (("PERSON", "PRODUCT"),)),
+    ("REVIEWED", ("reviewed", "rated"), (("PERSON", "PRODUCT"),)),
+
+    # Product to GPE Relationships
+    ("SHIPPED_TO", ("shipped to", "delivered to"), (("PRODUCT", "GPE"),)),
+    ("MANUFACTURED_IN", ("manufactured in", "produced in"), (("PRODUCT", "GPE"),)),
+    ("AVAILABLE_IN", ("available in", "sold in"), (("PRODUCT", "GPE"),)),
+
+    # Org to GPE Relationships
+    ("OPERATES_IN", ("operates in", "has branches in"), (("ORG", "GPE"),)),
+    ("IS_BASED_IN", ("is based in", "located in"), (("ORG", "GPE"),)),
+    ("HAS_OFFICES_IN", ("has offices in", "maintains a presence in"), (("ORG", "GPE"),)),
+
+    # Event to GPE Relationships
+    ("HELD_IN_GPE", ("held in", "took place in"), (("EVENT", "GPE"),)),
+
+    # Event to Date Relationships
+    ("OCCURRED_ON_DATE", ("occurred on", "happened on", "took place on"), (("EVENT", "DATE"),)),
+
+    # Product to Date Relationships
+    ("RELEASED_ON", ("released on", "launched on"), (("PRODUCT", "DATE"),)),
+    ("EXPIRES_ON", ("expires on", "valid until"), (("PRODUCT", "DATE"),)),
+
+    # GPE to CARDINAL Relationships
+    ("POPULATION_CARDINAL", ("population of", "has a population of"), (("GPE", "CARDINAL"),)),
+
+    # ORG to CARDINAL Relationships
+    ("EMPLOYEES_CARDINAL", ("employees", "staff", "workforce"), (("ORG", "CARDINAL"),)),
+
+    # Product to CARDINAL Relationships
+    ("COST_CARDINAL", ("costs", "priced at", "valued at"), (("PRODUCT", "CARDINAL"),)),
+    ("QUANTITY_CARDINAL", ("quantity", "amount", "number"), (("PRODUCT", "CARDINAL"),)),
+]
+
+
+def rule_applies(label_pairs, label1, label2):
+    """Returns True if a rule with the given label pairs applies to (label1, label2)."""
+    if label_pairs is None:
+        return True
+    return any(
+        (l1 is None or l1 == label1) and (l2 is None or l2 == label2)
+        for l1, l2 in label_pairs
+    )
+
+
+def relation_name(rel_type):
+    """Maps a rule name onto the relationship type stored in the graph."""
+    return "IS_RELATED_TO" if rel_type.startswith("IS_RELATED_TO_") else rel_type
+
+
+def _is_word_char(char):
+    return char.isalnum() or char == "_"
+
+
+class PhraseIndex:
+    """
+    Positions of every relationship trigger phrase in one text, grouped by rule.
+
+    Built by RelationPatternEngine.scan; each rule keeps parallel, start-sorted
+    lists of the start and end offsets of its phrase hits.
+    """
+
+    def __init__(self, text, n_rules):
+        self.text = text
+        self.starts = [[] for _ in range(n_rules)]
+        self.ends = [[] for _ in range(n_rules)]
+
+    def add(self, start, rule_lengths):
+        for rule_index, length in rule_lengths:
+            self.starts[rule_index].append(start)
+            self.ends[rule_index].append(start + length)
+
+    def has_hit(self, rule_index, start, end):
+        """Returns True if the rule has a phrase hit inside text[start:end]."""
+        starts = self.starts[rule_index]
+        ends = self.ends[rule_index]
+        i = bisect_left(starts, start)
+        while i < len(starts) and starts[i] < end:
+            if ends[i] <= end:
+                return True
+            i += 1
+        return False
+
+
+class RelationPatternEngine:
+    """
+    Matches relationship trigger phrases between pairs of entities.
+
+    All rules are merged into one alternation with a named group per phrase, and a
+    text is scanned with it once. Rules are indexed by (label1, label2), so a pair
+    of entities only checks the rules that apply to it, each with a binary search
+    over the phrase hits of that rule. Results are the same as running each rule's
+    ``\\b(...)\\b`` regex over the text between the two entities.
+    """
+
+    def __init__(self, rules=RELATION_RULES):
+        self.rules = rules
+        self._by_label_pair = {}
+
+        phrase_rules = {}
+        for index, (_, phrases, _) in enumerate(rules):
+            for phrase in phrases:
+                phrase_rules.setdefault(phrase, set()).add(index)
+
+        # Longest phrases first, so the alternation reports the longest phrase that
+        # starts at a position. Any shorter phrase matching at the same position is
+        # a prefix of it ending on a word boundary, and is recorded along with it.
+        self._phrases = sorted(phrase_rules, key=len, reverse=True)
+        self._group_rules = {}
+        for group_index, phrase in enumerate(self._phrases):
+            rule_lengths = set()
+            for other in self._phrases:
+                cut = len(other)
+                if phrase.startswith(other) and (
+                    cut == len(phrase)
+                    or _is_word_char(phrase[cut - 1]) != _is_word_char(phrase[cut])
+                ):
+                    rule_lengths.update((index, cut) for index in phrase_rules[other])
+            self._group_rules[f"p{group_index}"] = sorted(rule_lengths)
+
+        alternation = "|".join(f"(?P<p{i}>{phrase})" for i, phrase in enumerate(self._phrases))
+        self._scan_regex = re.compile(rf"(?=\b(?:{alternation})\b)")
+        self._match_regex = re.compile(rf"\b(?:{alternation})\b")
+        self._max_phrase_length = len(self._phrases[0]) if self._phrases else 0
+
+    def label_pair(self, label1, label2):
+        """Returns the (rule index, relationship type) pairs that apply to a label pair."""
+        key = (label1, label2)
+        applicable = self._by_label_pair.get(key)
+        if applicable is None:
+            applicable = self._by_label_pair[key] = [
+                (index, relation_name(rel_type))
+                for index, (rel_type, _, label_pairs) in enumerate(self.rules)
+                if rule_applies(label_pairs, label1, label2)
+            ]
+        return applicable
+
+    def scan(self, text):
+        """Scans a text once and returns the PhraseIndex of its trigger phrases."""
+        index = PhraseIndex(text, len(self.rules))
+        group_rules = self._group_rules
+        for m in self._scan_regex.finditer(text):
+            index.add(m.start(), group_rules[m.lastgroup])
+        return index
+
+    def _edge_hits(self, index, start, end):
+        """
+        Finds the rules with phrase hits that only exist in text[start:end] as a
+        standalone string, i.e. at a slice edge that falls inside a word.
+        """
+        text = index.text
+        rules = set()
+        if 0 < start < end and _is_word_char(text[start - 1]) and _is_word_char(text[start]):
+            window = text[start:min(end, start + self._max_phrase_length + 1)]
+            m = self._match_regex.match(window)
+            if m is not None:
+                rules.update(rule_index for rule_index, _ in self._group_rules[m.lastgroup])
+        if start < end < len(text) and _is_word_char(text[end - 1]) and _is_word_char(text[end]):
+            for group_index, phrase in enumerate(self._phrases):
+                phrase_start = end - len(phrase)
+                if phrase_start < start or not text.startswith(phrase, phrase_start):
+                    continue
+                if phrase_start == start or (
+                    _is_word_char(text[phrase_start - 1]) != _is_word_char(text[phrase_start])
+                ):
+                    rules.update(rule_index for rule_index, _ in self._group_rules[f"p{group_index}"])
+        return rules
+
+    def relations_between(self, index, label1, label2, start, end):
+        """
+        Finds the relationships triggered by the text between two entities.
+
+        Args:
+            index: The PhraseIndex of the text, from scan().
+            label1: The label of the first entity.
+            label2: The label of the second entity.
+            start: The offset where the text between the entities starts.
+            end: The offset where the text between the entities ends.
+
+        Returns:
+            A list of relationship types, in rule order.
+        """
+        edge_rules = self._edge_hits(index, start, end)
+        return [
+            name
+            for rule_index, name in self.label_pair(label1, label2)
+            if rule_index in edge_rules or index.has_hit(rule_index, start, end)
+        ]
+
+    def match(self, label1, label2, between_text):
+        """Finds the relationships triggered by a standalone text between two entities."""
+        return self.relations_between(self.scan(between_text), label1, label2, 0, len(between_text))
+
+    def compile_patterns(self, label1, label2):
+        """
+        Builds one compiled regex per rule for a label pair, with None for rules that
+        do not apply, the way the per-pair pattern dictionary has always looked.
+        """
+        return {
+            rel_type: re.compile(r"\b(" + "|".join(phrases) + r")\b")
+            if rule_applies(label_pairs, label1, label2) else None
+            for rel_type, phrases, label_pairs in self.rules
+        }
+
+
+_engine = None
+
+
+def get_relation_engine():
+    """Returns the process-wide relation pattern engine."""
+    global _engine
+    if _engine is None:
+        _engine = RelationPatternEngine()
+    return _engine
@@ -0,0 +1,448 @@
+"""
+An asyncio HTTP service for GraphRAG retrieval.
+
+The spaCy model, the FAISS index and the Neo4j connection are loaded once, in the
+background, after the server starts listening. Concurrent /search requests are
+micro-batched, so a batch runs NER through one nlp.pipe call, embeds its queries
+in one request and searches FAISS once. Queries that name an entity already in
+the graph skip the NER model: a gazetteer of the graph's entity names answers
+them, and picks up new entities every --gazetteer-refresh seconds. With
+--entity-filter, a query that names entities only searches the chunks that
+mention them.
+
+Endpoints:
+    POST /search   {"query": "...", "top_k": 5} -> entities, graph facts, chunks, fused context
+    GET  /healthz  200 while the process is up
+    GET  /readyz   200 once everything is loaded, 503 while loading or shutting down
+    GET  /stats    batching, cache and embedding statistics
+    GET  /metrics  per-stage timers, counters and histograms in the Prometheus text
+                   format, or as JSON with ?format=json
+
+Usage:
+    python service.py --port 8080 --spacy-model en_core_web_sm --stub-embeddings \
+        --neo4j-uri bolt://localhost:7687 --neo4j-user neo4j --neo4j-password password
+"""
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from metrics import metrics
+
+_STOP = object()
+
+
+class MicroBatcher:
+    """
+    Collects concurrent requests into batches for a synchronous batch handler.
+
+    A batch closes max_wait seconds after its first request arrives, or when it
+    holds max_batch requests. Batches run on a thread pool, at most
+    max_inflight at a time; requests that arrive meanwhile queue up and form
+    the next batch, so batches grow with load.
+    """
+
+    def __init__(self, handler, max_batch=32, max_wait=0.005, max_inflight=2):
+        """
+        Initializes the MicroBatcher.
+
+        Args:
+            handler: A function taking a list of requests and returning a list of
+                results in the same order.
+            max_batch: The largest number of requests per batch.
+            max_wait: Seconds a batch waits for more requests after its first one.
+            max_inflight: The number of batches handled at the same time.
+        """
+        self.handler = handler
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.max_inflight = max_inflight
+        self.batches = 0
+        self.requests = 0
+        self._queue = None
+        self._task = None
+        self._running = set()
+        self._executor = ThreadPoolExecutor(max_workers=max_inflight, thread_name_prefix="micro-batch")
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_inflight)
+        self._task = asyncio.create_task(self._run())
+
+    async def submit(self, request):
+        """Queues a request and waits for its result."""
+        if self._task is None or self._task.done():
+            raise RuntimeError("MicroBatcher is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((request, future))
+        return await future
+
+    async def stop(self):
+        """Handles the requests already queued, waits for running batches and stops."""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        if self._running:
+            await asyncio.gather(*self._running)
+        self._executor.shutdown(wait=True)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch:
+                # Drain what is already queued without waiting, then wait out the window
+                if self._queue.empty():
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._slots.acquire()
+            task = asyncio.create_task(self._dispatch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _dispatch(self, batch):
+        requests = [request for request, _ in batch]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self._executor, self.handler, requests)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finally:
+            self.batches += 1
+            self.requests += len(batch)
+            self._slots.release()
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": self.requests / self.batches if self.batches else 0.0,
+        }
+
+
+class QueryService:
+    """
+    Serves GraphRagWorkflow.graphrag_search_batch over HTTP.
+
+    Requests beyond max_concurrency in flight are rejected with 503 rather than
+    queued, so an overloaded service sheds load instead of timing out everyone.
+    On shutdown the service reports not ready, stops accepting connections,
+    finishes the requests in flight and then closes the graph connection.
+    """
+
+    def __init__(self, loader, max_concurrency=64, max_batch=32, batch_window=0.005, request_timeout=10.0,
+                 graph_timeout=5.0, vector_timeout=5.0, max_top_k=50, gazetteer_refresh=60.0, profile_dir=None):
+        """
+        Initializes the QueryService.
+
+        Args:
+            loader: A function returning the GraphRagWorkflow to serve; called once,
+                on a worker thread, after the server starts.
+            max_concurrency: The number of /search requests in flight at once.
+            max_batch: The largest number of queries per batch.
+            batch_window: Seconds a batch waits for more queries after its first one.
+            request_timeout: Seconds a /search request waits for its batch.
+            graph_timeout: Seconds a batch waits for the graph branch.
+            vector_timeout: Seconds a batch waits for the vector branch.
+            max_top_k: The largest top_k a request may ask for.
+            gazetteer_refresh: Seconds between loads of new graph entity names into
+                the query NER gazetteer, if the loaded workflow's NER has one.
+            profile_dir: If set, a sampling profiler runs while the service does and
+                writes per-stage flame graph stacks to this directory on shutdown.
+        """
+        self.loader = loader
+        self.graphrag = None
+        self.max_concurrency = max_concurrency
+        self.request_timeout = request_timeout
+        self.graph_timeout = graph_timeout
+        self.vector_timeout = vector_timeout
+        self.max_top_k = max_top_k
+        self.gazetteer_refresh = gazetteer_refresh
+        self.profile_dir = profile_dir
+        self.batcher = MicroBatcher(self._search_batch, max_batch=max_batch, max_wait=batch_window)
+        self.in_flight = 0
+        self.rejected = 0
+        self.load_error = None
+        self.load_seconds = None
+        self.draining = False
+        self._load_task = None
+        self._refresh_task = None
+        metrics.add_collector("service", lambda: {"in_flight": self.in_flight, "rejected": self.rejected, "batching": self.batcher.stats()})
+
+    @property
+    def ready(self):
+        return self.graphrag is not None and not self.draining
+
+    def app(self):
+        app = web.Application()
+        app.add_routes(
+            [
+                web.post("/search", self.search),
+                web.get("/healthz", self.healthz),
+                web.get("/readyz", self.readyz),
+                web.get("/stats", self.stats),
+                web.get("/metrics", self.export_metrics),
+            ]
+        )
+        app.on_startup.append(self._on_startup)
+        app.on_shutdown.append(self._on_shutdown)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+    async def _on_startup(self, app):
+        self.batcher.start()
+        if self.profile_dir:
+            metrics.start_profiler()
+        self._load_task = asyncio.create_task(self._load())
+
+    async def _load(self):
+        start = time.perf_counter()
+        try:
+            self.graphrag = await asyncio.get_running_loop().run_in_executor(None, self.loader)
+            self.load_seconds = time.perf_counter() - start
+            print(f"Loaded in {self.load_seconds:.1f} s, ready to serve.")
+            gazetteer = getattr(self.graphrag.ner, "gazetteer", None)
+            if gazetteer is not None and self.graphrag.graph_db is not None and self.gazetteer_refresh > 0:
+                self._refresh_task = asyncio.create_task(self._refresh_gazetteer(gazetteer, self.graphrag.graph_db))
+        except Exception as e:
+            self.load_error = e
+            print(f"Error loading the GraphRAG workflow: {e}")
+
+    async def _refresh_gazetteer(self, gazetteer, graph_db):
+        # Ingest runs in another process, so poll the graph for the entities it created
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.gazetteer_refresh)
+            try:
+                added = await loop.run_in_executor(None, gazetteer.refresh, graph_db)
+                if added:
+                    print(f"Gazetteer: added {added} entity names.")
+            except Exception as e:
+                print(f"Error refreshing the gazetteer: {e}")
+
+    async def _on_shutdown(self, app):
+        # Fail readiness first, so a load balancer stops routing here
+        self.draining = True
+
+    async def _on_cleanup(self, app):
+        for task in (self._load_task, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+        await self.batcher.stop()
+        profiler = metrics.stop_profiler()
+        if profiler is not None:
+            print(f"Wrote profiles to {', '.join(profiler.write(self.profile_dir))}")
+        if self.graphrag is not None:
+            self.graphrag.search_executor.shutdown(wait=False)
+            if self.graphrag.graph_db is not None:
+                self.graphrag.graph_db.close()
+
+    def _search_batch(self, requests):
+        # Queries in a FAISS batch share top_k, so group by it
+        groups = {}
+        for i, request in enumerate(requests):
+            groups.setdefault(request["top_k"], []).append(i)
+        results = [None] * len(requests)
+        for top_k, indices in groups.items():
+            contexts = self.graphrag.graphrag_search_batch(
+                [requests[i]["query"] for i in indices],
+                top_k=top_k,
+                graph_timeout=self.graph_timeout,
+                vector_timeout=self.vector_timeout,
+            )
+            for i, context in zip(indices, contexts):
+                results[i] = context
+        return results
+
+    async def search(self, request):
+        if not self.ready:
+            return web.json_response({"error": "not ready"}, status=503, headers={"Retry-After": "1"})
+        if self.in_flight >= self.max_concurrency:
+            self.rejected += 1
+            return web.json_response({"error": "overloaded"}, status=503, headers={"Retry-After": "1"})
+
+        try:
+            body = await request.json()
+            query = body["query"]
+            top_k = int(body.get("top_k", 5))
+        except Exception:
+            return web.json_response({"error": 'expected a JSON body {"query": str, "top_k": int}'}, status=400)
+        if not isinstance(query, str) or not query.strip() or not 0 < top_k <= self.max_top_k:
+            return web.json_response({"error": f"query must be non-empty and 0 < top_k <= {self.max_top_k}"}, status=400)
+
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            context = await asyncio.wait_for(self.batcher.submit({"query": query, "top_k": top_k}), self.request_timeout)
+        except asyncio.TimeoutError:
+            return web.json_response({"error": "timed out"}, status=504)
+        except Exception as e:
+            print(f"Error serving query {query!r}: {e}")
+            return web.json_response({"error": str(e)}, status=500)
+        finally:
+            self.in_flight -= 1
+            metrics.observe("request_seconds", time.perf_counter() - start)
+
+        return web.json_response(
+            {
+                "query": context.query,
+                "entities": context.entities,
+                "graph": context.graph_context().splitlines(),
+                "chunks": [
+                    {"id": c.get("id"), "text": c["text"], "distance": float(c["match_distance"]), "url": c.get("url"),
+                     "published": c.get("published")}
+                    for c in context.chunks
+                ],
+                "fused": context.fused,
+                "timings": context.timings,
+                "timed_out": context.timed_out,
+                "errors": {name: str(e) for name, e in context.errors.items()},
+            }
+        )
+
+    async def healthz(self, request):
+        return web.json_response({"status": "ok"})
+
+    async def readyz(self, request):
+        if self.ready:
+            return web.json_response({"status": "ready", "load_seconds": self.load_seconds})
+        if self.draining:
+            status = "shutting down"
+        elif self.load_error is not None:
+            status = f"load failed: {self.load_error}"
+        else:
+            status = "loading"
+        return web.json_response({"status": status}, status=503)
+
+    async def stats(self, request):
+        stats = {"in_flight": self.in_flight, "rejected": self.rejected, "batching": self.batcher.stats()}
+        if self.graphrag is not None:
+            stats["cache"] = self.graphrag.cache_stats()
+            stats["embeddings"] = self.graphrag.embedding_stats()
+            stats["vectors"] = self.graphrag.vector_db.ntotal if self.graphrag.vector_db is not None else 0
+            gazetteer = getattr(self.graphrag.ner, "gazetteer", None)
+            if gazetteer is not None:
+                stats["gazetteer"] = gazetteer.stats()
+        return web.json_response(stats)
+
+    async def export_metrics(self, request):
+        if request.query.get("format") == "json":
+            return web.json_response(metrics.snapshot())
+        return web.Response(body=metrics.to_prometheus().encode("utf-8"),
+                            headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"})
+
+
+def build_workflow(args):
+    """Loads the spaCy model, FAISS index and Neo4j connection and returns the GraphRagWorkflow."""
+    from embeddings import HashEmbeddings
+    from faiss_lib import SHARDS_FILE, ShardedVectorDB, VectorDB
+    from gazetteer import Gazetteer
+    from graphrag_workflow import GraphRagWorkflow
+    from model_registry import get_ner
+    from neo4j_auradb import Neo4jAuraDB
+
+    ner = get_ner(args.spacy_model)
+    if os.path.exists(os.path.join(args.index, SHARDS_FILE)):
+        # Only shards within the retention period are loaded; ingest removes the expired ones
+        vector_db = ShardedVectorDB(retention=args.retention_days * 86400 if args.retention_days else None)
+    else:
+        vector_db = VectorDB()
+    vector_db.load_index(args.index)
+    graph_db = None
+    if args.neo4j_uri:
+        graph_db = Neo4jAuraDB(args.neo4j_uri, args.neo4j_user, args.neo4j_password, ner=ner)
+        if graph_db.driver is None:
+            raise RuntimeError(f"Could not connect to Neo4j at {args.neo4j_uri}")
+        if args.gazetteer_refresh > 0:
+            ner.gazetteer = Gazetteer()
+            print(f"Gazetteer: {ner.gazetteer.refresh(graph_db)} entity names.")
+    return GraphRagWorkflow(
+        embedding_model=args.embedding_model,
+        embeddings=HashEmbeddings() if args.stub_embeddings else None,
+        ner=ner,
+        cache_path=None if args.stub_embeddings else "embedding_cache.sqlite",
+        chunker="window",
+        graph_db=graph_db,
+        vector_db=vector_db,
+        entity_filter=args.entity_filter,
+    )
+
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument(
+        "--index", default="faiss_index", help="The FAISS index saved by VectorDB or ShardedVectorDB.save_index."
+    )
+    parser.add_argument("--retention-days", type=float, help="For a sharded index, the days of shards to load.")
+    parser.add_argument("--spacy-model", default="en_core_web_trf", help='A spaCy model, or "blank:en" for no NER.')
+    parser.add_argument("--embedding-model", default="nomic-embed-text")
+    parser.add_argument("--stub-embeddings", action="store_true", help="Use HashEmbeddings instead of Ollama.")
+    parser.add_argument("--neo4j-uri", default=os.getenv("NEO4J_URI"), help="Omit to serve without the graph.")
+    parser.add_argument("--neo4j-user", default=os.getenv("NEO4J_USERNAME"))
+    parser.add_argument("--neo4j-password", default=os.getenv("NEO4J_PASSWORD"))
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--batch-window-ms", type=float, default=5.0)
+    parser.add_argument("--request-timeout", type=float, default=10.0)
+    parser.add_argument("--graph-timeout", type=float, default=5.0)
+    parser.add_argument("--vector-timeout", type=float, default=5.0)
+    parser.add_argument(
+        "--gazetteer-refresh", type=float, default=60.0,
+        help="Seconds between loads of new graph entity names for query NER; 0 disables the gazetteer.",
+    )
+    parser.add_argument(
+        "--entity-filter", action="store_true",
+        help="Only search the chunks that mention a query's entities, when any do.",
+    )
+    parser.add_argument("--shutdown-timeout", type=float, default=30.0, help="Seconds to finish in-flight requests.")
+    parser.add_argument("--profile-dir", help="Sample stacks while serving and write per-stage flame graphs here on exit.")
+    args = parser.parse_args()
+
+    service = QueryService(
+        lambda: build_workflow(args),
+        max_concurrency=args.max_concurrency,
+        max_batch=args.max_batch,
+        batch_window=args.batch_window_ms / 1000,
+        request_timeout=args.request_timeout,
+        graph_timeout=args.graph_timeout,
+        vector_timeout=args.vector_timeout,
+        gazetteer_refresh=args.gazetteer_refresh,
+        profile_dir=args.profile_dir,
+    )
+    # run_app stops on SIGINT/SIGTERM: it stops listening, runs on_shutdown, waits up to
+    # shutdown_timeout for requests in flight, then runs on_cleanup
+    web.run_app(service.app(), host=args.host, port=args.port, shutdown_timeout=args.shutdown_timeout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from embeddings import HashEmbeddings
+from graphrag_workflow import GraphRagWorkflow
+from neo4j_auradb import Neo4jAuraDB
+
+
+class RecordingSession:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def run(self, query, **parameters):
+        self.calls.append(parameters)
+        return [{"name": "AT&T Inc."}]
+
+
+class RecordingDriver:
+    def __init__(self):
+        self.calls = []
+
+    def session(self):
+        return RecordingSession(self.calls)
+
+
+class FakeGraphDB:
+    def __init__(self):
+        self.fetched = []
+
+    def add_write_listener(self, callback):
+        pass
+
+    def fetch_related_nodes(self, key_entities):
+        self.fetched.append(key_entities)
+        if key_entities == ["Elon Musk"]:
+            return [{"source": "Elon Musk", "relationship": "LEADS", "target": "Tesla", "target_labels": ["ORG"]}]
+        return []
+
+    def search_entities(self, text, limit=5):
+        return ["Elon Musk"] if "musk" in text.lower() else []
+
+
+def test_search_entities_escapes_lucene_syntax():
+    db = Neo4jAuraDB.__new__(Neo4jAuraDB)
+    db.driver = RecordingDriver()
+    assert db.search_entities("AT&T (Inc)") == ["AT&T Inc."]
+    assert db.driver.calls == [{"q": "at\\&t~ AND \\(inc\\)~", "limit": 5}]
+
+
+def test_related_nodes_fall_back_to_full_text_matches():
+    graph_db = FakeGraphDB()
+    workflow = GraphRagWorkflow("hash", embeddings=HashEmbeddings(), cache_path=None, chunker="window", graph_db=graph_db)
+    rows = workflow.related_nodes(["Musk"])
+    assert [row["target"] for row in rows] == ["Tesla"]
+    assert graph_db.fetched == [["Musk"], ["Elon Musk"]]
+    assert workflow.related_nodes(["Nobody"]) == []
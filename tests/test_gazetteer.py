@@ -0,0 +1,28 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from gazetteer import Gazetteer
+
+
+def test_surname_alias_of_one_person():
+    gazetteer = Gazetteer()
+    gazetteer.add("Joe Biden", "PERSON")
+    assert gazetteer.match("What did Biden say?") == [("Joe Biden", "PERSON")]
+
+
+def test_surname_shared_by_three_people_is_ambiguous():
+    gazetteer = Gazetteer()
+    for name in ("Joe Biden", "Hunter Biden", "Jill Biden", "Ashley Biden"):
+        gazetteer.add(name, "PERSON")
+    assert gazetteer.match("What did Biden say?") == []
+    assert gazetteer.match("Jill Biden met Hunter Biden") == [("Jill Biden", "PERSON"), ("Hunter Biden", "PERSON")]
+
+
+def test_shared_surname_does_not_hide_an_entity_of_that_name():
+    gazetteer = Gazetteer()
+    gazetteer.add("Jordan", "GPE")
+    for name in ("Michael Jordan", "Vernon Jordan", "Barbara Jordan"):
+        gazetteer.add(name, "PERSON")
+    assert gazetteer.match("News from Jordan") == [("Jordan", "GPE")]
@@ -0,0 +1,63 @@
+import os
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from crawl_state import CrawlState
+from neo4j_auradb import Neo4jAuraDB
+
+RELATIONSHIP = {
+    "entity1": {"text": "Joe Biden", "label": "PERSON"},
+    "entity2": {"text": "Washington", "label": "GPE"},
+    "relation": "ASSOCIATED_WITH",
+}
+
+
+class FailingDriver:
+    def session(self):
+        raise RuntimeError("connection reset")
+
+
+class FakeNer:
+    def extract_entities(self, text):
+        return []
+
+    def extract_relationships(self, text, entities):
+        return [RELATIONSHIP]
+
+
+class FakeFetcher:
+    def fetch(self, articles):
+        for article in articles:
+            yield article, f"Joe Biden was in Washington. {article.url}"
+
+
+def make_db(crawl_state):
+    db = Neo4jAuraDB.__new__(Neo4jAuraDB)
+    db.driver = FailingDriver()
+    db._ner = FakeNer()
+    db.fetcher = FakeFetcher()
+    db.batch_size = 1000
+    db.crawl_state = crawl_state
+    db.parsed_articles = []
+    db.write_listeners = []
+    return db
+
+
+def test_failed_write_returns_false():
+    assert make_db(None).store_relationships_auradb([RELATIONSHIP]) is False
+
+
+def test_failed_writes_are_recorded_and_the_crawl_goes_on(tmp_path):
+    crawl_state = CrawlState(str(tmp_path / "crawl_state.sqlite"))
+    articles = [SimpleNamespace(url=f"https://example.com/{i}", publish_date=None) for i in range(3)]
+    make_db(crawl_state).store_articles_to_neo4j(articles)
+
+    failures = crawl_state.failures("graph")
+    assert sorted(url for _, url, _, _, _ in failures) == [f"https://example.com/{i}" for i in range(3)]
+    assert all(crawl_state.should_fetch(article.url, sinks=("graph",)) for article in articles)
+
+    crawl_state.record(articles[0].url, "Joe Biden was in Washington.", "graph")
+    assert len(crawl_state.failures("graph")) == 2
+    crawl_state.close()
@@ -0,0 +1,59 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from embeddings import HashEmbeddings
+from faiss_lib import VectorDB
+from graphrag_workflow import GraphRagWorkflow
+from query_cache import TTLCache
+
+
+class TwoHopGraphDB:
+    def add_write_listener(self, callback):
+        self.listener = callback
+
+    def fetch_related_nodes(self, key_entities):
+        return [
+            {"source": "Elon Musk", "relationship": "LEADS", "target": "Tesla", "target_labels": ["ORG"]},
+            {"source": "Tesla", "relationship": "BASED_IN", "target": "Austin", "target_labels": ["GPE"]},
+        ]
+
+    def search_entities(self, text, limit=5):
+        return []
+
+
+class FailingNer:
+    def parse_query(self, query):
+        raise AssertionError("the vector-only path must not run NER")
+
+    parse_queries = parse_query
+
+
+def test_tags_compare_by_entity_key():
+    cache = TTLCache()
+    cache.set("q", [1], entities=["The White House"])
+    assert cache.invalidate(["white house"], untagged=False) == 1
+
+
+def test_neighborhood_is_dropped_by_a_write_to_a_farther_hop():
+    graph_db = TwoHopGraphDB()
+    workflow = GraphRagWorkflow("hash", embeddings=HashEmbeddings(), cache_path=None, chunker="window", graph_db=graph_db)
+    workflow.related_nodes(["elon musk"])
+    assert len(workflow.query_cache.neighborhoods) == 1
+    graph_db.listener({"Austin": "GPE"})
+    assert len(workflow.query_cache.neighborhoods) == 0
+
+
+def test_retrieve_chunks_without_entity_filter_does_not_parse():
+    embeddings = HashEmbeddings()
+    vector_db = VectorDB()
+    vector_db.add_embeddings([{"text": "Markets fell today.", "embedding": embeddings.embed_query("Markets fell today.")}])
+    workflow = GraphRagWorkflow(
+        "hash", embeddings=embeddings, ner=FailingNer(), cache_path=None, chunker="window", vector_db=vector_db
+    )
+    assert [chunk["text"] for chunk in workflow.retrieve_chunks("What happened to markets?", top_k=1)] == [
+        "Markets fell today."
+    ]
+    [chunks] = workflow.retrieve_chunks_batch(["Why did markets fall?"], top_k=1)
+    assert [chunk["text"] for chunk in chunks] == ["Markets fell today."]
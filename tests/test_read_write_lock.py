@@ -0,0 +1,50 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from faiss_lib import ReadWriteLock
+
+
+def test_readers_share_the_lock():
+    lock = ReadWriteLock()
+    both_in = threading.Barrier(2, timeout=5)
+
+    def read():
+        with lock.read():
+            both_in.wait()
+
+    threads = [threading.Thread(target=read) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not both_in.broken
+
+
+def test_writer_waits_for_readers_and_blocks_new_ones():
+    lock = ReadWriteLock()
+    events = []
+    lock.acquire_read()
+    writer = threading.Thread(target=lambda: (lock.acquire_write(), events.append("write"), lock.release_write()))
+    writer.start()
+    while not lock._waiting_writers:
+        pass
+    reader = threading.Thread(target=lambda: (lock.acquire_read(), events.append("read"), lock.release_read()))
+    reader.start()
+    events.append("first read done")
+    lock.release_read()
+    writer.join(5)
+    reader.join(5)
+    assert events == ["first read done", "write", "read"]
+
+
+def test_writer_may_reenter():
+    lock = ReadWriteLock()
+    with lock.write():
+        with lock.write():
+            with lock.read():
+                pass
+    with lock.read():
+        pass